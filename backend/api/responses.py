@@ -0,0 +1,206 @@
+"""
+Fast JSON responses and negotiated response compression.
+
+`FastJSONResponse` serializes with orjson when it is installed (several times
+faster than the standard library on large extraction results) and falls back
+to compact `json.dumps`, also for content orjson rejects, such as integers
+beyond 64 bits that `json.loads` builds from model output. `CompressionMiddleware` compresses responses above
+`RESPONSE_COMPRESSION_MIN_SIZE` with brotli (optional `brotli` package) or
+gzip, whichever the client prefers in `Accept-Encoding`, including streamed
+responses.
+"""
+
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # orjson.JSONEncodeError, e.g. "Integer exceeds 64-bit range"
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fastest available serializer"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Content types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {encoding: quality}"""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding the client accepts, or None"""
+    accepted = _accepted_encodings(accept_encoding)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+class _Compressor:
+    """Incremental compressor for one response body"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.RESPONSE_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        """Compress a chunk; flushing lets streamed chunks reach the client promptly"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self) -> bytes:
+        """Compress whatever is left and end the stream"""
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the client's preferred encoding"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = settings.RESPONSE_COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    """Wraps `send` for one request, deciding whether to compress on the first body chunk"""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers until we know the body size
+            self.start_message = message
+            self.passthrough = not self._compressible(Headers(raw=message["headers"]))
+            return
+
+        if message["type"] != "http.response.body":
+            # e.g. http.response.pathsend: the held headers go out first, uncompressed
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+
+            # Small complete bodies are sent as they are
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start_message)
+                await self.send(message)
+                self.start_message = None
+                self.passthrough = True
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["content-length"]
+
+            if not more_body:
+                compressed = self.compressor.compress(body, flush=False) + self.compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                self.start_message = None
+                return
+
+            await self.send(self.start_message)
+            self.start_message = None
+
+        chunk = self.compressor.compress(body, flush=more_body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
@@ -1,34 +1,111 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from typing import Dict, Any, List
+import os
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Query, Path, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
+from typing import Dict, Any, List, Optional
 
+from backend.api.streaming import stream_json_array
+from backend.core.config import settings
+from backend.models.request import ProcessingOptions
 from backend.services.file_service import FileService
+from backend.services.page_cache import IMAGE_FORMATS
+from backend.db.store import results_store
+from backend.db.writer import result_writer
 
 router = APIRouter()
 
 @router.post("/upload", response_model=Dict[str, Any])
-async def upload_document(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def upload_document(
+    file: UploadFile = File(...),
+    options: Optional[str] = Form(None, description="Processing options as JSON, e.g. {\"pages\": \"1-2\", \"fields\": [\"total\"]}"),
+    include_text: bool = Query(True, description="Echo the extracted text back in the response")
+) -> Dict[str, Any]:
     """
     Upload and process a document.
     
     Takes a file upload, saves it, and processes it with OCR and/or LLM.
-    Returns the extracted content and structured data.
+    Returns the extracted content and structured data. Pass
+    `include_text=false` to leave the (often large) extracted text out;
+    it stays available from the results API. `options` narrows the work
+    to some pages, fields or a JSON schema (see ProcessingOptions).
     """
+    try:
+        processing_options = ProcessingOptions.model_validate_json(options) if options else None
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid options: {e}")
+    
     # Process the file using FileService
-    result = await FileService.process_file(file)
+    result = await FileService.process_file(file, processing_options)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["error"])
     
+    # Queue result for persistence in the results store
+    if results_store.is_available():
+        result_writer.enqueue(
+            file_name=result.get("file_name", ""),
+            file_type=os.path.splitext(result.get("file_name", ""))[1].lstrip(".").lower(),
+            extracted_text=result.get("extracted_text", ""),
+            json_result=result.get("json_result", {})
+        )
+    
+    if not include_text:
+        result = {key: value for key, value in result.items() if key != "extracted_text"}
+    
     return result
 
-@router.get("/list", response_model=List[Dict[str, Any]])
-async def list_documents() -> List[Dict[str, Any]]:
+@router.get("/list")
+async def list_documents() -> StreamingResponse:
     """
     List all uploaded documents.
     
-    Returns a list of document metadata for all uploaded files.
+    Streams a JSON array of document metadata for all uploaded files.
+    """
+    return StreamingResponse(stream_json_array(FileService.iter_files()), media_type="application/json")
+
+@router.get("/{file_id}", response_model=Dict[str, Any])
+async def get_document(file_id: str) -> Dict[str, Any]:
+    """
+    Get metadata for an uploaded document.
+    
+    Takes a file ID and returns its name, size and extension.
+    """
+    info = FileService.get_file_info(file_id)
+    
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"File with ID {file_id} not found")
+    
+    return {key: value for key, value in info.items() if key != "path"}
+
+@router.get("/{file_id}/pages/{page}")
+async def get_page_image(
+    request: Request,
+    file_id: str,
+    page: int = Path(..., ge=1, description="1-based page number"),
+    dpi: Optional[int] = Query(None, ge=36, le=600, description="Render resolution (default: RENDER_DPI, or THUMBNAIL_DPI for thumbnails)"),
+    format: str = Query("png", description=f"Image format: {', '.join(IMAGE_FORMATS)}"),
+    thumbnail: Optional[int] = Query(None, ge=32, le=2048, description="Fit the image in a square of this many pixels")
+) -> Response:
     """
-    return FileService.get_file_list()
+    Get a rendered page of a PDF document.
+    
+    Pages are rendered once and then served from the page cache, with an
+    ETag for conditional requests and byte-range support.
+    """
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unsupported format: {format}")
+    
+    dpi = dpi or (settings.THUMBNAIL_DPI if thumbnail else settings.RENDER_DPI)
+    result = await FileService.get_page_image(file_id, page, dpi, format, thumbnail)
+    
+    if not result["success"]:
+        raise HTTPException(status_code=404 if "not found" in result["error"] else 400, detail=result["error"])
+    
+    headers = {"ETag": result["etag"], "Cache-Control": "private, max-age=86400"}
+    if result["etag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(result["path"], media_type=result["media_type"], headers=headers)
 
 @router.delete("/{file_id}", response_model=Dict[str, Any])
 async def delete_document(file_id: str) -> Dict[str, Any]:
@@ -1,73 +1,73 @@
+import os
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
 
+from backend.core import metrics, tracing
 from backend.models.request import ProcessFileRequest, ProcessTextRequest
 from backend.models.response import ProcessingResponse, ErrorResponse
 from backend.services.file_service import file_service
-from backend.services.ocr_service import ocr_service
 from backend.services.llm_service import llm_service
-from backend.db.supabase import supabase_client
+from backend.db.store import results_store
+from backend.db.writer import result_writer
 
 router = APIRouter()
 
 
 @router.post("/process/file", 
              response_model=ProcessingResponse,
-             responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+             response_model_exclude_none=True,
+             responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 504: {"model": ErrorResponse}})
 async def process_file(request: ProcessFileRequest):
     """
-    Process a file with OCR and LLM
+    Reprocess a stored upload by ID
     
     - **file_id**: ID of the uploaded file to process
-    - **file_type**: Type of file (pdf, image)
-    - **options**: Additional processing options (optional)
+    - **options**: `mode` ("vision" or "text"), `pages` (e.g. "1-3,5"), `fields` or
+      `json_schema` to extract only those, and `max_output_tokens` (optional)
+    - **reuse_cache**: Reuse cached text, renders and LLM results (default true)
+    - **include_text**: Echo the extracted text back (default true)
     
-    Returns the extracted text and structured JSON
+    Only stages whose inputs or options changed are run again; the reused
+    ones are listed in `reused_stages`. Returns the extracted text and
+    structured JSON
     """
-    # Process file with OCR
-    ocr_result = ocr_service.process_file(request.file_id)
+    # Reprocess the stored upload, reusing cached stage outputs
+    result = await file_service.reprocess_file(request.file_id, request.options, reuse_cache=request.reuse_cache)
     
-    if not ocr_result.get("success", False):
+    if not result.get("success", False):
         raise HTTPException(
-            status_code=404 if "not found" in ocr_result.get("error", "").lower() else 400,
-            detail=ocr_result.get("error", "Failed to process file with OCR")
+            status_code=404 if "not found" in result.get("error", "").lower() else 400,
+            detail=result.get("error", "Failed to process file")
         )
     
-    # Process text with LLM
-    llm_result = llm_service.process_document(
-        file_id=request.file_id,
-        file_name=ocr_result.get("file_name", ""),
-        extracted_text=ocr_result.get("extracted_text", "")
-    )
-    
-    if not llm_result.get("success", False):
-        raise HTTPException(
-            status_code=400,
-            detail=llm_result.get("error", "Failed to process text with LLM")
-        )
-    
-    # Store result in Supabase
-    if supabase_client.client:
-        supabase_client.store_document_result(
-            file_name=ocr_result.get("file_name", ""),
-            file_type=ocr_result.get("file_type", ""),
-            extracted_text=ocr_result.get("extracted_text", ""),
-            json_result=llm_result.get("json_result", {})
+    # Queue result for persistence in the results store
+    if results_store.is_available():
+        result_writer.enqueue(
+            file_name=result.get("file_name", ""),
+            file_type=os.path.splitext(result.get("file_name", ""))[1].lstrip(".").lower(),
+            extracted_text=result.get("extracted_text", ""),
+            json_result=result.get("json_result", {})
         )
     
     # Return response
     return ProcessingResponse(
         file_id=request.file_id,
-        file_name=ocr_result.get("file_name", ""),
-        extracted_text=ocr_result.get("extracted_text", ""),
-        json_result=llm_result.get("json_result", {}),
-        processing_time=llm_result.get("processing_time", 0.0)
+        file_name=result.get("file_name", ""),
+        extracted_text=result.get("extracted_text", "") if request.include_text else None,
+        json_result=result.get("json_result", {}),
+        processing_time=result.get("processing_time", 0.0),
+        timings=result.get("timings"),
+        reused_stages=result.get("reused_stages"),
+        skipped_pages=result.get("skipped_pages"),
+        reused_pages=result.get("reused_pages"),
+        template_id=result.get("template_id")
     )
 
 
 @router.post("/process/text", 
              response_model=ProcessingResponse,
-             responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+             response_model_exclude_none=True,
+             responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 504: {"model": ErrorResponse}})
 async def process_text(request: ProcessTextRequest):
     """
     Process raw text with LLM
@@ -75,11 +75,13 @@ async def process_text(request: ProcessTextRequest):
     - **text**: Raw text to process
     - **file_name**: Original file name (optional)
     - **options**: Additional processing options (optional)
+    - **include_text**: Echo the input text back (default true)
     
     Returns the structured JSON
     """
     # Process text with LLM
-    llm_result = llm_service.process_text(request.text)
+    with metrics.track_stages() as timings, tracing.span("process_text", input_chars=len(request.text)):
+        llm_result = await llm_service.process_text(request.text, request.options)
     
     if not llm_result.get("success", False):
         raise HTTPException(
@@ -87,9 +89,9 @@ async def process_text(request: ProcessTextRequest):
             detail=llm_result.get("error", "Failed to process text with LLM")
         )
     
-    # Store result in Supabase
-    if supabase_client.client and request.file_name:
-        supabase_client.store_document_result(
+    # Queue result for persistence in the results store
+    if results_store.is_available() and request.file_name:
+        result_writer.enqueue(
             file_name=request.file_name,
             file_type="text",
             extracted_text=request.text,
@@ -99,7 +101,8 @@ async def process_text(request: ProcessTextRequest):
     # Return response
     return ProcessingResponse(
         file_name=request.file_name,
-        extracted_text=request.text,
+        extracted_text=request.text if request.include_text else None,
         json_result=llm_result.get("json_result", {}),
-        processing_time=llm_result.get("processing_time", 0.0)
+        processing_time=llm_result.get("processing_time", 0.0),
+        timings=metrics.rounded(timings)
     ) 
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+Download captured request profiles and the continuous sampling aggregate.
+
+Every route needs the `X-Admin-Token` header matching PROFILING_ADMIN_TOKEN.
+"""
+
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import Dict, Any, List
+
+from backend.core.profiling import check_admin_token, continuous_sampler, profile_store, profiling_enabled
+
+
+def require_admin(x_admin_token: str = Header("")) -> None:
+    """Reject requests without the admin token"""
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set PROFILING_ADMIN_TOKEN")
+    if not check_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+async def list_profiles() -> List[Dict[str, Any]]:
+    """Captured request profiles, newest first"""
+    return profile_store.list()
+
+
+@router.get("/continuous", response_class=PlainTextResponse)
+async def continuous_profile() -> str:
+    """Collapsed stacks sampled continuously, merged across workers"""
+    return continuous_sampler.aggregate()
+
+
+@router.get("/continuous/stats")
+async def continuous_profile_stats() -> Dict[str, Any]:
+    """Continuous sampler state for this worker"""
+    return continuous_sampler.stats()
+
+
+@router.get("/{profile_id}")
+async def download_profile(profile_id: str) -> FileResponse:
+    """Download a profile: `.folded` collapsed stacks or a `.prof` pstats dump"""
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path), media_type="application/octet-stream")
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+
+from backend.core.config import settings
+from backend.services.qa_service import qa_service
+
+router = APIRouter()
+
+
+class QuestionRequest(BaseModel):
+    """Question about processed documents"""
+    question: str = Field(..., min_length=1)
+    top_k: int = Field(settings.QA_TOP_K, ge=1, le=50)
+    doc_ids: Optional[List[str]] = Field(None, description="Limit retrieval to these documents")
+
+
+@router.post("/ask")
+async def ask(request: QuestionRequest) -> StreamingResponse:
+    """
+    Answer a question about processed documents.
+
+    The answer is streamed as plain text, followed by the documents it
+    was based on.
+    """
+    return StreamingResponse(
+        qa_service.answer_stream(request.question, k=request.top_k, doc_ids=request.doc_ids),
+        media_type="text/plain; charset=utf-8"
+    )
+
+
+@router.post("/search", response_model=Dict[str, Any])
+async def search(request: QuestionRequest) -> Dict[str, Any]:
+    """Document chunks most similar to a question"""
+    try:
+        chunks = await run_in_threadpool(qa_service.search, request.question, request.top_k, request.doc_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"results": chunks}
+
+
+@router.post("/reindex", response_model=Dict[str, Any])
+async def reindex() -> Dict[str, Any]:
+    """Index stored documents that are not in the vector index yet"""
+    result = await run_in_threadpool(qa_service.reindex)
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Reindex failed"))
+    return result
+
+
+@router.get("/stats", response_model=Dict[str, Any])
+async def stats() -> Dict[str, Any]:
+    """Vector index size and embedding cache hit counts"""
+    return qa_service.stats()
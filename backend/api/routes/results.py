@@ -0,0 +1,207 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional, Iterator, Union
+
+from backend.api.streaming import stream_json_page
+from backend.db.base import resolve_fields
+from backend.db.field_index import field_index
+from backend.db.store import results_store
+
+router = APIRouter()
+
+# Rows fetched from the store per round-trip while streaming a listing
+LIST_PAGE_SIZE = 100
+
+
+def _parse_filters(filters: List[str]) -> Dict[str, str]:
+    """Parse `field:value` filter parameters"""
+    parsed = {}
+    for item in filters:
+        field, separator, value = item.partition(":")
+        if not separator or not field:
+            raise HTTPException(status_code=400, detail=f"Invalid filter '{item}', expected field:value")
+        parsed[field] = value
+    return parsed
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse and validate a comma-separated field projection"""
+    if not fields:
+        return None
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    try:
+        resolve_fields(requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return requested
+
+
+class FieldCondition(BaseModel):
+    """Condition on a JSON result field"""
+    path: str = Field(..., description="Field path, e.g. vendor.name or items[].price; '*' matches any characters")
+    op: str = Field("eq", description="eq, gt, gte, lt, lte, contains or exists")
+    value: Optional[Union[float, int, bool, str]] = None
+
+
+class FieldQuery(BaseModel):
+    """Structured query over JSON result fields"""
+    where: List[FieldCondition] = Field(..., min_length=1)
+    limit: int = Field(100, ge=1, le=1000)
+    cursor: Optional[str] = None
+
+
+@router.post("/query", response_model=Dict[str, Any])
+async def query_results(query: FieldQuery) -> Dict[str, Any]:
+    """
+    Find documents by their extracted JSON fields.
+    
+    All conditions must match. Numeric values (including amounts like
+    "$1,200") compare as numbers, other values as case-insensitive text.
+    Answered from the field index without loading stored documents.
+    """
+    result = await run_in_threadpool(
+        field_index.query, [condition.model_dump() for condition in query.where], limit=query.limit, cursor=query.cursor
+    )
+    
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return result
+
+
+@router.get("/fields", response_model=Dict[str, Any])
+async def list_fields(
+    prefix: str = Query("", description="Only paths starting with this prefix"),
+    limit: int = Query(200, ge=1, le=1000)
+) -> Dict[str, Any]:
+    """
+    List indexed JSON field paths with the number of documents that have them.
+    """
+    paths = await run_in_threadpool(field_index.paths, prefix=prefix, limit=limit)
+    return {"fields": paths, "stats": await run_in_threadpool(field_index.stats)}
+
+
+@router.post("/fields/reindex", response_model=Dict[str, Any])
+async def reindex_fields() -> Dict[str, Any]:
+    """
+    Add stored documents that are missing from the field index.
+    """
+    result = await run_in_threadpool(field_index.reindex, results_store)
+    
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Reindex failed"))
+    
+    return result
+
+
+@router.get("/search", response_model=Dict[str, Any])
+async def search_results(
+    q: str = Query(..., min_length=1, description="Search terms"),
+    limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    filter: List[str] = Query(default=[], description="JSON field filters as field:value")
+) -> Dict[str, Any]:
+    """
+    Search processed documents.
+    
+    Ranks documents by relevance of their extracted text and JSON result
+    to the search terms. Pass `next_cursor` back as `cursor` to get the
+    next page.
+    """
+    result = await run_in_threadpool(results_store.search_documents, q, limit=limit, cursor=cursor, filters=_parse_filters(filter))
+    
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return result
+
+
+@router.get("/")
+async def list_results(
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of results"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous response's next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: id, file_name, file_type, created_at)")
+) -> StreamingResponse:
+    """
+    List stored document results, newest first.
+    
+    Only summary fields are returned unless `fields` asks for
+    `extracted_text` or `json_result`. The response is streamed as
+    `{"results": [...], "next_cursor": ...}`.
+    """
+    projection = _parse_fields(fields)
+    
+    # Fetch the first page up front so errors become a proper status code
+    first_page = await run_in_threadpool(
+        results_store.list_document_results, fields=projection, limit=min(limit, LIST_PAGE_SIZE), cursor=cursor, raw_json=True
+    )
+    if "error" in first_page:
+        raise HTTPException(status_code=400, detail=first_page["error"])
+    
+    cursor_holder: Dict[str, Optional[str]] = {"next_cursor": first_page["next_cursor"]}
+    
+    # A sync generator, so Starlette iterates it (and fetches later pages) in its threadpool
+    def generate() -> Iterator[Dict[str, Any]]:
+        page = first_page
+        remaining = limit
+        while True:
+            for item in page["results"]:
+                yield item
+            remaining -= len(page["results"])
+            
+            if not page["next_cursor"] or remaining <= 0:
+                return
+            
+            page = results_store.list_document_results(
+                fields=projection, limit=min(remaining, LIST_PAGE_SIZE), cursor=page["next_cursor"], raw_json=True
+            )
+            if "error" in page:
+                return
+            cursor_holder["next_cursor"] = page["next_cursor"]
+    
+    return StreamingResponse(stream_json_page(generate(), cursor_holder), media_type="application/json")
+
+
+@router.get("/{doc_id}", response_model=Dict[str, Any])
+async def get_result(
+    doc_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)")
+) -> Dict[str, Any]:
+    """
+    Get a stored document result by ID.
+    """
+    result = await run_in_threadpool(results_store.get_document_by_id, doc_id, fields=_parse_fields(fields))
+    
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    
+    return result
+
+
+@router.get("/{doc_id}/text", response_class=PlainTextResponse)
+async def get_result_text(doc_id: str) -> str:
+    """
+    Get only the extracted text of a stored document result.
+    """
+    result = await run_in_threadpool(results_store.get_document_by_id, doc_id, fields=["extracted_text"])
+    
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    
+    return result["extracted_text"]
+
+
+@router.delete("/{doc_id}", response_model=Dict[str, Any])
+async def delete_result(doc_id: str) -> Dict[str, Any]:
+    """
+    Delete a stored document result by ID.
+    """
+    result = await run_in_threadpool(results_store.delete_document_result, doc_id)
+    
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    
+    return result
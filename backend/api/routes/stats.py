@@ -0,0 +1,61 @@
+"""
+Runtime statistics for background components.
+"""
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any
+
+from backend.core.admission import admission_controller
+from backend.core.cache import cache_stats
+from backend.core.compression import compression_stats
+from backend.core.process_pool import cpu_pool
+from backend.db.writer import result_writer
+from backend.services.stage_cache import stage_cache
+from backend.services.template_store import template_store
+
+router = APIRouter()
+
+
+@router.get("/writer")
+async def writer_stats() -> Dict[str, Any]:
+    """Result writer queue depth, throughput and flush latency"""
+    return result_writer.stats()
+
+
+@router.get("/cache")
+async def cache_statistics() -> Dict[str, Any]:
+    """Hit rates and sizes of the read-through caches"""
+    return cache_stats()
+
+
+@router.get("/compression")
+async def compression_statistics() -> Dict[str, Any]:
+    """Compression ratio and CPU cost per kind of stored data"""
+    return compression_stats()
+
+
+@router.get("/cpu-pool")
+async def cpu_pool_statistics() -> Dict[str, Any]:
+    """CPU pool task counts, queue wait and run time"""
+    return cpu_pool.stats()
+
+
+@router.get("/admission")
+async def admission_statistics() -> Dict[str, Any]:
+    """Document processing slots in use, queue length and rejections"""
+    return admission_controller.stats()
+
+
+@router.get("/stage-cache")
+async def stage_cache_statistics() -> Dict[str, Any]:
+    """Stage output cache hits per stage and size on disk"""
+    return await run_in_threadpool(stage_cache.stats)
+
+
+@router.get("/templates")
+async def template_statistics() -> Dict[str, Any]:
+    """Layout template lookups, local extractions and verification outcomes, with every template"""
+    stats = await run_in_threadpool(template_store.stats)
+    stats["items"] = await run_in_threadpool(template_store.templates)
+    return stats
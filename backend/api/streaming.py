@@ -0,0 +1,48 @@
+"""
+Helpers for streaming JSON list responses.
+
+List endpoints emit their items one at a time instead of building the whole
+response body in memory.
+"""
+
+import json
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+from backend.api.responses import dumps
+
+
+def dump_item(item: Dict[str, Any]) -> str:
+    """
+    Serialize one item.
+
+    A `json_result` that is still raw JSON text (see `raw_json` on the
+    results store) is spliced in verbatim rather than decoded and re-encoded.
+    """
+    raw_json = item.get("json_result")
+    if not isinstance(raw_json, str):
+        return dumps(item).decode("utf-8")
+
+    rest = {key: value for key, value in item.items() if key != "json_result"}
+    body = dumps(rest).decode("utf-8")
+    separator = "," if rest else ""
+    return f'{body[:-1]}{separator}"json_result":{raw_json}}}'
+
+
+def stream_json_array(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Stream items as a JSON array"""
+    yield "["
+    for index, item in enumerate(items):
+        yield ("," if index else "") + dump_item(item)
+    yield "]"
+
+
+def stream_json_page(items: Iterable[Dict[str, Any]], cursor_holder: Dict[str, Optional[str]]) -> Iterator[str]:
+    """
+    Stream items as `{"results": [...], "next_cursor": ...}`.
+
+    `next_cursor` is written last, after `items` is exhausted, so the producer
+    can fill in `cursor_holder["next_cursor"]` while it is being iterated.
+    """
+    yield '{"results": '
+    yield from stream_json_array(items)
+    yield f', "next_cursor": {json.dumps(cursor_holder.get("next_cursor"))}}}'
@@ -0,0 +1,260 @@
+"""
+Admission control for the document processing endpoints.
+
+Each worker runs at most `ADMISSION_MAX_CONCURRENT` document requests at
+once. Up to `ADMISSION_MAX_QUEUE` more wait for a slot. Later requests are
+rejected at once with 429, before their upload body is read. A request
+that waits longer than `ADMISSION_QUEUE_TIMEOUT` gets 503. Requests are also
+turned away with 503 while the worker's resident memory is above
+`ADMISSION_MAX_RSS_MB` or the host has less than `ADMISSION_MIN_AVAILABLE_MB`
+available. The memory check only applies while another document is already
+in flight, so an idle worker always makes progress. Every rejection carries a
+Retry-After estimated from the recent service time.
+
+With several workers, these limits alone would admit workers times
+`ADMISSION_MAX_CONCURRENT` documents per host. When state is shared between
+workers (see shared_state), an admitted request also takes one of
+`ADMISSION_MAX_CONCURRENT_TOTAL` host-wide slots, counted in the shared store.
+It waits for one within the queue timeout. The counter expires an hour after
+it is created, so slots leaked by a crashed worker come back.
+
+Queue wait is recorded as the `admission_wait` stage.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, List, Optional
+
+from starlette.responses import JSONResponse
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.shared_state import MISSING, SharedStore, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of the host-wide in-flight counter, in seconds
+HOST_COUNTER_TTL = 3600
+
+# Seconds between attempts to take a host-wide slot
+HOST_SLOT_POLL = 0.1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _rss_mb() -> Optional[float]:
+    """Resident memory of this process, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _available_mb() -> Optional[float]:
+    """Memory available to new work on this host, where /proc is available"""
+    try:
+        with open("/proc/meminfo") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class AdmissionController:
+    """Concurrency, queue and memory limits for one worker's event loop"""
+
+    def __init__(self,
+                 max_concurrent: int = settings.ADMISSION_MAX_CONCURRENT,
+                 max_queue: int = settings.ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = settings.ADMISSION_QUEUE_TIMEOUT,
+                 max_rss_mb: int = settings.ADMISSION_MAX_RSS_MB,
+                 min_available_mb: int = settings.ADMISSION_MIN_AVAILABLE_MB,
+                 max_concurrent_total: int = settings.ADMISSION_MAX_CONCURRENT_TOTAL,
+                 shared: Optional[SharedStore] = None):
+        """Configure limits; max_concurrent=0 admits everything, max_concurrent_total=0 lifts the host limit"""
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_total = max_concurrent_total
+        self.shared = shared if shared is not None else get_shared_store("admission")
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_rss_mb = max_rss_mb
+        self.min_available_mb = min_available_mb
+        self._semaphore = asyncio.Semaphore(max(max_concurrent, 1))
+        self._in_flight = 0
+        self._queued = 0
+        # Moving average of service time, seeded with a typical single-page document
+        self._avg_service_time = 5.0
+        self._stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_memory": 0, "timed_out": 0, "host_waits": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free"""
+        estimate = self._avg_service_time * (self._queued + 1) / max(self.max_concurrent, 1)
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def _memory_pressure(self) -> Optional[str]:
+        if self.max_rss_mb > 0:
+            rss = _rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                return f"Worker memory {rss:.0f} MB is above the {self.max_rss_mb} MB limit"
+        if self.min_available_mb > 0:
+            available = _available_mb()
+            if available is not None and available < self.min_available_mb:
+                return f"Only {available:.0f} MB of memory available"
+        return None
+
+    def _reject(self, status_code: int, reason: str, counter: str) -> AdmissionRejected:
+        self._stats[counter] += 1
+        return AdmissionRejected(status_code, reason, self.retry_after())
+
+    def _host_count(self, amount: int) -> Optional[int]:
+        """Add to the host-wide in-flight counter; None when the shared store is unavailable"""
+        try:
+            return self.shared.incr("in_flight", amount, HOST_COUNTER_TTL)
+        except Exception as e:
+            logger.warning(f"Shared admission counter failed, applying this worker's limits only: {str(e)}")
+            return None
+
+    async def _take_host_slot(self, deadline: Optional[float]) -> bool:
+        """Take a host-wide slot, waiting up to the deadline; False when there is no shared counter to hold"""
+        if self.shared is None or self.max_concurrent_total <= 0:
+            return False
+        waited = False
+        while True:
+            count = self._host_count(1)
+            if count is None:
+                return False
+            if count <= self.max_concurrent_total:
+                return True
+            self._host_count(-1)
+            if not waited:
+                waited = True
+                self._stats["host_waits"] += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise self._reject(503, "Timed out waiting for a processing slot on this host", "timed_out")
+            await asyncio.sleep(HOST_SLOT_POLL)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[float]:
+        """Hold a processing slot for the block; yields the queue wait in seconds"""
+        if not self.enabled:
+            yield 0.0
+            return
+
+        if self._in_flight > 0:
+            pressure = self._memory_pressure()
+            if pressure:
+                raise self._reject(503, pressure, "rejected_memory")
+
+        queued_at = time.perf_counter()
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending
+            await self._semaphore.acquire()
+        elif self._queued >= self.max_queue:
+            raise self._reject(429, "Too many documents are being processed; try again later", "rejected_queue_full")
+        else:
+            # Wait for a slot
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout or None)
+            except asyncio.TimeoutError:
+                raise self._reject(503, "Timed out waiting for a processing slot", "timed_out")
+            finally:
+                self._queued -= 1
+
+        try:
+            holds_host_slot = await self._take_host_slot(queued_at + self.queue_timeout if self.queue_timeout else None)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        wait = time.perf_counter() - queued_at
+        metrics.record("admission_wait", wait)
+        self._stats["admitted"] += 1
+        self._in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            yield wait
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            if holds_host_slot:
+                self._host_count(-1)
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * (time.perf_counter() - started_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots in use, queue length and rejection counts"""
+        stats = dict(self._stats)
+        stats.update(
+            in_flight=self._in_flight,
+            queued=self._queued,
+            max_concurrent=self.max_concurrent,
+            max_queue=self.max_queue,
+            avg_service_time=self._avg_service_time,
+            max_concurrent_total=self.max_concurrent_total if self.shared is not None else None,
+            host_in_flight=self._host_in_flight(),
+            rss_mb=_rss_mb(),
+            available_mb=_available_mb(),
+        )
+        return stats
+
+    def _host_in_flight(self) -> Optional[int]:
+        """Documents in flight on the host, when counted in the shared store"""
+        if self.shared is None:
+            return None
+        try:
+            count = self.shared.get("in_flight")
+        except Exception:
+            return None
+        return 0 if count is MISSING else max(int(count), 0)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to the document processing paths"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None, paths: Optional[List[str]] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+        self.paths = tuple(paths if paths is not None else settings.admission_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with self.controller.admit():
+                await self.app(scope, receive, send)
+        except AdmissionRejected as rejection:
+            response = JSONResponse(
+                {"detail": rejection.reason},
+                status_code=rejection.status_code,
+                headers={"Retry-After": str(rejection.retry_after)},
+            )
+            await response(scope, receive, send)
+
+
+# Create admission controller instance
+admission_controller = AdmissionController()
+metrics.register_runtime_stats(
+    "admission", "Admission control", admission_controller.stats,
+    ["in_flight", "queued", "admitted", "rejected_queue_full", "rejected_memory", "timed_out"]
+)
@@ -0,0 +1,159 @@
+"""
+Bounded in-memory read-through caches.
+
+Each named cache is an LRU map with a per-entry TTL. When several workers run
+(or `CACHE_REDIS_URL` is set), the shared state store sits behind the local
+tier so all workers see the same entries and invalidations; the local tier
+then only keeps entries for `CACHE_SHARED_LOCAL_TTL` seconds to bound
+staleness across workers.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.shared_state import SharedStore, MISSING, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters"""
+
+    def __init__(self, name: str, max_entries: int = settings.CACHE_MAX_ENTRIES, ttl: float = settings.CACHE_TTL):
+        """Initialize the cache and its optional shared tier"""
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local_ttl = ttl
+        self.shared: Optional[SharedStore] = get_shared_store(f"cache:{name}")
+        if self.shared is not None:
+            self.local_ttl = min(ttl, settings.CACHE_SHARED_LOCAL_TTL)
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _get_local(self, key: str) -> Any:
+        """Look up the local tier"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: Any) -> None:
+        """Store in the local tier, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.local_ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a cached value"""
+        value = self._get_local(key)
+        if value is not MISSING:
+            self._count("hits")
+            return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared cache read failed for {self.name}: {str(e)}")
+                value = MISSING
+            if value is not MISSING:
+                self._count("shared_hits")
+                self._set_local(key, value)
+                return value
+
+        self._count("misses")
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value in every tier"""
+        self._set_local(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed for {self.name}: {str(e)}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Read-through lookup: return the cached value or load, cache and return it"""
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        value = loader()
+        if should_cache(value):
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: str) -> None:
+        """Remove a key from every tier"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._stats["invalidations"] += 1
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as e:
+                logger.warning(f"Shared cache invalidation failed for {self.name}: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop all local entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and size statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["shared"] = self.shared is not None
+        return stats
+
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, max_entries: int = settings.CACHE_MAX_ENTRIES, ttl: float = settings.CACHE_TTL) -> TTLCache:
+    """Get or create a named cache"""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TTLCache(name, max_entries=max_entries, ttl=ttl)
+        return _caches[name]
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistics for every named cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+metrics.register_runtime_stats("cache", "Read-through cache", cache_stats, ["hit_rate", "hits", "shared_hits", "misses", "size"])
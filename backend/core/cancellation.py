@@ -0,0 +1,188 @@
+"""
+Cancellation and deadlines for document requests.
+
+Without these, a client that disconnects, or a gateway that times out,
+leaves the worker rendering pages and waiting on the vision model for a
+response nobody will read. Every document request gets a `CancelToken`
+with a deadline of `REQUEST_TIMEOUT` seconds, or the caller's own budget
+from the `X-Request-Timeout` header if that is shorter. Once the request
+body has been read, the middleware also watches for the client to
+disconnect.
+
+Cancelling the token cancels the request's task. The CancelledError then
+unwinds through FileService, OCRService and LLMService:
+
+- in-flight model calls close their HTTP streams;
+- pipeline stages stop;
+- CPU pool tasks that have not started are dropped; running ones finish,
+  and the pool frees the shared memory they return;
+- the admission slot is released on the way out.
+
+A request past its deadline gets 504. A disconnected client gets nothing
+more.
+
+The token travels in a context variable, as the stage timings do, so
+services can read it with `current()` without it being passed through
+every call. Work that outlives the request is started with `detach()`,
+which gives it a fresh context.
+"""
+
+import asyncio
+import time
+from contextvars import Context, ContextVar
+from typing import Coroutine, Dict, Any, List, Optional
+
+from starlette.responses import JSONResponse
+
+from backend.core import metrics
+from backend.core.config import settings
+
+CLIENT_DISCONNECTED = "client_disconnected"
+DEADLINE_EXCEEDED = "deadline_exceeded"
+TIMEOUT_HEADER = b"x-request-timeout"
+
+_current_token: ContextVar[Optional["CancelToken"]] = ContextVar("cancel_token", default=None)
+
+# Requests of this worker, by outcome
+_stats = {"active": 0, "completed": 0, CLIENT_DISCONNECTED: 0, DEADLINE_EXCEEDED: 0}
+
+
+class CancelToken:
+    """Cancels one request's task on demand or at its deadline"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        """Bind to the current task; a timeout in seconds sets the deadline"""
+        self.reason: Optional[str] = None
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._task = asyncio.current_task()
+        self._timer = asyncio.get_running_loop().call_later(timeout, self.cancel, DEADLINE_EXCEEDED) if timeout else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def cancel(self, reason: str) -> None:
+        """Cancel the request's task; only the first reason counts"""
+        if self.reason is not None or self._task is None or self._task.done():
+            return
+        self.reason = reason
+        self._task.cancel(f"Request cancelled: {reason}")
+
+    def close(self) -> None:
+        """Detach from the task once the request is done"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._task = None
+
+
+def current() -> Optional[CancelToken]:
+    """Token of the request being handled, if any"""
+    return _current_token.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one"""
+    token = _current_token.get()
+    return token.remaining() if token is not None else None
+
+
+def detach(coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+    """Start a background task free of the request's cancel token, deadline and stage timings"""
+    return asyncio.create_task(coro, name=name, context=Context())
+
+
+def request_timeout(headers: List[tuple], default: float = settings.REQUEST_TIMEOUT) -> Optional[float]:
+    """Seconds a request may run: the shorter of the configured timeout and the caller's budget"""
+    timeouts = [default] if default > 0 else []
+    for name, value in headers:
+        if name.lower() == TIMEOUT_HEADER:
+            try:
+                budget = float(value)
+            except ValueError:
+                continue
+            if budget > 0:
+                timeouts.append(budget)
+    return min(timeouts) if timeouts else None
+
+
+class CancellationMiddleware:
+    """ASGI middleware cancelling document requests on client disconnect or deadline"""
+
+    def __init__(self, app, paths: Optional[List[str]] = None, timeout: float = settings.REQUEST_TIMEOUT):
+        self.app = app
+        self.paths = tuple(paths if paths is not None else settings.admission_paths)
+        self.timeout = timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        token = CancelToken(request_timeout(scope["headers"], self.timeout))
+        response = {"started": False, "complete": False}
+        disconnected = asyncio.Event()
+        watcher: Optional[asyncio.Task] = None
+
+        async def watch() -> None:
+            # Once the body is in, only this task reads from the server; the app is handed its disconnect
+            message = await receive()
+            if message["type"] == "http.disconnect" and not response["complete"]:
+                token.cancel(CLIENT_DISCONNECTED)
+            disconnected.set()
+
+        async def receive_with_watch():
+            nonlocal watcher
+            if watcher is not None:
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.create_task(watch(), name="disconnect-watch")
+            return message
+
+        async def send_with_state(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        context_token = _current_token.set(token)
+        _stats["active"] += 1
+        try:
+            await self.app(scope, receive_with_watch, send_with_state)
+            _stats["completed"] += 1
+        except asyncio.CancelledError:
+            # Anything but our own cancellation, such as server shutdown, carries on
+            if not token.cancelled:
+                raise
+            task = asyncio.current_task()
+            if task is not None and hasattr(task, "uncancel"):
+                task.uncancel()
+
+            _stats[token.reason] += 1
+            metrics.record_cancellation(token.reason)
+            if not response["started"]:
+                # A disconnected client never sees this; the status is for access logs and metrics
+                status_code, detail = (504, "Processing deadline exceeded") if token.reason == DEADLINE_EXCEEDED else (499, "Client disconnected")
+                await JSONResponse({"detail": detail}, status_code=status_code)(scope, receive, send)
+        finally:
+            _stats["active"] -= 1
+            token.close()
+            _current_token.reset(context_token)
+            if watcher is not None:
+                watcher.cancel()
+
+
+def stats() -> Dict[str, Any]:
+    """Document requests in flight, completed and cancelled by reason"""
+    return dict(_stats, timeout=settings.REQUEST_TIMEOUT)
+
+
+metrics.register_runtime_stats("cancellation", "Request cancellation", stats, ["active", "completed", CLIENT_DISCONNECTED, DEADLINE_EXCEEDED])
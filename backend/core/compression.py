@@ -0,0 +1,318 @@
+"""
+Transparent compression for stored text and files.
+
+Blobs carry a one-byte codec tag so readers never need to know how a value was
+written. zstd (optional `zstandard` package) is preferred, with an optional
+dictionary trained on our own documents; zlib is the fallback. Files are
+written in the standard .zst / .gz formats and read back as streams.
+
+Ratio and CPU cost are tracked per kind of data (`text`, `upload`, ...) and
+reported by `compression_stats()`.
+"""
+
+import base64
+import glob
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Any, BinaryIO, Iterator, List, Optional
+
+from backend.core.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Codec tags prefixed to compressed blobs
+TAG_RAW = b"\x00"
+TAG_ZLIB = b"\x01"
+TAG_ZSTD = b"\x02"
+
+# Prefix marking compressed values stored in text columns
+TEXT_MARKER = "\x1bz:"
+
+ARCHIVE_SUFFIXES = (".zst", ".gz")
+
+
+def _codec() -> str:
+    """Codec used for new writes"""
+    codec = settings.COMPRESSION_CODEC
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if codec == "zstd" and zstandard is None:
+        logger.warning("COMPRESSION_CODEC=zstd but zstandard is not installed; falling back to zlib")
+        return "zlib"
+    return codec
+
+
+class _Stats:
+    """Thread-safe compression counters per kind of data"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Dict[str, float]] = {}
+
+    def record(self, kind: str, operation: str, raw_bytes: int, stored_bytes: int, cpu_seconds: float) -> None:
+        with self._lock:
+            stats = self._kinds.setdefault(kind, {
+                "compress_count": 0, "decompress_count": 0,
+                "raw_bytes": 0, "stored_bytes": 0,
+                "compress_cpu_seconds": 0.0, "decompress_cpu_seconds": 0.0,
+            })
+            stats[f"{operation}_count"] += 1
+            stats[f"{operation}_cpu_seconds"] += cpu_seconds
+            if operation == "compress":
+                stats["raw_bytes"] += raw_bytes
+                stats["stored_bytes"] += stored_bytes
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            kinds = {kind: dict(stats) for kind, stats in self._kinds.items()}
+        for stats in kinds.values():
+            stats["ratio"] = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0.0
+            stats["compress_mb_per_cpu_second"] = (
+                stats["raw_bytes"] / stats["compress_cpu_seconds"] / 1e6 if stats["compress_cpu_seconds"] else 0.0
+            )
+        return kinds
+
+
+_stats = _Stats()
+
+
+class _Dictionaries:
+    """Trained zstd dictionaries, keyed by dictionary ID"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._by_id: Dict[int, Any] = {}
+        self.current: Optional[Any] = None
+
+    def _load(self) -> None:
+        if self._loaded or zstandard is None:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            paths = sorted(glob.glob(os.path.join(settings.ZSTD_DICT_DIR, "*.dict")), key=os.path.getmtime)
+            for path in paths:
+                with open(path, "rb") as f:
+                    dictionary = zstandard.ZstdCompressionDict(f.read())
+                self._by_id[dictionary.dict_id()] = dictionary
+                self.current = dictionary
+            self._loaded = True
+
+    def get(self, dict_id: int) -> Optional[Any]:
+        self._load()
+        return self._by_id.get(dict_id)
+
+    def get_current(self) -> Optional[Any]:
+        self._load()
+        return self.current
+
+    def add(self, dictionary: Any) -> None:
+        self._load()
+        with self._lock:
+            self._by_id[dictionary.dict_id()] = dictionary
+            self.current = dictionary
+
+
+_dictionaries = _Dictionaries()
+
+
+def compress_bytes(data: bytes, kind: str = "bytes") -> bytes:
+    """Compress data into a tagged blob; small inputs are stored raw"""
+    start_cpu = time.thread_time()
+    codec = _codec()
+
+    if codec == "none" or len(data) < settings.COMPRESSION_MIN_SIZE:
+        blob = TAG_RAW + data
+    elif codec == "zstd":
+        dictionary = _dictionaries.get_current()
+        compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL, dict_data=dictionary)
+        blob = TAG_ZSTD + compressor.compress(data)
+    else:
+        blob = TAG_ZLIB + zlib.compress(data, min(settings.COMPRESSION_LEVEL, 9))
+
+    # Never store a compressed value that is larger than the original
+    if len(blob) > len(data) + 1:
+        blob = TAG_RAW + data
+
+    _stats.record(kind, "compress", len(data), len(blob), time.thread_time() - start_cpu)
+    return blob
+
+
+def decompress_bytes(blob: bytes, kind: str = "bytes") -> bytes:
+    """Decompress a blob produced by compress_bytes"""
+    start_cpu = time.thread_time()
+    tag, payload = blob[:1], blob[1:]
+
+    if tag == TAG_RAW:
+        data = payload
+    elif tag == TAG_ZLIB:
+        data = zlib.decompress(payload)
+    elif tag == TAG_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed data requires the zstandard package")
+        dict_id = zstandard.get_frame_parameters(payload).dict_id
+        dictionary = _dictionaries.get(dict_id) if dict_id else None
+        if dict_id and dictionary is None:
+            raise RuntimeError(f"zstd dictionary {dict_id} not found in {settings.ZSTD_DICT_DIR}")
+        data = zstandard.ZstdDecompressor(dict_data=dictionary).decompress(payload)
+    else:
+        raise ValueError("Unknown compression tag")
+
+    _stats.record(kind, "decompress", len(data), len(blob), time.thread_time() - start_cpu)
+    return data
+
+
+def compress_text(text: str) -> bytes:
+    """Compress text for a BLOB column"""
+    return compress_bytes(text.encode("utf-8"), kind="text")
+
+
+def decompress_text(value: Any) -> str:
+    """Read text written by compress_text; plain strings pass through"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decompress_bytes(bytes(value), kind="text").decode("utf-8")
+    return value
+
+
+def encode_text(text: str) -> str:
+    """Compress text for a TEXT column, as a marked base64 string"""
+    return TEXT_MARKER + base64.b64encode(compress_text(text)).decode("ascii")
+
+
+def decode_text(value: Optional[str]) -> Optional[str]:
+    """Read text written by encode_text; uncompressed text passes through"""
+    if isinstance(value, str) and value.startswith(TEXT_MARKER):
+        return decompress_text(base64.b64decode(value[len(TEXT_MARKER):]))
+    return value
+
+
+def compress_file(source_path: str, kind: str = "upload") -> str:
+    """
+    Compress a file next to itself and remove the original.
+
+    Returns the path of the archive (`.zst` or `.gz` appended), or the
+    original path when compression is disabled.
+    """
+    start_cpu = time.thread_time()
+    raw_size = os.path.getsize(source_path)
+    codec = _codec()
+    if codec == "none":
+        return source_path
+    suffix = ".zst" if codec == "zstd" else ".gz"
+    target_path = source_path + suffix
+    temp_path = target_path + ".tmp"
+
+    with open(source_path, "rb") as source, open(temp_path, "wb") as target:
+        if codec == "zstd":
+            # Archives are decoded by standard tools, so no trained dictionary here
+            compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL, write_content_size=True)
+            compressor.copy_stream(source, target, size=raw_size)
+        else:
+            with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=min(settings.COMPRESSION_LEVEL, 9)) as gz:
+                shutil.copyfileobj(source, gz)
+
+    os.replace(temp_path, target_path)
+    os.remove(source_path)
+
+    _stats.record(kind, "compress", raw_size, os.path.getsize(target_path), time.thread_time() - start_cpu)
+    return target_path
+
+
+def is_archive(path: str) -> bool:
+    """Whether a path is a compressed archive written by compress_file"""
+    return path.endswith(ARCHIVE_SUFFIXES)
+
+
+def strip_archive_suffix(name: str) -> str:
+    """Original file name of an archive"""
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+@contextmanager
+def open_file(path: str, kind: str = "upload") -> Iterator[BinaryIO]:
+    """Open a possibly compressed file as a decompressing binary stream"""
+    start_cpu = time.thread_time()
+    with open(path, "rb") as raw:
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("Reading .zst archives requires the zstandard package")
+            with zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                yield reader
+        elif path.endswith(".gz"):
+            with gzip.GzipFile(fileobj=raw, mode="rb") as reader:
+                yield reader
+        else:
+            yield raw
+    if is_archive(path):
+        _stats.record(kind, "decompress", 0, os.path.getsize(path), time.thread_time() - start_cpu)
+
+
+@contextmanager
+def local_copy(path: str, kind: str = "upload") -> Iterator[str]:
+    """
+    Yield a path to the uncompressed contents of a file.
+
+    Plain files are yielded as-is; archives are decompressed as a stream into
+    a temporary file that is removed afterwards. For tools that need a real
+    file path (poppler, seekable PDF readers).
+    """
+    if not is_archive(path):
+        yield path
+        return
+
+    suffix = os.path.splitext(strip_archive_suffix(path))[1]
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as target, open_file(path, kind=kind) as source:
+            shutil.copyfileobj(source, target)
+        yield temp_path
+    finally:
+        os.remove(temp_path)
+
+
+def train_dictionary(samples: List[bytes], dict_size: int = 112640) -> Optional[int]:
+    """
+    Train a zstd dictionary from sample documents and make it current.
+
+    Dictionaries are kept on disk by ID so values written with older
+    dictionaries stay readable. Returns the new dictionary ID.
+    """
+    if zstandard is None:
+        logger.warning("Dictionary training requires the zstandard package")
+        return None
+
+    dictionary = zstandard.train_dictionary(dict_size, samples, level=settings.COMPRESSION_LEVEL)
+    os.makedirs(settings.ZSTD_DICT_DIR, exist_ok=True)
+    path = os.path.join(settings.ZSTD_DICT_DIR, f"{dictionary.dict_id()}.dict")
+    with open(path, "wb") as f:
+        f.write(dictionary.as_bytes())
+
+    _dictionaries.add(dictionary)
+    logger.info(f"Trained zstd dictionary {dictionary.dict_id()} from {len(samples)} samples")
+    return dictionary.dict_id()
+
+
+def compression_stats() -> Dict[str, Any]:
+    """Codec in use and per-kind ratio and CPU statistics"""
+    current = _dictionaries.get_current()
+    return {
+        "codec": _codec(),
+        "dictionary_id": current.dict_id() if current is not None else None,
+        "kinds": _stats.snapshot(),
+    }
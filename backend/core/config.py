@@ -6,6 +6,11 @@ from typing import List, Optional
 # Load environment variables
 load_dotenv()
 
+def split_list(value: str) -> List[str]:
+    """Items of a comma-separated setting"""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 class Settings(BaseSettings):
     """Application settings"""
     
@@ -20,21 +25,178 @@ class Settings(BaseSettings):
     
     # OpenAI
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"))
+
+    # Outbound HTTP connection pool (shared by all LLM clients)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "120"))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    LLM_WARMUP: bool = os.getenv("LLM_WARMUP", "false").lower() == "true"
+    LLM_WARMUP_CONNECTIONS: int = int(os.getenv("LLM_WARMUP_CONNECTIONS", "2"))
+
+    # Response compression (brotli needs the optional brotli package; gzip otherwise)
+    RESPONSE_COMPRESSION_MIN_SIZE: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
     # Supabase
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
     
+    # Results backend: "supabase", "sqlite", or "auto" (Supabase when configured, else local SQLite)
+    RESULTS_BACKEND: str = os.getenv("RESULTS_BACKEND", "auto").lower()
+    DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data"))
+    SQLITE_RESULTS_PATH: str = os.getenv("SQLITE_RESULTS_PATH", os.path.join(DATA_DIR, "results.db"))
+    # Comma-separated; a List[str] field would make pydantic-settings JSON-decode the variable
+    SQLITE_JSON_INDEX_FIELDS: str = os.getenv("SQLITE_JSON_INDEX_FIELDS", "document_type,title,date")
+    FIELD_INDEX_PATH: str = os.getenv("FIELD_INDEX_PATH", os.path.join(DATA_DIR, "field_index.db"))
+    
+    # Cached outputs of document stages (text, renders, LLM results), reused on reprocessing
+    STAGE_CACHE_PATH: str = os.getenv("STAGE_CACHE_PATH", os.path.join(DATA_DIR, "stage_cache.db"))
+    STAGE_CACHE_MAX_MB: int = int(os.getenv("STAGE_CACHE_MAX_MB", "512"))
+    
+    # Rendered pages and thumbnails on disk, keyed by content hash, page, DPI and format
+    PAGE_CACHE_DIR: str = os.getenv("PAGE_CACHE_DIR", os.path.join(DATA_DIR, "page_cache"))
+    PAGE_CACHE_MAX_MB: int = int(os.getenv("PAGE_CACHE_MAX_MB", "1024"))
+    RENDER_DPI: int = int(os.getenv("RENDER_DPI", "200"))
+    THUMBNAIL_DPI: int = int(os.getenv("THUMBNAIL_DPI", "72"))
+    
+    # PDF engines for the text layer and for rendering: "pypdf2" (PyPDF2 + pdf2image/poppler), "pdfium" or
+    # "pymupdf" (optional, in-process; pymupdf is AGPL and only used when named), or "auto" for pdfium when
+    # installed, else pypdf2; texts of more than
+    # PDF_TEXT_PAGES_PER_TASK pages are extracted in parallel across the CPU pool
+    PDF_TEXT_ENGINE: str = os.getenv("PDF_TEXT_ENGINE", "auto").lower()
+    PDF_RENDER_ENGINE: str = os.getenv("PDF_RENDER_ENGINE", "auto").lower()
+    PDF_TEXT_PAGES_PER_TASK: int = int(os.getenv("PDF_TEXT_PAGES_PER_TASK", "16"))
+    
+    # Pre-filter of rendered pages before vision calls: blank pages have less ink than the ratio,
+    # near-duplicates differ in at most this many of the 256 perceptual hash bits
+    BLANK_PAGE_INK_RATIO: float = float(os.getenv("BLANK_PAGE_INK_RATIO", "0.002"))
+    DUPLICATE_PAGE_MAX_DISTANCE: int = int(os.getenv("DUPLICATE_PAGE_MAX_DISTANCE", "10"))
+    
+    # Vision inputs are deskewed, cropped and scaled to the fewest tiles that keep text lines
+    # VISION_MIN_TEXT_PX tall; VISION_DETAIL "auto" picks the detail level per page, "low"/"high" force one
+    VISION_PREPROCESS: bool = os.getenv("VISION_PREPROCESS", "true").lower() == "true"
+    VISION_DETAIL: str = os.getenv("VISION_DETAIL", "auto")
+    VISION_MIN_TEXT_PX: float = float(os.getenv("VISION_MIN_TEXT_PX", "12"))
+    
+    # Multi-page vision extraction runs as a pipeline: VISION_PAGES_PER_CALL pages per model call
+    # (0 sends every page in one call), at most PIPELINE_QUEUE_SIZE chunks waiting between stages
+    # and PIPELINE_LLM_CONCURRENCY model calls in flight per document
+    VISION_PAGES_PER_CALL: int = int(os.getenv("VISION_PAGES_PER_CALL", "1"))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+    PIPELINE_LLM_CONCURRENCY: int = int(os.getenv("PIPELINE_LLM_CONCURRENCY", "1"))
+    
+    # Layout templates: documents within TEMPLATE_MAX_DISTANCE fingerprint bits of a template whose field
+    # rules held on TEMPLATE_MIN_SAMPLES documents are extracted locally; TEMPLATE_VERIFY_RATE of those are
+    # checked against the model in the background, at most TEMPLATE_VERIFY_CONCURRENCY at a time
+    TEMPLATES_ENABLED: bool = os.getenv("TEMPLATES_ENABLED", "true").lower() == "true"
+    TEMPLATE_STORE_PATH: str = os.getenv("TEMPLATE_STORE_PATH", os.path.join(DATA_DIR, "templates.db"))
+    TEMPLATE_MAX_DISTANCE: int = int(os.getenv("TEMPLATE_MAX_DISTANCE", "6"))
+    TEMPLATE_MIN_SAMPLES: int = int(os.getenv("TEMPLATE_MIN_SAMPLES", "3"))
+    TEMPLATE_VERIFY_RATE: float = float(os.getenv("TEMPLATE_VERIFY_RATE", "0.05"))
+    TEMPLATE_VERIFY_CONCURRENCY: int = int(os.getenv("TEMPLATE_VERIFY_CONCURRENCY", "2"))
+    
+    # Process pool for CPU-bound stages (PDF rendering, image encoding, text extraction); 0 runs them on a thread
+    CPU_POOL_WORKERS: int = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+    CPU_POOL_MAX_PENDING: int = int(os.getenv("CPU_POOL_MAX_PENDING", "32"))
+    CPU_POOL_START_METHOD: str = os.getenv("CPU_POOL_START_METHOD", "forkserver" if os.name == "posix" else "spawn")
+    
+    # Admission control for document processing, per worker (0 disables a limit)
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+    # With several workers sharing state, at most ADMISSION_MAX_CONCURRENT_TOTAL documents run on the host at once
+    ADMISSION_MAX_CONCURRENT_TOTAL: int = int(os.getenv("ADMISSION_MAX_CONCURRENT_TOTAL", os.getenv("ADMISSION_MAX_CONCURRENT", "4")))
+    ADMISSION_MAX_RSS_MB: int = int(os.getenv("ADMISSION_MAX_RSS_MB", "0"))
+    ADMISSION_MIN_AVAILABLE_MB: int = int(os.getenv("ADMISSION_MIN_AVAILABLE_MB", "256"))
+    ADMISSION_PATHS: str = os.getenv("ADMISSION_PATHS", "/api/v1/documents/upload,/api/v1/process")  # comma-separated prefixes
+    
+    # Document requests are cancelled when the client disconnects or after REQUEST_TIMEOUT seconds (0 disables),
+    # or sooner when the caller sends its own budget in seconds in an X-Request-Timeout header
+    REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "300"))
+    
+    # Server workers (set by run_backend.py --workers) and state shared between them
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    SHARED_STATE_BACKEND: str = os.getenv("SHARED_STATE_BACKEND", "auto").lower()  # auto, sqlite, redis or none
+    SHARED_STATE_PATH: str = os.getenv("SHARED_STATE_PATH", os.path.join(DATA_DIR, "shared_state.db"))
+    
+    # Read-through caches
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    CACHE_TTL: float = float(os.getenv("CACHE_TTL", "300"))
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "")  # e.g. redis://localhost:6379/0 for multi-worker setups
+    CACHE_SHARED_LOCAL_TTL: float = float(os.getenv("CACHE_SHARED_LOCAL_TTL", "5"))
+    
+    # Compression of stored text and archived uploads ("auto" prefers zstd, falls back to zlib)
+    COMPRESSION_CODEC: str = os.getenv("COMPRESSION_CODEC", "auto").lower()
+    COMPRESSION_LEVEL: int = int(os.getenv("COMPRESSION_LEVEL", "6"))
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "256"))
+    # Extracted text: "auto" compresses it in SQLite, whose FTS5 index is separate, but not on Supabase,
+    # whose full-text search reads the column itself
+    COMPRESS_EXTRACTED_TEXT: str = os.getenv("COMPRESS_EXTRACTED_TEXT", "auto").lower()
+    COMPRESS_UPLOADS: bool = os.getenv("COMPRESS_UPLOADS", "true").lower() == "true"
+    ZSTD_DICT_DIR: str = os.getenv("ZSTD_DICT_DIR", os.path.join(DATA_DIR, "zstd_dicts"))
+    
+    # Result persistence (write-behind queue)
+    RESULT_WRITER_BATCH_SIZE: int = int(os.getenv("RESULT_WRITER_BATCH_SIZE", "50"))
+    RESULT_WRITER_FLUSH_INTERVAL: float = float(os.getenv("RESULT_WRITER_FLUSH_INTERVAL", "1.0"))
+    RESULT_WRITER_MAX_QUEUE_SIZE: int = int(os.getenv("RESULT_WRITER_MAX_QUEUE_SIZE", "1000"))
+    RESULT_WRITER_MAX_RETRIES: int = int(os.getenv("RESULT_WRITER_MAX_RETRIES", "5"))
+    RESULT_WRITER_RETRY_BACKOFF: float = float(os.getenv("RESULT_WRITER_RETRY_BACKOFF", "0.5"))
+    
+    # Document Q&A (embeddings and local vector index)
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "embeddings.db"))
+    VECTOR_INDEX_BACKEND: str = os.getenv("VECTOR_INDEX_BACKEND", "numpy").lower()
+    VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", os.path.join(DATA_DIR, "vector_index"))
+    QA_CHUNK_SIZE: int = int(os.getenv("QA_CHUNK_SIZE", "1000"))
+    QA_CHUNK_OVERLAP: int = int(os.getenv("QA_CHUNK_OVERLAP", "200"))
+    QA_TOP_K: int = int(os.getenv("QA_TOP_K", "5"))
+    QA_MODEL: str = os.getenv("QA_MODEL", "gpt-4o-mini")
+    
     # LangSmith
     LANGCHAIN_TRACING_V2: bool = os.getenv("LANGCHAIN_TRACING_V2", "false").lower() == "true"
     LANGCHAIN_ENDPOINT: Optional[str] = os.getenv("LANGCHAIN_ENDPOINT")
     LANGCHAIN_API_KEY: Optional[str] = os.getenv("LANGCHAIN_API_KEY")
     LANGCHAIN_PROJECT: Optional[str] = os.getenv("LANGCHAIN_PROJECT", "boga-docai")
     
+    # OpenTelemetry tracing: "none", "console", or "file" (one JSON span per line in TRACING_FILE)
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none").lower()
+    TRACING_FILE: str = os.getenv("TRACING_FILE", os.path.join(DATA_DIR, "traces.jsonl"))
+    TRACING_SERVICE_NAME: str = os.getenv("OTEL_SERVICE_NAME", "boga-docai")
+    
+    # On-demand profiling of single requests, enabled by setting an admin token
+    PROFILING_ADMIN_TOKEN: str = os.getenv("PROFILING_ADMIN_TOKEN", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    PROFILE_SAMPLE_INTERVAL: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+    PROFILE_CONTINUOUS_INTERVAL: float = float(os.getenv("PROFILE_CONTINUOUS_INTERVAL", "0"))  # e.g. 0.1; 0 disables
+    PROFILE_CONTINUOUS_FLUSH: float = float(os.getenv("PROFILE_CONTINUOUS_FLUSH", "30"))
+    
     # File Upload
     UPLOAD_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10 MB
     ALLOWED_EXTENSIONS: List[str] = ["pdf", "png", "jpg", "jpeg"]
+    MAX_PROCESS_PAGES: int = int(os.getenv("MAX_PROCESS_PAGES", "20"))
+    
+    @property
+    def admission_paths(self) -> List[str]:
+        """Path prefixes of the document processing endpoints"""
+        return split_list(self.ADMISSION_PATHS)
+    
+    @property
+    def sqlite_json_index_fields(self) -> List[str]:
+        """Result fields indexed by the SQLite store"""
+        return split_list(self.SQLITE_JSON_INDEX_FIELDS)
+    
+    def compress_extracted_text(self, backend: str) -> bool:
+        """Whether a results backend ("sqlite" or "supabase") stores extracted text compressed"""
+        if self.COMPRESS_EXTRACTED_TEXT == "auto":
+            return backend != "supabase"
+        return self.COMPRESS_EXTRACTED_TEXT == "true"
     
     class Config:
         case_sensitive = True
@@ -42,5 +204,6 @@ class Settings(BaseSettings):
 # Create settings instance
 settings = Settings()
 
-# Ensure upload directory exists
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True) 
\ No newline at end of file
+# Ensure upload and data directories exist
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+os.makedirs(settings.DATA_DIR, exist_ok=True) 
\ No newline at end of file
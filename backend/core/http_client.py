@@ -0,0 +1,127 @@
+"""
+Shared HTTP clients for outbound LLM provider calls.
+
+Every ChatOpenAI wrapper in the backend and in `llm/` is given the same pooled
+sync and async httpx clients, so keep-alive connections and TLS sessions are
+reused instead of being rebuilt per model instance.
+
+The clients live as long as the worker process. Module-level services keep
+references to them, so they are not closed at shutdown; the sockets are
+released when the process exits.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+import httpx
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 is used only when enabled and the optional `h2` package is installed"""
+    return settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def _client_options() -> Dict[str, Any]:
+    """Connection pool, timeout and protocol options shared by both clients"""
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Get the process-wide pooled sync client"""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Get the process-wide pooled async client"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        with _lock:
+            if _async_client is None or _async_client.is_closed:
+                _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+def _warmup_url() -> str:
+    """Cheap authenticated endpoint on the provider used to open connections"""
+    return f"{settings.OPENAI_BASE_URL.rstrip('/')}/models"
+
+
+def _warmup_headers() -> Dict[str, str]:
+    """Headers for warm-up requests"""
+    if not settings.OPENAI_API_KEY:
+        return {}
+    return {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"}
+
+
+async def warm_up(connections: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Open connections to the LLM provider before the worker starts serving.
+
+    Issues `connections` concurrent requests on both the sync and async clients
+    so each pool holds that many established keep-alive connections. Any
+    response status counts as success - only the connection matters here.
+    """
+    connections = connections or settings.LLM_WARMUP_CONNECTIONS
+    url = _warmup_url()
+    headers = _warmup_headers()
+    start_time = time.time()
+
+    def sync_request(_: int) -> bool:
+        try:
+            get_http_client().get(url, headers=headers)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Sync warm-up request to {url} failed: {str(e)}")
+            return False
+
+    async def async_request() -> bool:
+        try:
+            await get_async_http_client().get(url, headers=headers)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Async warm-up request to {url} failed: {str(e)}")
+            return False
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        sync_results = await asyncio.gather(
+            *[loop.run_in_executor(executor, sync_request, i) for i in range(connections)]
+        )
+    async_results = await asyncio.gather(*[async_request() for _ in range(connections)])
+
+    result = {
+        "url": url,
+        "http2": _http2_enabled(),
+        "sync_connections": sum(sync_results),
+        "async_connections": sum(async_results),
+        "warmup_time": time.time() - start_time,
+    }
+    logger.info(f"LLM connection warm-up finished: {result}")
+    return result
+
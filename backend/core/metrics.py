@@ -0,0 +1,197 @@
+"""
+Per-stage timings and Prometheus metrics.
+
+`track_stages()` starts a timing breakdown for one document; anything running
+inside it (FileService, OCRService, LLMService, the CPU pool) wraps its work
+in `stage("name")`, which adds the duration to that document's breakdown and
+to the `docai_stage_seconds` histogram and opens a tracing span of the same
+name. The breakdown travels in a context
+variable, so it follows the request across awaits without being passed
+through every call.
+
+Prometheus export needs the optional `prometheus_client` package; without it
+timings are still collected for responses and `/metrics` reports that
+metrics are unavailable. When the server runs several workers and
+`PROMETHEUS_MULTIPROC_DIR` is set, counters and histograms are aggregated
+across workers.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from backend.core import tracing
+
+try:
+    import prometheus_client
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+# Latency buckets from fast cache hits up to slow multi-page LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+_current_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+if prometheus_client is not None:
+    STAGE_SECONDS = prometheus_client.Histogram(
+        "docai_stage_seconds", "Time spent in each document processing stage", ["stage"], buckets=LATENCY_BUCKETS
+    )
+    STAGE_IN_FLIGHT = prometheus_client.Gauge(
+        "docai_stage_in_flight", "Documents currently in each processing stage", ["stage"], multiprocess_mode="livesum"
+    )
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        "docai_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+    )
+    REQUESTS_IN_FLIGHT = prometheus_client.Gauge(
+        "docai_http_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum"
+    )
+    REQUESTS_CANCELLED = prometheus_client.Counter(
+        "docai_requests_cancelled", "Document requests cancelled before they finished", ["reason"]
+    )
+    STAGE_CANCELLED = prometheus_client.Counter(
+        "docai_stage_cancelled", "Processing stages interrupted by a cancelled request", ["stage"]
+    )
+
+
+@contextmanager
+def track_stages() -> Iterator[Dict[str, float]]:
+    """Collect the stage timings of everything run inside this block"""
+    timings: Dict[str, float] = {}
+    token = _current_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total"] = time.perf_counter() - start
+        _current_timings.reset(token)
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a duration measured elsewhere to the current breakdown and the histogram"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+    if prometheus_client is not None:
+        STAGE_SECONDS.labels(name).observe(seconds)
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[None]:
+    """Time a processing stage and trace it as a span with the given attributes"""
+    if prometheus_client is not None:
+        STAGE_IN_FLIGHT.labels(name).inc()
+    start = time.perf_counter()
+    try:
+        with tracing.span(name, **attributes):
+            yield
+    except asyncio.CancelledError:
+        if prometheus_client is not None:
+            STAGE_CANCELLED.labels(name).inc()
+        raise
+    finally:
+        record(name, time.perf_counter() - start)
+        if prometheus_client is not None:
+            STAGE_IN_FLIGHT.labels(name).dec()
+
+
+def record_cancellation(reason: str) -> None:
+    """Count a request cancelled for the given reason"""
+    if prometheus_client is not None:
+        REQUESTS_CANCELLED.labels(reason).inc()
+
+
+def rounded(timings: Dict[str, float]) -> Dict[str, float]:
+    """Timings rounded to milliseconds for API responses"""
+    return {name: round(seconds, 3) for name, seconds in timings.items()}
+
+
+# Runtime statistics exported as gauges at scrape time: (name, help, source, keys)
+_runtime_sources: List[Tuple[str, str, Callable[[], Dict[str, Any]], List[str]]] = []
+
+
+def register_runtime_stats(prefix: str, description: str, source: Callable[[], Dict[str, Any]], keys: List[str]) -> None:
+    """Export numeric fields of a component's stats() as gauges named docai_<prefix>_<key>"""
+    _runtime_sources.append((prefix, description, source, keys))
+
+
+class _RuntimeCollector:
+    """Reads queue depths and similar values from components when scraped"""
+
+    def collect(self):
+        worker = str(os.getpid())
+        for prefix, description, source, keys in _runtime_sources:
+            try:
+                stats = source()
+            except Exception:
+                continue
+
+            # Sources returning {name: stats} (e.g. caches) get a name label
+            nested = bool(stats) and all(isinstance(value, dict) for value in stats.values())
+            for key in keys:
+                gauge = GaugeMetricFamily(
+                    f"docai_{prefix}_{key}", f"{description}: {key}",
+                    labels=["worker", "name"] if nested else ["worker"]
+                )
+                if nested:
+                    for name, values in stats.items():
+                        if isinstance(values.get(key), (int, float)):
+                            gauge.add_metric([worker, name], float(values[key]))
+                elif isinstance(stats.get(key), (int, float)):
+                    gauge.add_metric([worker], float(stats[key]))
+                yield gauge
+
+
+if prometheus_client is not None:
+    prometheus_client.REGISTRY.register(_RuntimeCollector())
+
+
+def metrics_available() -> bool:
+    """Whether Prometheus export is available"""
+    return prometheus_client is not None
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus exposition of all metrics and its content type"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_RuntimeCollector())
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route and requests in flight"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or prometheus_client is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # Label by route template, not raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.labels(scope["method"], path, str(status["code"])).observe(time.perf_counter() - start)
@@ -0,0 +1,85 @@
+"""
+Pipelined execution of per-item stages.
+
+Items, such as chunks of a document's pages, flow through a chain of
+stages. Each stage is run by its own worker tasks, and the stages are
+connected by bounded queues. While the model reads one chunk, the next is
+rendered and encoded, so a document's latency approaches that of its
+slowest stage rather than the sum of all of them. The queues cap how many
+rendered or encoded chunks wait in memory at once.
+
+A stage returns SKIP to drop an item. The first error cancels the whole
+pipeline and is raised to the caller.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+from backend.core.config import settings
+
+SKIP = object()
+_DONE = object()
+
+
+class Stage:
+    """A named step applied to every item by `concurrency` workers"""
+
+    def __init__(self, name: str, function: Callable[[Any], Awaitable[Any]], concurrency: int = 1):
+        self.name = name
+        self.function = function
+        self.concurrency = max(concurrency, 1)
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_size: int = settings.PIPELINE_QUEUE_SIZE) -> List[Any]:
+    """
+    Push items through the stages.
+
+    Returns the final outputs of the items that were not skipped, in input
+    order. A stage with one worker sees items in input order.
+    """
+    queues = [asyncio.Queue(maxsize=max(queue_size, 1)) for _ in stages]
+    workers_left = [stage.concurrency for stage in stages]
+    results: Dict[int, Any] = {}
+
+    async def finish(position: int) -> None:
+        # The last worker of a stage tells every worker of the next one to stop
+        workers_left[position] -= 1
+        if workers_left[position] == 0 and position + 1 < len(stages):
+            for _ in range(stages[position + 1].concurrency):
+                await queues[position + 1].put(_DONE)
+
+    async def feed() -> None:
+        for index, item in enumerate(items):
+            await queues[0].put((index, item))
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_DONE)
+
+    async def work(position: int) -> None:
+        stage = stages[position]
+        while True:
+            entry = await queues[position].get()
+            if entry is _DONE:
+                break
+            index, value = entry
+            value = await stage.function(value)
+            if value is SKIP:
+                continue
+            if position + 1 < len(stages):
+                await queues[position + 1].put((index, value))
+            else:
+                results[index] = value
+        await finish(position)
+
+    tasks = [asyncio.create_task(feed())]
+    for position, stage in enumerate(stages):
+        tasks.extend(asyncio.create_task(work(position), name=f"pipeline-{stage.name}") for _ in range(stage.concurrency))
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,195 @@
+"""
+Managed process pool for CPU-bound stages.
+
+PDF rendering, PNG and base64 encoding and PDF text extraction hold the GIL,
+so running them on request threads stalls every other request. They are
+submitted here instead and awaited by the async handlers. At most
+`CPU_POOL_MAX_PENDING` tasks are queued or running; further callers wait for
+a slot, so a burst of uploads cannot pile up unbounded work (and memory) in
+the pool. With `CPU_POOL_WORKERS=0` tasks run on a thread instead.
+
+A task that returns a shared memory handle (`{"shm": name, ...}`, see
+cpu_tasks) hands the block to its caller. If the caller was cancelled while
+the task ran, nobody reads the block, so the pool unlinks it.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, Any, Callable, Optional
+
+from backend.core import metrics
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CPUPool:
+    """Bounded process pool with queue wait and run time statistics"""
+
+    def __init__(self,
+                 max_workers: int = settings.CPU_POOL_WORKERS,
+                 max_pending: int = settings.CPU_POOL_MAX_PENDING,
+                 start_method: str = settings.CPU_POOL_START_METHOD):
+        """Configure the pool; worker processes start on first use or start()"""
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_pending)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "running": 0,
+            "total_queue_wait": 0.0, "max_queue_wait": 0.0, "total_run_time": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the executor on first use in this process"""
+        with self._lock:
+            # A pool inherited from a preloading parent process is not usable here
+            if self._executor is None or self._executor_pid != os.getpid():
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        """Drop a broken executor so the next task starts a fresh one"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _record(self, **values: float) -> None:
+        with self._stats_lock:
+            for key, value in values.items():
+                if key == "max_queue_wait":
+                    self._stats[key] = max(self._stats[key], value)
+                else:
+                    self._stats[key] += value
+
+    def start(self) -> None:
+        """Start the worker processes ahead of the first request"""
+        if self.max_workers > 0:
+            executor = self._get_executor()
+            for _ in range(self.max_workers):
+                executor.submit(os.getpid)
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """
+        Run a picklable function in the pool and await its result.
+
+        When the caller is cancelled, a task that has not started is dropped.
+        A running task cannot be interrupted, so it keeps its slot until it
+        ends, and the shared memory it returns is freed.
+        """
+        queued_at = time.perf_counter()
+
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            self._record(cancelled=1)
+            raise
+
+        started_at = time.perf_counter()
+        queue_wait = started_at - queued_at
+        self._record(submitted=1, running=1, total_queue_wait=queue_wait, max_queue_wait=queue_wait)
+        metrics.record("cpu_pool_wait", queue_wait)
+
+        release = True
+        try:
+            if self.max_workers > 0:
+                work = self._get_executor().submit(fn, *args)
+                waiter = asyncio.wrap_future(work)
+            else:
+                # Shielded, since cancelling it would not stop the thread
+                work = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+                waiter = asyncio.shield(work)
+            try:
+                result = await waiter
+            except asyncio.CancelledError:
+                self._record(cancelled=1)
+                if not (self.max_workers > 0 and work.cancel()):
+                    release = False
+                    self._release_when_done(work)
+                raise
+
+            self._record(completed=1)
+            return result
+
+        except BrokenProcessPool:
+            logger.error("CPU pool worker died; restarting the pool")
+            self._reset_executor()
+            self._record(failed=1)
+            raise
+
+        except Exception:
+            self._record(failed=1)
+            raise
+
+        finally:
+            self._record(running=-1, total_run_time=time.perf_counter() - started_at)
+            if release:
+                self._slots.release()
+
+    def _release_when_done(self, work) -> None:
+        """Free the slot and any shared memory result once abandoned work ends"""
+        loop = asyncio.get_running_loop()
+
+        def release(done) -> None:
+            # Retrieve the outcome so an abandoned failure is not logged as unhandled
+            if not done.cancelled() and done.exception() is None:
+                _unlink_shared_memory(done.result())
+            # Process pool futures call back on the executor's thread
+            try:
+                loop.call_soon_threadsafe(self._slots.release)
+            except RuntimeError:
+                pass  # The loop is closed, and the semaphore with it
+
+        work.add_done_callback(release)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, task counts and queue wait statistics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_queue_wait"] = stats["total_queue_wait"] / stats["submitted"] if stats["submitted"] else 0.0
+        stats["avg_run_time"] = stats["total_run_time"] / finished if finished else 0.0
+        stats["workers"] = self.max_workers
+        stats["max_pending"] = self.max_pending
+        return stats
+
+
+def _unlink_shared_memory(result: Any) -> None:
+    """Free the shared memory block of a task result nobody will read"""
+    if not isinstance(result, dict) or "shm" not in result:
+        return
+    try:
+        block = shared_memory.SharedMemory(name=result["shm"])
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+# Create CPU pool instance
+cpu_pool = CPUPool()
+metrics.register_runtime_stats(
+    "cpu_pool", "CPU pool", cpu_pool.stats, ["running", "submitted", "completed", "failed", "cancelled", "avg_queue_wait", "max_pending"]
+)
@@ -0,0 +1,328 @@
+"""
+On-demand and continuous profiling.
+
+A documents request sent with `X-Profile: sample` (or `?profile=sample`) and a
+matching `X-Admin-Token` header is profiled on its own. Its profile id comes
+back in the `X-Profile-Id` response header, and the file can be downloaded
+from /api/v1/profiles/<id>.
+
+- "sample" polls the event loop thread's stack and keeps only the samples
+  inside this request. The result is collapsed stacks (`.folded`) for
+  flamegraph.pl or speedscope. Time the request spends suspended on I/O is
+  counted under "(waiting)".
+- "cprofile" runs cProfile around the request and saves a `.prof` file for
+  pstats or snakeviz. It also sees other requests interleaved on the loop.
+
+With `PROFILE_CONTINUOUS_INTERVAL` set, a background thread samples every
+thread at that interval. Each worker regularly writes its aggregate stacks
+to the profile directory, so hot paths show up across the whole deployment.
+"""
+
+import cProfile
+import hmac
+import json
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from urllib.parse import parse_qs
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+PROFILED_PREFIX = "/api/v1/documents"
+MAX_DISTINCT_STACKS = 20000
+
+
+def profiling_enabled() -> bool:
+    """Whether an admin token is configured"""
+    return bool(settings.PROFILING_ADMIN_TOKEN)
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """Constant-time comparison with the configured admin token"""
+    return profiling_enabled() and bool(token) and hmac.compare_digest(token, settings.PROFILING_ADMIN_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame, anchor=None) -> Optional[str]:
+    """Root-first stack of a frame, cut at `anchor`; None when the anchor is not on the stack"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        if frame is anchor:
+            break
+        frame = frame.f_back
+    else:
+        if anchor is not None:
+            return None
+    return ";".join(reversed(labels))
+
+
+def _folded(stacks: Counter) -> str:
+    """Collapsed-stack text, one "stack count" line per stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class _RequestSampler(threading.Thread):
+    """Samples one thread's stack, keeping frames at or below an anchor frame"""
+
+    def __init__(self, thread_id: int, anchor, interval: float):
+        super().__init__(name="request-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.anchor = anchor
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = _collapse(frame, self.anchor) if frame is not None else None
+            self.stacks[stack or "(waiting)"] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class ProfileStore:
+    """Profile files and their metadata in a directory, oldest pruned first"""
+
+    def __init__(self, directory: str = settings.PROFILE_DIR, max_files: int = settings.PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, profile_id: str, extension: str, data: bytes, meta: Dict[str, Any]) -> None:
+        """Write a profile and its metadata atomically"""
+        os.makedirs(self.directory, exist_ok=True)
+        meta = dict(meta, id=profile_id, file=f"{profile_id}{extension}", created_at=time.time())
+        for name, content in ((meta["file"], data), (f"{profile_id}.json", json.dumps(meta).encode())):
+            path = os.path.join(self.directory, name)
+            with open(path + ".tmp", "wb") as file:
+                file.write(content)
+            os.replace(path + ".tmp", path)
+        self._prune()
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    try:
+                        with open(os.path.join(self.directory, name)) as file:
+                            profiles.append(json.load(file))
+                    except (OSError, ValueError):
+                        continue
+        return sorted(profiles, key=lambda meta: meta.get("created_at", 0), reverse=True)
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Path of a profile file, or None"""
+        for meta in self.list():
+            if meta["id"] == profile_id:
+                path = os.path.join(self.directory, meta["file"])
+                return path if os.path.exists(path) else None
+        return None
+
+    def _prune(self) -> None:
+        for meta in self.list()[self.max_files:]:
+            for name in (meta["file"], f"{meta['id']}.json"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+profile_store = ProfileStore()
+
+
+class ProfileMiddleware:
+    """ASGI middleware profiling admin-requested documents requests"""
+
+    def __init__(self, app):
+        self.app = app
+        # One profiled request at a time per worker; cProfile cannot nest
+        self._busy = threading.Lock()
+
+    @staticmethod
+    def _requested_mode(scope) -> Optional[str]:
+        if scope["type"] != "http" or not profiling_enabled() or not scope["path"].startswith(PROFILED_PREFIX):
+            return None
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        mode = headers.get("x-profile") or (query.get("profile") or [""])[0]
+        if mode in ("1", "true"):
+            mode = "sample"
+
+        # Unauthorised or unknown requests are served normally, without a hint that profiling exists
+        if mode not in PROFILE_MODES or not check_admin_token(headers.get("x-admin-token")):
+            return None
+        return mode
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope)
+        if mode is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        status = {"code": 500}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = profiler = None
+        if mode == "sample":
+            sampler = _RequestSampler(threading.get_ident(), sys._getframe(), settings.PROFILE_SAMPLE_INTERVAL)
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                if sampler is not None:
+                    data, extension = _folded(sampler.stop()).encode(), ".folded"
+                else:
+                    profiler.disable()
+                    profiler.create_stats()
+                    data, extension = marshal.dumps(profiler.stats), ".prof"
+
+                profile_store.save(profile_id, extension, data, {
+                    "mode": mode,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "duration": round(duration, 3),
+                    "worker": os.getpid(),
+                })
+            except Exception as e:
+                logger.exception(f"Saving profile {profile_id} failed: {str(e)}")
+            finally:
+                self._busy.release()
+
+
+class ContinuousSampler:
+    """Low-overhead background sampler of every thread, aggregated as collapsed stacks"""
+
+    def __init__(self,
+                 interval: float = settings.PROFILE_CONTINUOUS_INTERVAL,
+                 flush_interval: float = settings.PROFILE_CONTINUOUS_FLUSH,
+                 directory: str = settings.PROFILE_DIR):
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.directory = directory
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling if an interval is configured"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="continuous-sampler", daemon=True)
+        self._thread.start()
+        logger.info(f"Continuous profiling every {self.interval}s")
+
+    def stop(self) -> None:
+        """Stop sampling and write the final aggregate"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = _collapse(frame)
+                    if stack in self.stacks or len(self.stacks) < MAX_DISTINCT_STACKS:
+                        self.stacks[stack] += 1
+                    else:
+                        self.stacks["(other stacks)"] += 1
+                self.samples += 1
+
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"continuous-{os.getpid()}.folded")
+
+    def flush(self) -> None:
+        """Write this worker's aggregate stacks"""
+        with self._lock:
+            if not self.samples:
+                return
+            data = _folded(self.stacks)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path()
+            with open(path + ".tmp", "w") as file:
+                file.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"Writing continuous profile failed: {str(e)}")
+
+    def aggregate(self) -> str:
+        """Collapsed stacks merged across every worker's last flush"""
+        self.flush()
+        merged: Counter = Counter()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if not (name.startswith("continuous-") and name.endswith(".folded")):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name)) as file:
+                        for line in file:
+                            stack, _, count = line.rstrip("\n").rpartition(" ")
+                            if stack and count.isdigit():
+                                merged[stack] += int(count)
+                except OSError:
+                    continue
+        return _folded(merged)
+
+    def stats(self) -> Dict[str, Any]:
+        """Sampling interval and aggregate size for this worker"""
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval": self.interval,
+                "samples": self.samples,
+                "distinct_stacks": len(self.stacks),
+            }
+
+
+# Create continuous sampler instance
+continuous_sampler = ContinuousSampler()
@@ -0,0 +1,185 @@
+"""
+Key-value state shared by all server workers.
+
+With several worker processes, anything kept only in process memory (cache
+entries and their invalidations, counters for rate limits, job state)
+diverges between workers. Such state is kept here instead: in Redis when
+`CACHE_REDIS_URL` is set, otherwise in a local SQLite file that every worker
+on the machine opens. `SHARED_STATE_BACKEND=auto` only enables the store when
+the server runs more than one worker.
+"""
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from backend.core.config import settings
+from backend.core.sqlite_connections import ThreadConnections
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+# Expired SQLite entries are purged after this many writes
+PURGE_EVERY = 500
+
+
+class SharedStore(ABC):
+    """Namespaced key-value store with per-key TTLs"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """Get a value, or MISSING"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Set a JSON-serializable value with a TTL in seconds"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete a value"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add to a counter and return the new value; the TTL starts with the counter"""
+
+
+class RedisSharedStore(SharedStore):
+    """Shared store in a Redis server"""
+
+    def __init__(self, url: str, namespace: str):
+        """Connect to Redis; requires the optional `redis` package"""
+        import redis
+
+        super().__init__(namespace)
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def _key(self, key: str) -> str:
+        return f"docai:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self._key(key))
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(self._key(key), json.dumps(value, default=str), px=max(int(ttl * 1000), 1))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self._key(key))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        pipeline = self.client.pipeline()
+        pipeline.incrby(self._key(key), amount)
+        if ttl is not None:
+            pipeline.pexpire(self._key(key), max(int(ttl * 1000), 1), nx=True)
+        return int(pipeline.execute()[0])
+
+
+class SQLiteSharedStore(SharedStore):
+    """Shared store in a local SQLite file, for workers on one machine"""
+
+    _schema_lock = threading.Lock()
+    _schema_paths = set()
+
+    def __init__(self, db_path: str, namespace: str):
+        """Open the store and create its table if needed"""
+        super().__init__(namespace)
+        self._connections = ThreadConnections(db_path)
+        self._writes = 0
+
+        with self._schema_lock:
+            if db_path not in self._schema_paths:
+                with self._connections.get() as conn:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS shared_state (
+                            namespace TEXT NOT NULL,
+                            key TEXT NOT NULL,
+                            value TEXT NOT NULL,
+                            expires_at REAL NOT NULL,
+                            PRIMARY KEY (namespace, key)
+                        ) WITHOUT ROWID
+                    """)
+                self._schema_paths.add(db_path)
+
+    def get(self, key: str) -> Any:
+        row = self._connections.get().execute(
+            "SELECT value FROM shared_state WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time())
+        ).fetchone()
+        return MISSING if row is None else json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._connections.get() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, default=str), time.time() + ttl)
+            )
+        self._count_write()
+
+    def delete(self, key: str) -> None:
+        with self._connections.get() as conn:
+            conn.execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else float("inf")
+        with self._connections.get() as conn:
+            # An expired counter restarts from zero with a fresh TTL
+            row = conn.execute(
+                """
+                INSERT INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET
+                    value = CASE WHEN expires_at <= ? THEN excluded.value ELSE CAST(value AS INTEGER) + ? END,
+                    expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+                RETURNING value
+                """,
+                (self.namespace, key, str(amount), expires_at, now, amount, now)
+            ).fetchone()
+        self._count_write()
+        return int(row[0])
+
+    def _count_write(self) -> None:
+        """Purge expired entries every PURGE_EVERY writes"""
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            with self._connections.get() as conn:
+                conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+
+
+def shared_state_backend() -> Optional[str]:
+    """Configured shared state backend: "redis", "sqlite" or None"""
+    backend = settings.SHARED_STATE_BACKEND
+    if backend == "auto":
+        if settings.CACHE_REDIS_URL:
+            return "redis"
+        return "sqlite" if settings.WORKERS > 1 else None
+    return None if backend == "none" else backend
+
+
+_stores: Dict[str, SharedStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_shared_store(namespace: str) -> Optional[SharedStore]:
+    """Get the shared store for a namespace, or None when state is process-local"""
+    backend = shared_state_backend()
+    if backend is None:
+        return None
+
+    with _stores_lock:
+        if namespace not in _stores:
+            if backend == "redis":
+                try:
+                    _stores[namespace] = RedisSharedStore(settings.CACHE_REDIS_URL, namespace)
+                except ImportError:
+                    logger.warning("CACHE_REDIS_URL is set but the redis package is not installed; using the SQLite shared store")
+                    _stores[namespace] = SQLiteSharedStore(settings.SHARED_STATE_PATH, namespace)
+            else:
+                _stores[namespace] = SQLiteSharedStore(settings.SHARED_STATE_PATH, namespace)
+        return _stores[namespace]
@@ -0,0 +1,50 @@
+"""
+Per-thread SQLite connections that are safe across worker forks.
+
+The local SQLite files (results, field index, embedding cache, shared state)
+are opened by several threads and, in the multi-worker server, by several
+processes. A connection must never be used by a process other than the one
+that opened it, so connections are keyed by process ID as well as by thread:
+anything opened while the app was preloaded in the server's master process
+is simply reopened in each worker.
+
+In-memory databases are rejected: every connection to ":memory:" opens its
+own empty database, so one thread's writes would be invisible to the rest.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional, Callable
+
+
+class ThreadConnections:
+    """Lazily opened SQLite connection per thread and per process"""
+
+    def __init__(self,
+                 db_path: str,
+                 row_factory: Optional[Callable] = None,
+                 synchronous: Optional[str] = "NORMAL",
+                 timeout: float = 30):
+        """Remember connection settings; nothing is opened until first use"""
+        if db_path == ":memory:" or db_path.startswith("file::memory:") or "mode=memory" in db_path:
+            raise ValueError("Per-thread connections need a database file, not an in-memory database")
+        self.db_path = db_path
+        self.row_factory = row_factory
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it if needed"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous:
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
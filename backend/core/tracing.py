@@ -0,0 +1,115 @@
+"""
+OpenTelemetry tracing.
+
+Every `metrics.stage()` opens a span of the same name, and LLM calls,
+Supabase requests, result writer flushes and LangGraph nodes open their own,
+so one trace shows where a slow request spent its time. Attributes such as
+page counts, byte sizes and token usage are attached with `add_attributes()`.
+
+Tracing needs the optional `opentelemetry-sdk` package and is off unless
+`TRACING_EXPORTER` is set: "console" prints spans to stdout, "file" appends
+one JSON span per line to `TRACING_FILE`. Without the SDK, or with tracing
+off, spans are no-ops.
+"""
+
+import functools
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from backend.core.config import settings
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+_provider = None
+
+
+def configure_tracing() -> bool:
+    """Install the configured exporter; returns whether spans are recorded"""
+    global _provider
+    if _provider is not None:
+        return True
+    if settings.TRACING_EXPORTER in ("", "none") or trace is None:
+        return False
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("TRACING_EXPORTER is set but opentelemetry-sdk is not installed; tracing disabled")
+        return False
+
+    if settings.TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter(out=sys.stdout)
+    elif settings.TRACING_EXPORTER == "file":
+        os.makedirs(os.path.dirname(settings.TRACING_FILE) or ".", exist_ok=True)
+        exporter = ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    else:
+        logger.warning(f"Unknown TRACING_EXPORTER '{settings.TRACING_EXPORTER}'; tracing disabled")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({
+        "service.name": settings.TRACING_SERVICE_NAME,
+        "service.instance.id": str(os.getpid()),
+    }))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    logger.info(f"Tracing enabled ({settings.TRACING_EXPORTER} exporter)")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans"""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+def _clean(attributes: dict) -> dict:
+    """Drop unset values; span attributes must be primitives"""
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items() if value is not None
+    }
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Any]]:
+    """Run a block inside a span, marking it as failed if the block raises"""
+    if trace is None:
+        yield None
+        return
+
+    tracer = trace.get_tracer("boga-docai")
+    with tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def add_attributes(**attributes: Any) -> None:
+    """Attach attributes to the current span"""
+    if trace is not None:
+        trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator running a synchronous function inside a span"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
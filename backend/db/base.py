@@ -0,0 +1,125 @@
+"""
+Results backend interface.
+
+Every results store (Supabase, local SQLite) implements this interface so
+routes and the result writer do not care where documents are persisted.
+Methods follow the rest of the db layer and report failures as
+`{"error": ...}` dicts instead of raising.
+"""
+
+import base64
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional
+
+
+# Columns of a stored document result. Listings return the summary fields
+# unless more are requested; the large fields are fetched only on demand.
+SUMMARY_FIELDS = ["id", "file_name", "file_type", "created_at"]
+LARGE_FIELDS = ["extracted_text", "json_result"]
+DOCUMENT_FIELDS = SUMMARY_FIELDS + LARGE_FIELDS
+
+
+def resolve_fields(fields: Optional[List[str]], default: Optional[List[str]] = None) -> List[str]:
+    """
+    Validate a field projection.
+    
+    `id` and `created_at` are always included because listing cursors are
+    built from them. Raises ValueError for unknown fields.
+    """
+    if not fields:
+        fields = default or SUMMARY_FIELDS
+    
+    unknown = [field for field in fields if field not in DOCUMENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(DOCUMENT_FIELDS)}")
+    
+    resolved = ["id", "created_at"]
+    for field in fields:
+        if field not in resolved:
+            resolved.append(field)
+    return resolved
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode keyset pagination values into an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by `encode_cursor`"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+class ResultsStore(ABC):
+    """Interface for document result storage backends"""
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        """Whether the backend is configured and can accept writes"""
+
+    def store_document_result(self,
+                              file_name: str,
+                              file_type: str,
+                              extracted_text: str,
+                              json_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a single document processing result"""
+        return self.store_document_results([{
+            "file_name": file_name,
+            "file_type": file_type,
+            "extracted_text": extracted_text,
+            "json_result": json_result
+        }])
+
+    @abstractmethod
+    def store_document_results(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Store a batch of document processing results"""
+
+    def get_document_results(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get the most recent document results with all fields"""
+        result = self.list_document_results(fields=DOCUMENT_FIELDS, limit=limit)
+        if "error" in result:
+            return [{"error": result["error"]}]
+        return result["results"]
+
+    @abstractmethod
+    def list_document_results(self,
+                              fields: Optional[List[str]] = None,
+                              limit: int = 100,
+                              cursor: Optional[str] = None,
+                              raw_json: bool = False) -> Dict[str, Any]:
+        """
+        List document results, newest first, with keyset pagination.
+
+        Only the projected `fields` are fetched (summary fields by default).
+        With `raw_json`, backends that keep JSON as text may return
+        `json_result` undecoded so it can be passed through to the response.
+        Returns `{"results": [...], "next_cursor": str | None}`.
+        """
+
+    @abstractmethod
+    def get_document_by_id(self, doc_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get a document result by ID, optionally projected to `fields`"""
+
+    @abstractmethod
+    def delete_document_result(self, doc_id: str) -> Dict[str, Any]:
+        """Delete a document result by ID"""
+
+    @abstractmethod
+    def search_documents(self,
+                         query: str,
+                         limit: int = 20,
+                         cursor: Optional[str] = None,
+                         filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Full-text search over extracted text and JSON results.
+
+        Returns `{"results": [...], "next_cursor": str | None}`; pass
+        `next_cursor` back to fetch the following page.
+        """
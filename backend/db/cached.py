@@ -0,0 +1,81 @@
+"""
+Read-through caching for the results store.
+
+Full document lookups by ID are served from a bounded TTL cache and
+invalidated whenever the document is written or deleted. As the front of
+the results store it also publishes store events for ingest-time indexes.
+"""
+
+from typing import Dict, Any, List, Optional
+
+from backend.core.cache import get_cache
+from backend.db import events
+from backend.db.base import ResultsStore, DOCUMENT_FIELDS, resolve_fields
+
+
+class CachedResultsStore(ResultsStore):
+    """Results store wrapper that caches get_document_by_id"""
+
+    def __init__(self, store: ResultsStore):
+        """Wrap an existing results store"""
+        self.store = store
+        self.cache = get_cache("documents")
+
+    def is_available(self) -> bool:
+        return self.store.is_available()
+
+    def store_document_results(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        result = self.store.store_document_results(records)
+        stored = []
+        for record, row in zip(records, result.get("data") or []):
+            if row.get("id") is not None:
+                self.cache.invalidate(str(row["id"]))
+                stored.append(dict(record, id=str(row["id"]), created_at=row.get("created_at")))
+        events.emit_stored(stored)
+        return result
+
+    def list_document_results(self,
+                              fields: Optional[List[str]] = None,
+                              limit: int = 100,
+                              cursor: Optional[str] = None,
+                              raw_json: bool = False) -> Dict[str, Any]:
+        return self.store.list_document_results(fields=fields, limit=limit, cursor=cursor, raw_json=raw_json)
+
+    def get_document_by_id(self, doc_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get a document result by ID.
+
+        Only full documents are cached. A projected lookup is answered from a
+        cached full document when there is one, and otherwise goes to the
+        store so large columns are still fetched lazily.
+        """
+        if fields and set(fields) != set(DOCUMENT_FIELDS):
+            try:
+                columns = resolve_fields(fields)
+            except ValueError as e:
+                return {"error": str(e)}
+
+            document = self.cache.get(doc_id)
+            if document is None:
+                return self.store.get_document_by_id(doc_id, fields=fields)
+            return {column: document.get(column) for column in columns}
+
+        return self.cache.get_or_load(
+            doc_id,
+            lambda: self.store.get_document_by_id(doc_id),
+            should_cache=lambda document: "error" not in document
+        )
+
+    def delete_document_result(self, doc_id: str) -> Dict[str, Any]:
+        result = self.store.delete_document_result(doc_id)
+        self.cache.invalidate(doc_id)
+        if "error" not in result:
+            events.emit_deleted(doc_id)
+        return result
+
+    def search_documents(self,
+                         query: str,
+                         limit: int = 20,
+                         cursor: Optional[str] = None,
+                         filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        return self.store.search_documents(query, limit=limit, cursor=cursor, filters=filters)
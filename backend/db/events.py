@@ -0,0 +1,53 @@
+"""
+Result store events.
+
+Indexes built on top of stored results (embeddings, field postings) subscribe
+here instead of being called from every write path. Subscribers run on a
+single background thread, in order, so ingest-time indexing never adds to
+request latency and never races with itself.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+_stored_subscribers: List[Callable[[List[Dict[str, Any]]], None]] = []
+_deleted_subscribers: List[Callable[[str], None]] = []
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-events")
+
+
+def on_stored(callback: Callable[[List[Dict[str, Any]]], None]) -> None:
+    """Subscribe to newly stored documents (each with its `id`)"""
+    _stored_subscribers.append(callback)
+
+
+def on_deleted(callback: Callable[[str], None]) -> None:
+    """Subscribe to deleted document IDs"""
+    _deleted_subscribers.append(callback)
+
+
+def _run(callback: Callable, argument: Any) -> None:
+    try:
+        callback(argument)
+    except Exception as e:
+        logger.exception(f"Result event subscriber {getattr(callback, '__qualname__', callback)} failed: {str(e)}")
+
+
+def emit_stored(documents: List[Dict[str, Any]]) -> None:
+    """Notify subscribers about stored documents"""
+    if documents:
+        for callback in _stored_subscribers:
+            _executor.submit(_run, callback, documents)
+
+
+def emit_deleted(doc_id: str) -> None:
+    """Notify subscribers about a deleted document"""
+    for callback in _deleted_subscribers:
+        _executor.submit(_run, callback, doc_id)
+
+
+def drain(timeout: float = 30.0) -> None:
+    """Wait for all pending subscriber calls to finish"""
+    _executor.submit(lambda: None).result(timeout=timeout)
@@ -0,0 +1,296 @@
+"""
+Inverted index over JSON result fields.
+
+Every scalar in a document's `json_result` becomes a posting
+`(path, value, doc_id)`; list positions are collapsed so `items[].price`
+covers every line item. String values are kept lowercased for exact and
+substring matches, and values that look like numbers (including "$1,200.50")
+are also kept as numbers for range queries. The index lives in its own SQLite
+file next to the results and is updated incrementally from store events, so
+structured filters never load or decode stored documents.
+"""
+
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.core.config import settings
+from backend.core.sqlite_connections import ThreadConnections
+from backend.db import events
+from backend.db.base import encode_cursor, decode_cursor
+
+# Longest string value kept in the index; longer values are truncated
+MAX_VALUE_LENGTH = 256
+
+# Numbers as they appear in extracted documents: "1200", "-3.5", "$1,200.50"
+NUMBER_PATTERN = re.compile(r"^\s*([-+]?)\s*[$€£]?\s*([-+]?)(\d[\d,]*(?:\.\d+)?|\.\d+)\s*$")
+
+OPERATORS = ("eq", "gt", "gte", "lt", "lte", "contains", "exists")
+RANGE_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _number(value: Any) -> Optional[float]:
+    """Numeric value of a JSON scalar, if it has one"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = NUMBER_PATTERN.match(value)
+        if match:
+            sign = "-" if "-" in (match.group(1), match.group(2)) else ""
+            return float(sign + match.group(3).replace(",", ""))
+    return None
+
+
+def _string(value: Any) -> str:
+    """Normalized string value of a JSON scalar"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).strip().lower()[:MAX_VALUE_LENGTH]
+
+
+def _postings(value: Any, path: str = "") -> List[Tuple[str, Any]]:
+    """(path, scalar) pairs of a JSON value"""
+    if isinstance(value, dict):
+        pairs = []
+        for key, item in value.items():
+            pairs.extend(_postings(item, f"{path}.{key}" if path else str(key)))
+        return pairs
+    if isinstance(value, list):
+        pairs = []
+        for item in value:
+            pairs.extend(_postings(item, f"{path}[]"))
+        return pairs
+    if value is None or value == "":
+        return []
+    return [(path, value)]
+
+
+class FieldIndex:
+    """Field-path inverted index stored in SQLite"""
+
+    def __init__(self, db_path: str = settings.FIELD_INDEX_PATH):
+        """Initialize the index and create the schema if needed"""
+        self.db_path = db_path
+        self._connections = ThreadConnections(db_path, row_factory=sqlite3.Row)
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._create_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        return self._connections.get()
+
+    def _create_schema(self) -> None:
+        """Create the document and postings tables"""
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at, doc_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    path TEXT NOT NULL,
+                    sval TEXT NOT NULL,
+                    nval REAL,
+                    doc_id TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_string ON postings (path, sval, doc_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_number ON postings (path, nval, doc_id) WHERE nval IS NOT NULL")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id)")
+
+    def index_documents(self, documents: List[Dict[str, Any]]) -> int:
+        """Add or replace the postings of documents; returns the number of postings written"""
+        written = 0
+        conn = self._connection()
+        with conn:
+            for document in documents:
+                doc_id = str(document["id"])
+                json_result = document.get("json_result") or {}
+                if isinstance(json_result, str):
+                    json_result = json.loads(json_result)
+
+                conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (doc_id, file_name, file_type, created_at) VALUES (?, ?, ?, ?)",
+                    (
+                        doc_id,
+                        document.get("file_name", ""),
+                        document.get("file_type", ""),
+                        document.get("created_at") or datetime.now(timezone.utc).isoformat()
+                    )
+                )
+
+                rows = list(dict.fromkeys(
+                    (path, _string(value), _number(value), doc_id) for path, value in _postings(json_result)
+                ))
+                conn.executemany("INSERT INTO postings (path, sval, nval, doc_id) VALUES (?, ?, ?, ?)", rows)
+                written += len(rows)
+
+        return written
+
+    def remove_document(self, doc_id: str) -> None:
+        """Remove a document's postings"""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def has_document(self, doc_id: str) -> bool:
+        """Whether a document is indexed"""
+        row = self._connection().execute("SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _condition_sql(condition: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """SQL selecting the doc IDs that satisfy one condition"""
+        path = condition.get("path") or ""
+        op = condition.get("op", "eq")
+        value = condition.get("value")
+
+        if not path:
+            raise ValueError("Condition path is required")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator '{op}'. Supported operators: {', '.join(OPERATORS)}")
+        if op != "exists" and value is None:
+            raise ValueError(f"Operator '{op}' needs a value")
+
+        # '*' in a path matches any run of characters, e.g. "*.total" or "items[].*"
+        if "*" in path:
+            where, params = ["path GLOB ?"], [path.replace("[", "[[]")]
+        else:
+            where, params = ["path = ?"], [path]
+
+        if op == "eq":
+            number = _number(value) if not isinstance(value, str) else None
+            if number is not None:
+                where.append("nval = ?")
+                params.append(number)
+            else:
+                where.append("sval = ?")
+                params.append(_string(value))
+        elif op in RANGE_OPERATORS:
+            # Numbers compare numerically; strings (e.g. ISO dates) compare as text
+            number = _number(value)
+            if number is not None:
+                where.append(f"nval {RANGE_OPERATORS[op]} ?")
+                params.append(number)
+            else:
+                where.append(f"sval {RANGE_OPERATORS[op]} ?")
+                params.append(_string(value))
+        elif op == "contains":
+            where.append("instr(sval, ?) > 0")
+            params.append(_string(value))
+
+        return f"SELECT doc_id FROM postings WHERE {' AND '.join(where)}", params
+
+    def query(self,
+              conditions: List[Dict[str, Any]],
+              limit: int = 100,
+              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Documents matching all conditions, newest first.
+
+        Each condition is `{"path": ..., "op": ..., "value": ...}`. Results are
+        paged by (created_at, doc_id) like the result listings.
+        """
+        if not conditions:
+            return {"error": "At least one condition is required"}
+
+        try:
+            parts = [self._condition_sql(condition) for condition in conditions]
+        except ValueError as e:
+            return {"error": str(e)}
+
+        matching = " INTERSECT ".join(sql for sql, _ in parts)
+        params: List[Any] = [param for _, condition_params in parts for param in condition_params]
+
+        sql = f"SELECT doc_id, file_name, file_type, created_at FROM documents WHERE doc_id IN ({matching})"
+        if cursor:
+            try:
+                last_created_at, last_id = decode_cursor(cursor)
+            except ValueError as e:
+                return {"error": str(e)}
+            sql += " AND (created_at, doc_id) < (?, ?)"
+            params.extend([last_created_at, last_id])
+
+        sql += " ORDER BY created_at DESC, doc_id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        try:
+            rows = self._connection().execute(sql, params).fetchall()
+        except Exception as e:
+            return {"error": str(e)}
+
+        results = [
+            {"id": row["doc_id"], "file_name": row["file_name"], "file_type": row["file_type"], "created_at": row["created_at"]}
+            for row in rows[:limit]
+        ]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor([last["created_at"], last["doc_id"]])
+
+        return {"results": results, "next_cursor": next_cursor}
+
+    def paths(self, prefix: str = "", limit: int = 200) -> List[Dict[str, Any]]:
+        """Indexed field paths with the number of documents that have them"""
+        rows = self._connection().execute(
+            "SELECT path, COUNT(DISTINCT doc_id) AS documents FROM postings "
+            "WHERE path >= ? AND path < ? GROUP BY path ORDER BY documents DESC, path LIMIT ?",
+            (prefix, prefix + "\uffff", limit)
+        ).fetchall()
+        return [{"path": row["path"], "documents": row["documents"]} for row in rows]
+
+    def reindex(self, store, page_size: int = 100) -> Dict[str, Any]:
+        """Index stored documents that are missing from the index"""
+        cursor = None
+        scanned = 0
+        indexed = 0
+
+        while True:
+            page = store.list_document_results(
+                fields=["file_name", "file_type", "json_result"],
+                limit=page_size,
+                cursor=cursor
+            )
+            if "error" in page:
+                return {"success": False, "error": page["error"]}
+
+            missing = [document for document in page["results"] if not self.has_document(str(document["id"]))]
+            self.index_documents(missing)
+            scanned += len(page["results"])
+            indexed += len(missing)
+
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+
+        return {"success": True, "documents_scanned": scanned, "documents_indexed": indexed}
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size statistics"""
+        conn = self._connection()
+        return {
+            "documents": conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            "postings": conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0],
+            "paths": conn.execute("SELECT COUNT(DISTINCT path) FROM postings").fetchone()[0],
+        }
+
+
+# Create field index instance, kept in step with the results store
+field_index = FieldIndex()
+events.on_stored(field_index.index_documents)
+events.on_deleted(field_index.remove_document)
@@ -0,0 +1,318 @@
+"""
+Local SQLite results store.
+
+Extracted text is indexed with FTS5 for ranked full-text search and stored
+compressed (COMPRESS_EXTRACTED_TEXT), and a
+configurable set of JSON result fields is exposed as generated columns with
+B-tree indexes so they can be filtered without decoding every row. The store
+also serves as an offline stand-in for Supabase.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from backend.core.compression import compress_text, decompress_text
+from backend.core.config import settings
+from backend.core.sqlite_connections import ThreadConnections
+from backend.db.base import ResultsStore, DOCUMENT_FIELDS, resolve_fields, encode_cursor, decode_cursor
+
+# Valid JSON field path for generated columns, e.g. "vendor.name"
+FIELD_PATH_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+# Characters FTS5 treats as syntax; stripped from user search terms
+FTS_SPECIAL_CHARS = re.compile(r'["()^:{}\[\]+\-]')
+
+
+def _field_column(path: str) -> str:
+    """Column name of the generated column for a JSON field path"""
+    return "jf_" + path.replace(".", "_")
+
+
+def _json_text(value: Any) -> str:
+    """Flatten the scalar values of a JSON result into searchable text"""
+    if isinstance(value, dict):
+        return " ".join(_json_text(v) for v in value.values())
+    if isinstance(value, list):
+        return " ".join(_json_text(v) for v in value)
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query that matches all terms"""
+    terms = []
+    for term in FTS_SPECIAL_CHARS.sub(" ", query).split():
+        if term.upper() in ("AND", "OR", "NOT", "NEAR"):
+            continue
+        if term.endswith("*") and len(term) > 1:
+            terms.append(f'"{term.rstrip("*")}"*')
+        else:
+            terms.append(f'"{term.strip("*")}"')
+    return " ".join(term for term in terms if term != '""')
+
+
+class SQLiteResultsStore(ResultsStore):
+    """Results store backed by a local SQLite database"""
+
+    def __init__(self, db_path: str = settings.SQLITE_RESULTS_PATH, json_fields: Optional[List[str]] = None):
+        """Initialize the store and create the schema if needed"""
+        self.db_path = db_path
+        self.json_fields = [
+            field for field in (json_fields if json_fields is not None else settings.sqlite_json_index_fields)
+            if FIELD_PATH_PATTERN.match(field)
+        ]
+        self._connections = ThreadConnections(db_path, row_factory=sqlite3.Row)
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._create_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        return self._connections.get()
+
+    def _create_schema(self) -> None:
+        """Create tables, the FTS index and JSON field columns"""
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_results (
+                    id TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    extracted_text TEXT NOT NULL DEFAULT '',
+                    json_result TEXT NOT NULL DEFAULT '{}',
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_document_results_created ON document_results (created_at, id)")
+
+            # Contentless index: the text lives only in document_results, so the
+            # stored representation can change without rebuilding the index
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS document_fts USING fts5(
+                    file_name, extracted_text, json_text,
+                    content='', tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+
+            # Generated columns for indexed JSON fields
+            existing = {row["name"] for row in conn.execute("PRAGMA table_xinfo(document_results)")}
+            for field in self.json_fields:
+                column = _field_column(field)
+                if column not in existing:
+                    conn.execute(
+                        f"ALTER TABLE document_results ADD COLUMN {column} "
+                        f"GENERATED ALWAYS AS (json_extract(json_result, '$.{field}')) VIRTUAL"
+                    )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{column} ON document_results ({column})")
+
+    def is_available(self) -> bool:
+        """The local store is always available"""
+        return True
+
+    def _row_to_document(self, row: sqlite3.Row, decode_json: bool = True) -> Dict[str, Any]:
+        """Convert a row into the document dict returned by the API"""
+        document = {key: row[key] for key in row.keys()}
+        if "extracted_text" in document:
+            document["extracted_text"] = decompress_text(document["extracted_text"])
+        if decode_json and isinstance(document.get("json_result"), str):
+            document["json_result"] = json.loads(document["json_result"])
+        return document
+
+    def store_document_results(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Store a batch of document processing results in one transaction"""
+        try:
+            conn = self._connection()
+            stored = []
+            with conn:
+                for record in records:
+                    extracted_text = record["extracted_text"] or ""
+                    stored_text = compress_text(extracted_text) if settings.compress_extracted_text("sqlite") else extracted_text
+                    doc_id = str(uuid.uuid4())
+                    created_at = datetime.now(timezone.utc).isoformat()
+                    cursor = conn.execute(
+                        "INSERT INTO document_results (id, file_name, file_type, extracted_text, json_result, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            doc_id,
+                            record["file_name"],
+                            record["file_type"],
+                            stored_text,
+                            json.dumps(record["json_result"]),
+                            created_at
+                        )
+                    )
+                    conn.execute(
+                        "INSERT INTO document_fts (rowid, file_name, extracted_text, json_text) VALUES (?, ?, ?, ?)",
+                        (
+                            cursor.lastrowid,
+                            record["file_name"],
+                            extracted_text,
+                            _json_text(record["json_result"])
+                        )
+                    )
+                    stored.append({"id": doc_id, "file_name": record["file_name"], "created_at": created_at})
+
+            return {"success": True, "data": stored}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def list_document_results(self,
+                              fields: Optional[List[str]] = None,
+                              limit: int = 100,
+                              cursor: Optional[str] = None,
+                              raw_json: bool = False) -> Dict[str, Any]:
+        """List document results newest first, paged by (created_at, id)"""
+        try:
+            columns = resolve_fields(fields)
+            sql = f"SELECT {', '.join(columns)} FROM document_results"
+            params: List[Any] = []
+
+            if cursor:
+                last_created_at, last_id = decode_cursor(cursor)
+                sql += " WHERE (created_at, id) < (?, ?)"
+                params.extend([last_created_at, last_id])
+
+            sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+            params.append(limit + 1)
+
+            rows = self._connection().execute(sql, params).fetchall()
+            results = [self._row_to_document(row, decode_json=not raw_json) for row in rows[:limit]]
+
+            next_cursor = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = encode_cursor([last["created_at"], last["id"]])
+
+            return {"results": results, "next_cursor": next_cursor}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_document_by_id(self, doc_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get a document result by ID"""
+        try:
+            columns = resolve_fields(fields, default=DOCUMENT_FIELDS)
+            row = self._connection().execute(
+                f"SELECT {', '.join(columns)} FROM document_results WHERE id = ?",
+                (doc_id,)
+            ).fetchone()
+
+            if row is None:
+                return {"error": "Document not found"}
+
+            return self._row_to_document(row)
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def delete_document_result(self, doc_id: str) -> Dict[str, Any]:
+        """Delete a document result and its index entry"""
+        try:
+            conn = self._connection()
+            with conn:
+                row = conn.execute(
+                    "SELECT rowid, file_name, extracted_text, json_result FROM document_results WHERE id = ?",
+                    (doc_id,)
+                ).fetchone()
+
+                if row is None:
+                    return {"error": "Document not found"}
+
+                # Contentless FTS tables need the original values to remove a row
+                conn.execute(
+                    "INSERT INTO document_fts (document_fts, rowid, file_name, extracted_text, json_text) "
+                    "VALUES ('delete', ?, ?, ?, ?)",
+                    (row["rowid"], row["file_name"], decompress_text(row["extracted_text"]), _json_text(json.loads(row["json_result"])))
+                )
+                conn.execute("DELETE FROM document_results WHERE rowid = ?", (row["rowid"],))
+
+            return {"success": True, "id": doc_id}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+    def search_documents(self,
+                         query: str,
+                         limit: int = 20,
+                         cursor: Optional[str] = None,
+                         filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Ranked full-text search with keyset pagination on (score, rowid)"""
+        match = _fts_query(query)
+        if not match:
+            return {"error": "Search query is empty"}
+
+        where = ["document_fts MATCH ?"]
+        params: List[Any] = [match]
+
+        for field, value in (filters or {}).items():
+            if field not in self.json_fields:
+                return {"error": f"Field '{field}' is not indexed. Indexed fields: {', '.join(self.json_fields)}"}
+            where.append(f"d.{_field_column(field)} = ?")
+            params.append(value)
+
+        page_filter = ""
+        if cursor:
+            try:
+                last_score, last_rowid = decode_cursor(cursor)
+            except ValueError as e:
+                return {"error": str(e)}
+            page_filter = "WHERE score > ? OR (score = ? AND doc_rowid > ?)"
+            params.extend([last_score, last_score, last_rowid])
+
+        # bm25() scores are negative; lower means a better match
+        sql = f"""
+            SELECT * FROM (
+                SELECT d.rowid AS doc_rowid, d.id, d.file_name, d.file_type, d.created_at,
+                       d.extracted_text, bm25(document_fts, 2.0, 1.0, 1.0) AS score
+                FROM document_fts
+                JOIN document_results d ON d.rowid = document_fts.rowid
+                WHERE {' AND '.join(where)}
+            )
+            {page_filter}
+            ORDER BY score, doc_rowid
+            LIMIT ?
+        """
+        params.append(limit + 1)
+
+        try:
+            rows = self._connection().execute(sql, params).fetchall()
+        except Exception as e:
+            return {"error": str(e)}
+
+        results = []
+        for row in rows[:limit]:
+            results.append({
+                "id": row["id"],
+                "file_name": row["file_name"],
+                "file_type": row["file_type"],
+                "created_at": row["created_at"],
+                "score": -row["score"],
+                "snippet": self._snippet(decompress_text(row["extracted_text"]), query)
+            })
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor([last["score"], last["doc_rowid"]])
+
+        return {"results": results, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _snippet(text: str, query: str, width: int = 160) -> str:
+        """Short excerpt of text around the first matching search term"""
+        lowered = text.lower()
+        for term in FTS_SPECIAL_CHARS.sub(" ", query).replace("*", " ").split():
+            position = lowered.find(term.lower())
+            if position != -1:
+                start = max(0, position - width // 2)
+                end = start + width
+                return ("..." if start else "") + text[start:end].strip() + ("..." if end < len(text) else "")
+        return text[:width]
@@ -0,0 +1,32 @@
+"""
+Results backend selection.
+
+`RESULTS_BACKEND` picks where document results are persisted. In "auto" mode
+Supabase is used when it is configured and the local SQLite store otherwise,
+so the API keeps working offline.
+"""
+
+from backend.core.config import settings
+from backend.db.base import ResultsStore
+from backend.db.cached import CachedResultsStore
+from backend.db.supabase import supabase_client
+from backend.db.sqlite import SQLiteResultsStore
+
+
+def get_results_store() -> ResultsStore:
+    """Create the configured results store"""
+    if settings.RESULTS_BACKEND == "sqlite":
+        return SQLiteResultsStore()
+    
+    if settings.RESULTS_BACKEND == "supabase":
+        return supabase_client
+    
+    if supabase_client.is_available():
+        return supabase_client
+    
+    print("Supabase is not configured, using local SQLite results store.")
+    return SQLiteResultsStore()
+
+
+# Create results store instance, with read-through caching of document lookups
+results_store = CachedResultsStore(get_results_store())
@@ -4,12 +4,15 @@ from typing import Dict, Any, List, Optional
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from backend.core.compression import encode_text, decode_text
+from backend.core import tracing
 from backend.core.config import settings
+from backend.db.base import ResultsStore, DOCUMENT_FIELDS, resolve_fields, encode_cursor, decode_cursor
 
 # Load environment variables
 load_dotenv()
 
-class SupabaseClient:
+class SupabaseClient(ResultsStore):
     """Client for Supabase operations"""
     
     def __init__(self):
@@ -30,75 +33,163 @@ class SupabaseClient:
             print(f"Error connecting to Supabase: {e}")
             return None
     
-    def store_document_result(self, 
-                             file_name: str, 
-                             file_type: str, 
-                             extracted_text: str, 
-                             json_result: Dict[str, Any]) -> Dict[str, Any]:
-        """Store document processing result in Supabase"""
+    def is_available(self) -> bool:
+        """Whether the Supabase client is configured"""
+        return self.client is not None
+    
+    def store_document_results(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Store a batch of document processing results with a single insert.
+        
+        json_result is sent as a JSON object so it lands in the JSONB column
+        as-is and can be filtered server-side without a string round-trip.
+        extracted_text is compressed only when COMPRESS_EXTRACTED_TEXT is
+        "true"; the default keeps it searchable.
+        """
         if not self.client:
             return {"error": "Supabase client not initialized"}
+        
+        if not records:
+            return {"success": True, "data": []}
             
         try:
-            # Convert JSON to string for storage
-            json_str = json.dumps(json_result)
-            
-            # Insert record
-            data, error = self.client.table("document_results").insert({
-                "file_name": file_name,
-                "file_type": file_type,
-                "extracted_text": extracted_text,
-                "json_result": json_str
-            }).execute()
-            
-            if error:
-                return {"error": str(error)}
-                
-            return {"success": True, "data": data}
+            rows = [
+                {
+                    "file_name": record["file_name"],
+                    "file_type": record["file_type"],
+                    "extracted_text": encode_text(record["extracted_text"] or "") if settings.compress_extracted_text("supabase") else record["extracted_text"],
+                    "json_result": record["json_result"]
+                }
+                for record in records
+            ]
+            
+            # Insert all rows in one request; the inserted rows come back with their server-assigned id and created_at
+            with tracing.span("supabase.insert", rows=len(rows)):
+                response = self.client.table("document_results").insert(rows, returning="representation").execute()
+            
+            return {
+                "success": True,
+                "data": [{"id": row.get("id"), "file_name": row.get("file_name"), "created_at": row.get("created_at")} for row in response.data]
+            }
             
         except Exception as e:
             return {"error": str(e)}
     
-    def get_document_results(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get all document results from Supabase"""
+    @staticmethod
+    def _decode_row(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Decompress extracted_text and decode json_result of rows written before it was stored as JSONB"""
+        if "extracted_text" in item:
+            item["extracted_text"] = decode_text(item["extracted_text"])
+        if isinstance(item.get("json_result"), str):
+            item["json_result"] = json.loads(item["json_result"])
+        return item
+    
+    def list_document_results(self, 
+                              fields: Optional[List[str]] = None, 
+                              limit: int = 100, 
+                              cursor: Optional[str] = None, 
+                              raw_json: bool = False) -> Dict[str, Any]:
+        """List document results newest first, paged by (created_at, id)"""
         if not self.client:
-            return [{"error": "Supabase client not initialized"}]
+            return {"error": "Supabase client not initialized"}
             
         try:
-            data, error = self.client.table("document_results").select("*").limit(limit).execute()
+            columns = resolve_fields(fields)
+            request = self.client.table("document_results").select(", ".join(columns))
+            
+            if cursor:
+                last_created_at, last_id = decode_cursor(cursor)
+                request = request.or_(
+                    f'created_at.lt."{last_created_at}",'
+                    f'and(created_at.eq."{last_created_at}",id.lt."{last_id}")'
+                )
             
-            if error:
-                return [{"error": str(error)}]
+            with tracing.span("supabase.list", limit=limit, paged=cursor is not None):
+                response = request.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+                tracing.add_attributes(rows=len(response.data or []))
+            rows = [self._decode_row(item) for item in (response.data or [])]
+            
+            next_cursor = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = encode_cursor([last["created_at"], last["id"]])
                 
-            # Parse JSON strings back to objects
-            for item in data:
-                if "json_result" in item and isinstance(item["json_result"], str):
-                    item["json_result"] = json.loads(item["json_result"])
-                    
-            return data
+            return {"results": rows[:limit], "next_cursor": next_cursor}
             
         except Exception as e:
-            return [{"error": str(e)}]
+            return {"error": str(e)}
     
-    def get_document_by_id(self, doc_id: str) -> Dict[str, Any]:
+    def get_document_by_id(self, doc_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """Get a document result by ID"""
         if not self.client:
             return {"error": "Supabase client not initialized"}
             
         try:
-            data, error = self.client.table("document_results").select("*").eq("id", doc_id).execute()
-            
-            if error:
-                return {"error": str(error)}
+            columns = resolve_fields(fields, default=DOCUMENT_FIELDS)
+            with tracing.span("supabase.get", document_id=doc_id):
+                response = self.client.table("document_results").select(", ".join(columns)).eq("id", doc_id).execute()
                 
-            if not data or len(data) == 0:
+            if not response.data:
                 return {"error": "Document not found"}
                 
-            # Parse JSON string back to object
-            if "json_result" in data[0] and isinstance(data[0]["json_result"], str):
-                data[0]["json_result"] = json.loads(data[0]["json_result"])
+            return self._decode_row(response.data[0])
+            
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def delete_document_result(self, doc_id: str) -> Dict[str, Any]:
+        """Delete a document result by ID"""
+        if not self.client:
+            return {"error": "Supabase client not initialized"}
+            
+        try:
+            with tracing.span("supabase.delete", document_id=doc_id):
+                response = self.client.table("document_results").delete().eq("id", doc_id).execute()
+            
+            if not response.data:
+                return {"error": "Document not found"}
                 
-            return data[0]
+            return {"success": True, "id": doc_id}
+            
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def search_documents(self, 
+                         query: str, 
+                         limit: int = 20, 
+                         cursor: Optional[str] = None, 
+                         filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Full-text search on extracted_text using Postgres websearch syntax.
+        
+        PostgREST cannot order by text rank, so results are paged by ID.
+        Filters match top-level keys of json_result. Not available when
+        extracted_text is stored compressed.
+        """
+        if not self.client:
+            return {"error": "Supabase client not initialized"}
+        
+        if settings.compress_extracted_text("supabase"):
+            return {"error": "Full-text search on Supabase needs COMPRESS_EXTRACTED_TEXT=auto or false; use the sqlite results backend instead"}
+            
+        try:
+            request = (self.client.table("document_results")
+                       .select("id, file_name, file_type, created_at")
+                       .text_search("extracted_text", query, options={"type": "websearch"}))
+            
+            for field, value in (filters or {}).items():
+                request = request.eq(f"json_result->>{field}", value)
+            
+            if cursor:
+                last_id, = decode_cursor(cursor)
+                request = request.gt("id", last_id)
+            
+            with tracing.span("supabase.search", limit=limit, filters=len(filters or {})):
+                response = request.order("id").limit(limit + 1).execute()
+            rows = response.data or []
+            
+            next_cursor = encode_cursor([rows[limit - 1]["id"]]) if len(rows) > limit else None
+            return {"results": rows[:limit], "next_cursor": next_cursor}
             
         except Exception as e:
             return {"error": str(e)}
@@ -0,0 +1,55 @@
+"""
+Train a zstd compression dictionary on stored extracted text.
+
+Small documents compress much better with a dictionary trained on documents
+of the same kinds. Run after a representative set of documents is stored:
+
+    python -m backend.db.train_dictionary --limit 2000
+"""
+
+import argparse
+from typing import List
+
+from backend.core.compression import train_dictionary
+from backend.db.store import results_store
+
+
+def collect_samples(limit: int) -> List[bytes]:
+    """Collect extracted text of up to `limit` stored documents"""
+    samples: List[bytes] = []
+    cursor = None
+    
+    while len(samples) < limit:
+        page = results_store.list_document_results(
+            fields=["extracted_text"], limit=min(100, limit - len(samples)), cursor=cursor
+        )
+        if "error" in page:
+            raise RuntimeError(page["error"])
+        
+        samples.extend(item["extracted_text"].encode("utf-8") for item in page["results"] if item.get("extracted_text"))
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    
+    return samples
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Train a zstd dictionary on stored extracted text")
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum number of documents to sample")
+    parser.add_argument("--size", type=int, default=112640, help="Dictionary size in bytes")
+    args = parser.parse_args()
+    
+    samples = collect_samples(args.limit)
+    print(f"Collected {len(samples)} samples")
+    
+    dict_id = train_dictionary(samples, dict_size=args.size)
+    if dict_id is None:
+        print("Dictionary training requires the zstandard package")
+    else:
+        print(f"Trained dictionary {dict_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Write-behind queue for document results.
+
+Requests enqueue results and return immediately; a background thread drains
+the queue in batches (by size or time window) and inserts each batch with a
+single round-trip, retrying failed batches with exponential backoff. When
+the queue is full, new results are dropped and counted rather than written
+on the request's thread.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from backend.core import metrics, tracing
+from backend.core.config import settings
+from backend.db.store import results_store
+
+logger = logging.getLogger(__name__)
+
+
+class ResultWriter:
+    """Background batched writer for document results"""
+
+    def __init__(self,
+                 store,
+                 batch_size: int = settings.RESULT_WRITER_BATCH_SIZE,
+                 flush_interval: float = settings.RESULT_WRITER_FLUSH_INTERVAL,
+                 max_queue_size: int = settings.RESULT_WRITER_MAX_QUEUE_SIZE,
+                 max_retries: int = settings.RESULT_WRITER_MAX_RETRIES,
+                 retry_backoff: float = settings.RESULT_WRITER_RETRY_BACKOFF):
+        """Initialize the writer; the worker thread starts on first use"""
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._flush_event = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            "records_written": 0,
+            "batches_written": 0,
+            "failed_batches": 0,
+            "failed_records": 0,
+            "retries": 0,
+            "dropped_records": 0,
+            "last_batch_size": 0,
+            "last_flush_latency": 0.0,
+            "max_flush_latency": 0.0,
+            "total_flush_latency": 0.0,
+        }
+
+    def start(self) -> None:
+        """Start the background worker thread"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the worker after draining everything still queued"""
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def enqueue(self,
+                file_name: str,
+                file_type: str,
+                extracted_text: str,
+                json_result: Dict[str, Any]) -> bool:
+        """
+        Queue a document result for persistence.
+
+        Never blocks: when the queue is full the record is dropped and
+        counted in `dropped_records`, since writing it inline could hold the
+        caller for the whole retry schedule. Returns True if the record was
+        queued.
+        """
+        record = {
+            "file_name": file_name,
+            "file_type": file_type,
+            "extracted_text": extracted_text,
+            "json_result": json_result,
+        }
+
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            logger.error(f"Result writer queue is full, dropping the result for {file_name}")
+            self._increment("dropped_records")
+            return False
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Ask the worker to write queued records now and wait until the queue is empty"""
+        self._flush_event.set()
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput and flush latency statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches_written"] + stats["failed_batches"]
+        total_flush_latency = stats.pop("total_flush_latency")
+        stats["avg_flush_latency"] = total_flush_latency / batches if batches else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+    def _increment(self, key: str, value: float = 1) -> None:
+        """Update a counter under the stats lock"""
+        with self._lock:
+            self._stats[key] += value
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Collect up to batch_size records, waiting at most flush_interval after the first"""
+        batch: List[Dict[str, Any]] = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+
+        window_end = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._flush_event.is_set():
+                # Flush requested - take only what is already queued
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+
+            remaining = window_end - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """Worker loop"""
+        while True:
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._write_batch(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            elif self._stop_event.is_set():
+                return
+            elif self._flush_event.is_set() and self._queue.empty():
+                self._flush_event.clear()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Insert one batch, retrying with exponential backoff and jitter"""
+        start_time = time.time()
+        succeeded = False
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with tracing.span("results.store_batch", records=len(batch), attempt=attempt):
+                    result = self.store.store_document_results(batch)
+                error = result.get("error")
+            except Exception as e:
+                error = str(e)
+
+            if not error:
+                succeeded = True
+                break
+
+            if attempt < self.max_retries:
+                delay = self.retry_backoff * (2 ** attempt)
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"Writing {len(batch)} results failed ({error}), retrying in {delay:.2f}s")
+                self._increment("retries")
+                time.sleep(delay)
+            else:
+                logger.error(f"Dropping {len(batch)} results after {self.max_retries + 1} attempts: {error}")
+
+        latency = time.time() - start_time
+        with self._lock:
+            if succeeded:
+                self._stats["batches_written"] += 1
+                self._stats["records_written"] += len(batch)
+            else:
+                self._stats["failed_batches"] += 1
+                self._stats["failed_records"] += len(batch)
+            self._stats["last_batch_size"] = len(batch)
+            self._stats["last_flush_latency"] = latency
+            self._stats["max_flush_latency"] = max(self._stats["max_flush_latency"], latency)
+            self._stats["total_flush_latency"] += latency
+        return succeeded
+
+
+# Create result writer instance
+result_writer = ResultWriter(results_store)
+metrics.register_runtime_stats(
+    "result_writer", "Result writer", result_writer.stats,
+    ["queue_depth", "records_written", "failed_records", "dropped_records", "batches_written", "avg_flush_latency"]
+)
@@ -1,12 +1,14 @@
 import sys
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Add the project root directory to the Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 from dotenv import load_dotenv
 
@@ -29,18 +31,78 @@ except ImportError as e:
 
 # Try to import document-related routes that depend on external services
 try:
-    from backend.api.routes import documents
+    from backend.api.routes import documents, process
     has_document_routes = True
 except ImportError as e:
     print(f"❌ Error importing document routes: {e}")
     print("This could be due to missing dependencies or environment variables.")
     has_document_routes = False
 
+from backend.api.responses import FastJSONResponse, CompressionMiddleware
+from backend.core.admission import AdmissionMiddleware
+from backend.core.cancellation import CancellationMiddleware
+from backend.core.metrics import MetricsMiddleware, metrics_available, render_metrics
+from backend.core.config import settings
+from backend.core.http_client import warm_up
+from backend.core.process_pool import cpu_pool
+from backend.core.profiling import ProfileMiddleware, continuous_sampler
+from backend.core.tracing import configure_tracing, shutdown_tracing
+from backend.api.routes import profiles
+
+# Result writer and results routes are optional as well - they need the results store
+try:
+    from backend.db.writer import result_writer
+    from backend.api.routes import stats, results
+    has_result_writer = True
+except ImportError as e:
+    print(f"❌ Error importing result writer: {e}")
+    has_result_writer = False
+
+# Document Q&A needs the embedding model and the results store
+try:
+    from backend.api.routes import qa
+    has_qa_routes = True
+except ImportError as e:
+    print(f"❌ Error importing Q&A routes: {e}")
+    has_qa_routes = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services and warm connections before serving; drain them on shutdown"""
+    # Configured per worker: span export threads do not survive a fork
+    configure_tracing()
+    continuous_sampler.start()
+    
+    if has_result_writer:
+        result_writer.start()
+    
+    # Start CPU pool workers now rather than on the first upload
+    cpu_pool.start()
+    
+    if settings.LLM_WARMUP:
+        try:
+            result = await warm_up()
+            print(f"✅ Warmed up {result['async_connections']} async / {result['sync_connections']} sync LLM connections")
+        except Exception as e:
+            print(f"⚠️ LLM connection warm-up failed: {e}")
+    yield
+    
+    if has_result_writer:
+        # Drain queued results before the process exits
+        result_writer.stop()
+    cpu_pool.shutdown()
+    shutdown_tracing()
+    continuous_sampler.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Boga DocAI API",
     description="API for processing documents with OCR and LLMs",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS - allow multiple frontend URLs
@@ -62,12 +124,30 @@ allowed_origins = [origin for origin in allowed_origins if origin]
 
 print(f"Allowing CORS from origins: {allowed_origins}")
 
+# Compress large responses (brotli or gzip, as the client prefers)
+app.add_middleware(CompressionMiddleware)
+
+# Cap concurrent document processing; excess requests get 429/503 with Retry-After
+app.add_middleware(AdmissionMiddleware)
+
+# Cancel document requests whose client disconnected or whose deadline passed, freeing their slot
+app.add_middleware(CancellationMiddleware)
+
+# Record request latency and requests in flight
+app.add_middleware(MetricsMiddleware)
+
+# Profile single documents requests on admin request
+app.add_middleware(ProfileMiddleware)
+
+# CORS is added last so it is outermost: rejections from the middlewares above (429/503, 504) carry its
+# headers too, and browsers may read Retry-After
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # Basic health check that doesn't depend on other modules
@@ -76,6 +156,16 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Boga DocAI API is running"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Stage latency histograms, in-flight gauges, queue depths and cache hit ratios"""
+    if not metrics_available():
+        raise HTTPException(status_code=501, detail="prometheus_client is not installed")
+    # Runtime stats of some components query SQLite
+    content, content_type = await run_in_threadpool(render_metrics)
+    return Response(content=content, media_type=content_type)
+
 # Include minimal router for basic connectivity testing
 if has_minimal_router:
     app.include_router(minimal_router, prefix="/api/v1/minimal", tags=["Minimal"])
@@ -85,10 +175,25 @@ if has_minimal_router:
 if has_document_routes:
     try:
         app.include_router(documents.router, prefix="/api/v1/documents", tags=["Documents"])
+        app.include_router(process.router, prefix="/api/v1", tags=["Processing"])
         print("✅ Successfully loaded document routes")
     except Exception as e:
         print(f"❌ Error including document routes: {e}")
 
+# Include stats and results routers
+if has_result_writer:
+    app.include_router(stats.router, prefix="/api/v1/stats", tags=["Stats"])
+    app.include_router(results.router, prefix="/api/v1/results", tags=["Results"])
+    print("✅ Successfully loaded stats and results routes")
+
+# Include profile downloads (admin token required)
+app.include_router(profiles.router, prefix="/api/v1/profiles", tags=["Profiling"])
+
+# Include document Q&A router
+if has_qa_routes:
+    app.include_router(qa.router, prefix="/api/v1/qa", tags=["Q&A"])
+    print("✅ Successfully loaded Q&A routes")
+
 if __name__ == "__main__":
     host = "0.0.0.0"
     port = 8000
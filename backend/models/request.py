@@ -1,16 +1,72 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+import json
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any, Literal
+
+from backend.core.config import settings
+
+
+class ProcessingOptions(BaseModel):
+    """Options narrowing what a processing run extracts"""
+    mode: Literal["vision", "text"] = Field("vision", description="Send page images to the vision model, or the PDF text layer to the text model")
+    pages: Optional[str] = Field(None, description="1-based pages to process, e.g. \"1-3,5\" (default: first page in vision mode, all pages in text mode)")
+    fields: Optional[List[str]] = Field(None, description="Only extract these fields")
+    json_schema: Optional[Dict[str, Any]] = Field(None, description="Only extract what this JSON schema describes")
+    max_output_tokens: Optional[int] = Field(None, ge=1, le=16384, description="Cap on tokens the model may generate")
+    skip_blank_pages: bool = Field(True, description="Leave blank pages out of vision calls")
+    collapse_duplicate_pages: bool = Field(True, description="Send near-identical pages to the vision model only once")
+    pages_per_call: Optional[int] = Field(None, ge=1, description="Pages per vision model call; calls overlap with rendering the next pages (default: VISION_PAGES_PER_CALL)")
+    image_detail: Optional[Literal["auto", "low", "high"]] = Field(None, description="Vision detail level (default: VISION_DETAIL, normally chosen per page)")
+    
+    @field_validator("pages")
+    @classmethod
+    def _check_pages(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            parse_pages(value)
+        return value
+    
+    def page_numbers(self) -> Optional[List[int]]:
+        """Selected pages, sorted, or None for the mode's default"""
+        return parse_pages(self.pages) if self.pages else None
+    
+    def llm_fingerprint(self) -> str:
+        """The options that change what the model is asked, for cache keys"""
+        return json.dumps([self.fields, self.json_schema, self.max_output_tokens], sort_keys=True)
+
+
+def parse_pages(spec: str) -> List[int]:
+    """Parse a page spec such as "1-3,5" into sorted page numbers; overlapping ranges count each page once"""
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"Invalid page range: {part}")
+        first_page, last_page = int(first), int(last or first)
+        if first_page < 1 or last_page < first_page:
+            raise ValueError(f"Invalid page range: {part}")
+        overlap = sum(1 for page in pages if first_page <= page <= last_page)
+        if last_page - first_page + 1 - overlap + len(pages) > settings.MAX_PROCESS_PAGES:
+            raise ValueError(f"At most {settings.MAX_PROCESS_PAGES} pages can be processed at once")
+        pages.update(range(first_page, last_page + 1))
+    if not pages:
+        raise ValueError("No pages selected")
+    return sorted(pages)
 
 
 class ProcessFileRequest(BaseModel):
     """Request model for processing a file"""
     file_id: str = Field(..., description="ID of the uploaded file to process")
-    file_type: str = Field(..., description="Type of file (pdf, image)")
-    options: Optional[Dict[str, Any]] = Field(default=None, description="Additional processing options")
+    file_type: Optional[str] = Field(None, description="Type of file (pdf, image); inferred from the stored file")
+    options: Optional[ProcessingOptions] = Field(None, description="Processing options")
+    reuse_cache: bool = Field(True, description="Reuse cached stage outputs where their inputs are unchanged")
+    include_text: bool = Field(True, description="Echo the extracted text back in the response")
 
 
 class ProcessTextRequest(BaseModel):
     """Request model for processing raw text"""
     text: str = Field(..., description="Raw text to process")
     file_name: Optional[str] = Field(None, description="Original file name")
-    options: Optional[Dict[str, Any]] = Field(default=None, description="Additional processing options") 
\ No newline at end of file
+    options: Optional[ProcessingOptions] = Field(None, description="Processing options (fields, json_schema and max_output_tokens apply)") 
+    include_text: bool = Field(True, description="Echo the input text back in the response")
\ No newline at end of file
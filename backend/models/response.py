@@ -15,9 +15,14 @@ class ProcessingResponse(BaseModel):
     """Response model for file processing"""
     file_id: Optional[str] = Field(None, description="ID of the processed file")
     file_name: Optional[str] = Field(None, description="Name of the processed file")
-    extracted_text: str = Field(..., description="Extracted text from the file")
+    extracted_text: Optional[str] = Field(None, description="Extracted text from the file (omitted when include_text is false)")
     json_result: Dict[str, Any] = Field(..., description="Structured JSON result")
     processing_time: float = Field(..., description="Processing time in seconds")
+    timings: Optional[Dict[str, float]] = Field(None, description="Seconds spent in each processing stage")
+    reused_stages: Optional[List[str]] = Field(None, description="Stages whose cached output was reused")
+    skipped_pages: Optional[Dict[str, int]] = Field(None, description="Pages left out of vision calls, by reason (blank, duplicate)")
+    reused_pages: Optional[List[int]] = Field(None, description="Pages whose stored extraction was reused because their content is unchanged")
+    template_id: Optional[int] = Field(None, description="Layout template that extracted the document locally, or learned from it")
     
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,260 @@
+"""
+CPU-bound document stages run in the worker process pool.
+
+These functions execute in pool processes, so they only import what they
+need and take plain arguments. Pages are rendered straight into the page
+cache's files. Base64 page images are returned through shared memory
+rather than pickled back over the pool's pipe: the worker writes the base64
+text of every page into one shared block and the parent decodes each page
+straight out of that block into its final string.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import uuid
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import PyPDF2
+from PIL import Image
+
+from backend.services.page_preprocessing import preprocess_page, vision_tokens
+from backend.services.pdf_engines import render_engine, text_engine
+
+
+def _to_shared_memory(buffers: List[bytes]) -> Dict[str, Any]:
+    """Copy buffers into a new shared memory block and describe where each one is"""
+    size = sum(len(buffer) for buffer in buffers)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    # The parent owns the block from here on and unlinks it after reading;
+    # stop this process's resource tracker from removing it first
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(block._name, "shared_memory")
+    except Exception:
+        pass
+
+    offsets = []
+    position = 0
+    for buffer in buffers:
+        block.buf[position:position + len(buffer)] = buffer
+        offsets.append((position, len(buffer)))
+        position += len(buffer)
+
+    name = block.name
+    block.close()
+    return {"shm": name, "offsets": offsets}
+
+
+def read_shared_text(handle: Dict[str, Any]) -> List[str]:
+    """Decode the ASCII buffers of a shared memory handle and free the block"""
+    block = shared_memory.SharedMemory(name=handle["shm"])
+    try:
+        return [str(block.buf[offset:offset + length], "ascii") for offset, length in handle["offsets"]]
+    finally:
+        block.close()
+        block.unlink()
+
+
+def render_pages_to_files(file_path: str,
+                          targets: List[Tuple[int, str]],
+                          dpi: int,
+                          image_format: str,
+                          thumbnail_size: Optional[int] = None,
+                          engine: Optional[str] = None) -> int:
+    """
+    Render PDF pages straight into image files; returns the bytes written.
+
+    `targets` pairs 1-based page numbers with output paths. Each file is
+    written under a temporary name and renamed, so readers never see a
+    partial image. Pages past the end of the document are skipped.
+    """
+    paths = dict(targets)
+    written = 0
+    for page, image in render_engine(engine).render(file_path, sorted(paths), dpi):
+        if thumbnail_size:
+            image.thumbnail((thumbnail_size, thumbnail_size))
+        if image_format == "jpeg" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        path = paths[page]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        image.save(temp_path, format=image_format.upper())
+        written += os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+    return written
+
+
+def page_signatures(file_paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Ink coverage and a 256-bit difference hash of each page image.
+
+    The ink ratio is the share of dark pixels in a 256px grayscale copy. The
+    hash compares horizontally adjacent cells of a 17x16 grayscale copy, so
+    rescans of the same page land a few bits apart.
+    """
+    signatures = []
+    for file_path in file_paths:
+        with Image.open(file_path) as image:
+            gray = image.convert("L")
+        small = gray.resize((17, 16), Image.BILINEAR)
+        gray.thumbnail((256, 256))
+
+        pixels = np.asarray(gray, dtype=np.uint8)
+        cells = np.asarray(small, dtype=np.int16)
+        bits = np.packbits(cells[:, 1:] > cells[:, :-1])
+        signatures.append({
+            "ink_ratio": float((pixels < 160).mean()),
+            "dhash": int.from_bytes(bits.tobytes(), "big"),
+        })
+    return signatures
+
+
+def encode_files_base64(file_paths: List[str]) -> Dict[str, Any]:
+    """Base64-encode several files into one shared memory block"""
+    buffers = []
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            buffers.append(base64.b64encode(file.read()))
+    return _to_shared_memory(buffers)
+
+
+def prepare_vision_images(file_paths: List[str], detail: str = "auto", min_text_px: float = 12.0) -> Dict[str, Any]:
+    """
+    Preprocess page images for a vision model and base64-encode them into shared memory.
+
+    A page may become several images. Besides the usual offsets, the handle
+    lists each image's detail level and estimated tokens, and the tokens the
+    unprocessed pages would have cost.
+    """
+    buffers, details, tokens = [], [], []
+    original_tokens = 0
+    for file_path in file_paths:
+        with Image.open(file_path) as image:
+            image.load()
+        original_tokens += vision_tokens(*image.size)
+        for part, level in preprocess_page(image, detail, min_text_px):
+            output = io.BytesIO()
+            part.save(output, format="PNG")
+            buffers.append(base64.b64encode(output.getvalue()))
+            details.append(level)
+            tokens.append(vision_tokens(*part.size, level))
+
+    handle = _to_shared_memory(buffers)
+    handle.update(details=details, tokens=tokens, original_tokens=original_tokens)
+    return handle
+
+
+def pdf_layout(file_path: str,
+               pages: Optional[List[int]] = None,
+               fingerprint_pages: int = 2,
+               grid: Tuple[int, int] = (16, 24)) -> Dict[str, Any]:
+    """
+    Text layer of a PDF and a fingerprint of its layout.
+
+    The fingerprint is a 64-bit simhash of the grid cells that hold text on
+    the first `fingerprint_pages` pages. Documents with the same layout land
+    a few bits apart even when their values differ. It is None when the
+    pages have no text layer.
+    """
+    columns, rows = grid
+    texts, features = [], []
+
+    with open(file_path, "rb") as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        page_count = len(pdf_reader.pages)
+        numbers = [number for number in pages if number <= page_count] if pages else range(1, page_count + 1)
+
+        for index, number in enumerate(numbers):
+            page = pdf_reader.pages[number - 1]
+            width = float(page.mediabox.width) or 1.0
+            height = float(page.mediabox.height) or 1.0
+            cells = set()
+
+            def visit(text, cm, tm, font_dict, font_size):
+                if text.strip():
+                    x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+                    y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+                    cells.add((min(max(int(x / width * columns), 0), columns - 1), min(max(int(y / height * rows), 0), rows - 1)))
+
+            page_text = page.extract_text(visitor_text=visit if index < fingerprint_pages else None)
+            if page_text and page_text.strip():
+                texts.append(page_text)
+            features.extend(f"{index}:{column}:{row}" for column, row in sorted(cells))
+
+    return {"text": "\n\n".join(texts).strip(), "fingerprint": simhash(features) if features else None}
+
+
+def simhash(features: List[str]) -> str:
+    """64-bit simhash of a set of features, as hex"""
+    digests = np.frombuffer(b"".join(hashlib.blake2b(feature.encode(), digest_size=8).digest() for feature in features), dtype=np.uint8)
+    bits = np.unpackbits(digests).reshape(len(features), 64)
+    votes = bits.sum(axis=0) * 2 > len(features)
+    return np.packbits(votes).tobytes().hex()
+
+
+def page_hashes(file_path: str, pages: List[int]) -> Dict[int, str]:
+    """
+    Content hash of each page by 1-based page number; pages past the end are left out.
+
+    A hash covers the page's content stream, the resources it draws (fonts,
+    images, forms), its media box and its rotation, so an unchanged page
+    keeps its hash across revisions of a document.
+    """
+    hashes = {}
+    with open(file_path, "rb") as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        page_count = len(pdf_reader.pages)
+        for number in pages:
+            if number > page_count:
+                continue
+            page = pdf_reader.pages[number - 1]
+            digest = hashlib.sha256()
+            digest.update(repr([float(value) for value in page.mediabox] + [page.get("/Rotate", 0)]).encode())
+            contents = page.get_contents()
+            if contents is not None:
+                digest.update(contents.get_data())
+            _hash_pdf_object(digest, page.get("/Resources"))
+            hashes[number] = digest.hexdigest()
+    return hashes
+
+
+def _hash_pdf_object(digest, value, depth: int = 0) -> None:
+    """Feed a PDF object into a digest, following references; streams add their raw data"""
+    if depth > 10:
+        return
+    if isinstance(value, PyPDF2.generic.IndirectObject):
+        value = value.get_object()
+    if isinstance(value, PyPDF2.generic.StreamObject):
+        digest.update(value._data or b"")
+    if isinstance(value, dict):
+        for key in sorted(value):
+            if key == "/Parent":
+                continue
+            digest.update(str(key).encode())
+            _hash_pdf_object(digest, value[key], depth + 1)
+    elif isinstance(value, list):
+        for item in value:
+            _hash_pdf_object(digest, item, depth + 1)
+    else:
+        digest.update(repr(value).encode())
+
+
+def pdf_page_count(file_path: str, engine: Optional[str] = None) -> int:
+    """Number of pages in a PDF"""
+    return text_engine(engine).page_count(file_path)
+
+
+def extract_pdf_text(file_path: str, pages: Optional[List[int]] = None, engine: Optional[str] = None) -> List[str]:
+    """Text layer of a PDF page by page, optionally only of the given 1-based pages"""
+    return text_engine(engine).extract_text(file_path, pages)
+
+
+def join_page_texts(texts: List[str]) -> str:
+    """Non-empty page texts separated by blank lines"""
+    return "\n\n".join(text for text in texts if text and text.strip()).strip()
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import sqlite3
+from typing import List, Dict
+
+import numpy as np
+from langchain_openai import OpenAIEmbeddings
+
+from backend.core.config import settings
+from backend.core.http_client import get_http_client, get_async_http_client
+from backend.core.sqlite_connections import ThreadConnections
+
+
+class EmbeddingService:
+    """Service for text embeddings, cached by content hash"""
+
+    def __init__(self, cache_path: str = settings.EMBEDDING_CACHE_PATH):
+        """Initialize the embedding model and the on-disk cache"""
+        self.model = settings.EMBEDDING_MODEL
+        self.embeddings = OpenAIEmbeddings(
+            model=self.model,
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        )
+
+        self.cache_path = cache_path
+        self._connections = ThreadConnections(cache_path, synchronous=None)
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+        self.stats = {"cache_hits": 0, "cache_misses": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's cache connection"""
+        return self._connections.get()
+
+    def _hash(self, text: str) -> str:
+        """Cache key: the model name and the text content"""
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, calling the model only for texts not seen before"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        hashes = [self._hash(text) for text in texts]
+        conn = self._connection()
+
+        # Look up cached vectors
+        cached: Dict[str, np.ndarray] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique_hashes), 500):
+            batch = unique_hashes[start:start + 500]
+            rows = conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE hash IN ({', '.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            for key, vector in rows:
+                cached[key] = np.frombuffer(vector, dtype=np.float32)
+
+        # Embed the misses in one batch
+        missing = {key: text for key, text in zip(hashes, texts) if key not in cached}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            with conn:
+                for key, vector in zip(missing.keys(), vectors):
+                    array = np.asarray(vector, dtype=np.float32)
+                    cached[key] = array
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                        (key, array.tobytes())
+                    )
+
+        self.stats["cache_hits"] += len(texts) - len(missing)
+        self.stats["cache_misses"] += len(missing)
+
+        return np.vstack([cached[key] for key in hashes])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query"""
+        return self.embed_texts([text])[0]
+
+
+# Create embedding service instance
+embedding_service = EmbeddingService()
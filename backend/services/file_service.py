@@ -1,25 +1,65 @@
 import os
+import time
 import uuid
-import shutil
+import hashlib
+import random
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, AsyncIterator, Iterator, Set, Tuple
 from fastapi import UploadFile
 from werkzeug.utils import secure_filename
 
+from backend.core import cancellation, metrics, tracing
+from backend.core.cache import get_cache
+from backend.core.compression import compress_file, is_archive, strip_archive_suffix, local_copy
 from backend.core.config import settings
-from backend.services.ocr_service import OCRService
-from backend.services.llm_service import llm_service
+from backend.core.pipeline import SKIP, Stage, run_pipeline
+from backend.core.process_pool import cpu_pool
+from backend.core.shared_state import MISSING
+from backend.models.request import ProcessingOptions
+from backend.services import cpu_tasks
+from backend.services.ocr_service import OCRService, PageFilter
+from backend.services.llm_service import llm_service, is_cacheable, merge_results
+from backend.services.page_cache import page_cache
+from backend.services.pdf_engines import render_engine, text_engine
+from backend.services.stage_cache import stage_cache, file_digest, text_digest
+from backend.services.template_store import template_store
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# File metadata lookups by ID, so repeated fetches don't rescan UPLOAD_DIR
+file_info_cache = get_cache("file_info")
+
+# Content hashes by file ID, so page previews don't rehash (or decompress) the upload
+file_hash_cache = get_cache("file_hash")
+
+# Background checks of template extractions; referenced until done so they aren't collected
+template_verifications: Set[asyncio.Task] = set()
+
+# Bounds the background checks, which each cost a full model extraction
+template_verify_slots = asyncio.Semaphore(settings.TEMPLATE_VERIFY_CONCURRENCY)
+
 class FileService:
     """Service for file operations"""
     
     @staticmethod
-    async def process_file(file: UploadFile) -> Dict[str, Any]:
-        """Process file upload"""
+    async def process_file(file: UploadFile, options: Optional[ProcessingOptions] = None) -> Dict[str, Any]:
+        """Process file upload, with a per-stage timing breakdown in `timings`"""
+        deadline = cancellation.remaining()
+        with metrics.track_stages() as timings, tracing.span("process_file", file_name=file.filename, content_type=file.content_type, deadline_seconds=deadline):
+            result = await FileService._process_file(file, options)
+            tracing.add_attributes(success=bool(result.get("success")), error=result.get("error"))
+        
+        if result.get("success"):
+            result["timings"] = metrics.rounded(timings)
+        return result
+    
+    @staticmethod
+    async def _process_file(file: UploadFile, options: Optional[ProcessingOptions] = None) -> Dict[str, Any]:
+        """Save, extract and structure an uploaded file"""
         # Log file details
         logger.info(f"Processing file: {file.filename} (content_type: {file.content_type})")
         
@@ -48,44 +88,22 @@ class FileService:
             # Ensure upload directory exists
             os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
             
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Save file, hashing it on the way so the stages don't read it back
+            with metrics.stage("save"), open(file_path, "wb") as buffer:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: file.file.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    buffer.write(chunk)
+                tracing.add_attributes(file_bytes=buffer.tell())
+            file_hash = digest.hexdigest()
+            file_info_cache.invalidate(file_id)
+            file_hash_cache.set(file_id, file_hash)
             
             # Log successful file save
             logger.info(f"File saved successfully: {file_path}")
             
-            # Determine processing approach based on file type
-            file_extension = os.path.splitext(secure_name)[1].lower()
-            logger.info(f"File extension: {file_extension}")
-            
-            is_image_based = file_extension in ['.pdf', '.png', '.jpg', '.jpeg']
-            
-            # Use OCR only for text extraction if we're not using the image-based approach
-            if not is_image_based:
-                logger.info("Using OCR for text extraction")
-                # Use OCR service to extract text
-                ocr_result = OCRService.process_file(file_path)
-                
-                if not ocr_result["success"]:
-                    logger.error(f"OCR processing failed: {ocr_result.get('error', 'Unknown error')}")
-                    return ocr_result
-                
-                extracted_text = ocr_result["text"]
-            else:
-                logger.info("Using image-based approach, bypassing OCR")
-                # For image-based approach, we'll just pass empty text and let LLM service handle it
-                extracted_text = ""
-            
-            # Process with LLM
-            logger.info(f"Processing with LLM (is_image_based: {is_image_based})")
-            llm_result = llm_service.process_document(
-                file_id=file_id,
-                file_name=secure_name,
-                extracted_text=extracted_text,
-                is_image_based=is_image_based,
-                file_path=file_path
-            )
+            # Extract and structure the document
+            llm_result = await FileService._run_stages(file_id, secure_name, file_path, options, file_hash=file_hash)
             
             # Log LLM processing result
             if llm_result["success"]:
@@ -93,6 +111,9 @@ class FileService:
             else:
                 logger.error(f"LLM processing failed: {llm_result.get('error', 'Unknown error')}")
             
+            # Keep the original compressed now that processing is done
+            await FileService._archive_upload(file_id, file_path)
+            
             return llm_result
             
         except Exception as e:
@@ -102,6 +123,414 @@ class FileService:
                 "error": str(e)
             }
     
+    @staticmethod
+    async def reprocess_file(file_id: str, options: Optional[ProcessingOptions] = None, reuse_cache: bool = True) -> Dict[str, Any]:
+        """Process a stored upload again, rerunning only the stages whose inputs or options changed"""
+        with metrics.track_stages() as timings, tracing.span("reprocess_file", file_id=file_id, deadline_seconds=cancellation.remaining()):
+            try:
+                info = FileService.get_file_info(file_id)
+                if info is None:
+                    return {
+                        "success": False,
+                        "error": f"File with ID {file_id} not found"
+                    }
+                
+                # Stored names are "<file_id>_<original name>"
+                file_name = info["name"].split("_", 1)[-1]
+                async with FileService.upload_path(file_id) as file_path:
+                    result = await FileService._run_stages(file_id, file_name, file_path, options, reuse_cache)
+                tracing.add_attributes(success=bool(result.get("success")), reused=",".join(result.get("reused_stages", [])))
+                
+            except Exception as e:
+                logger.exception(f"Error reprocessing file {file_id}: {str(e)}")
+                result = {
+                    "success": False,
+                    "error": str(e)
+                }
+        
+        if result.get("success"):
+            result["timings"] = metrics.rounded(timings)
+        return result
+    
+    @staticmethod
+    async def _run_stages(file_id: str,
+                          file_name: str,
+                          file_path: str,
+                          options: Optional[ProcessingOptions] = None,
+                          reuse_cache: bool = True,
+                          use_templates: bool = True,
+                          file_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extract and structure a saved file, reusing cached stage outputs.
+        
+        `options.mode` selects "vision" (page images go to the vision model;
+        the default) or "text" (the PDF text layer goes to the text model).
+        Only `options.pages` are rendered or read, and the model is asked for
+        just `options.fields` or `options.json_schema` when given. Stages
+        served from the cache are listed in `reused_stages`.
+        
+        PDFs whose layout matches a trusted template are extracted locally
+        from their text layer ("template" in `reused_stages`); every model
+        extraction of a PDF teaches the template of its layout.
+        """
+        options = options or ProcessingOptions()
+        mode = options.mode
+        pages = options.page_numbers()
+        file_extension = os.path.splitext(file_name)[1].lower()
+        start_time = time.time()
+        reused: List[str] = []
+        skipped_pages: Optional[Dict[str, int]] = None
+        reused_pages: Optional[List[int]] = None
+        
+        # Stage outputs are keyed by the file contents, not the file ID
+        if file_hash is None:
+            with metrics.stage("hash"):
+                file_hash = await asyncio.to_thread(file_digest, file_path)
+        
+        # Documents with a known layout are extracted locally from their text layer
+        scope = f"{mode}:{options.llm_fingerprint()}"
+        layout = None
+        if use_templates and settings.TEMPLATES_ENABLED and file_extension == ".pdf" and not options.json_schema:
+            layout_pages = pages if mode == "text" else pages or [1]
+            layout = await stage_cache.get_or_compute(
+                "layout", (file_hash, layout_pages),
+                lambda: FileService._pdf_layout(file_path, layout_pages),
+                reuse=reuse_cache, should_cache=lambda layout: layout is not None
+            )
+            if layout is not None and not (layout["fingerprint"] and layout["text"]):
+                layout = None
+        
+        if layout is not None:
+            local = await asyncio.to_thread(template_store.extract, scope, layout["fingerprint"], layout["text"])
+            if local is not None:
+                reused.append("template")
+                # Sampling is skipped while the checks are saturated, rather than queueing more
+                if random.random() < settings.TEMPLATE_VERIFY_RATE and not template_verify_slots.locked():
+                    task = cancellation.detach(FileService._verify_template(file_id, file_name, options, scope, layout, local), name="verify-template")
+                    template_verifications.add(task)
+                    task.add_done_callback(template_verifications.discard)
+                return {
+                    "success": True,
+                    "file_id": file_id,
+                    "file_name": file_name,
+                    "extracted_text": layout["text"],
+                    "json_result": local["json_result"],
+                    "processing_time": time.time() - start_time,
+                    "reused_stages": reused,
+                    "template_id": local["template_id"]
+                }
+        
+        if mode == "text":
+            if file_extension != ".pdf":
+                return {
+                    "success": False,
+                    "error": "Text mode needs a PDF with a text layer"
+                }
+            
+            logger.info("Using the PDF text layer")
+            ocr_result = await stage_cache.get_or_compute(
+                "text", (file_hash, pages, text_engine().name),
+                lambda: OCRService.process_file(file_path, pages),
+                reuse=reuse_cache, should_cache=lambda result: result.get("success"), reused=reused
+            )
+            if not ocr_result["success"]:
+                logger.error(f"OCR processing failed: {ocr_result.get('error', 'Unknown error')}")
+                return ocr_result
+            
+            extracted_text = ocr_result["text"]
+            llm_result = await stage_cache.get_or_compute(
+                "llm_text", (llm_service.llm.model_name, text_digest(extracted_text), options.llm_fingerprint()),
+                lambda: llm_service.process_text(extracted_text, options),
+                reuse=reuse_cache, should_cache=is_cacheable, reused=reused
+            )
+        
+        elif mode == "vision":
+            logger.info("Using image-based approach, bypassing OCR")
+            if file_extension == ".pdf":
+                # Only the first page unless a page range was requested
+                pages = pages or [1]
+                if page_cache.contains(file_hash, pages, settings.RENDER_DPI):
+                    reused.append("render")
+                llm_result, skipped_pages, reused_pages = await FileService._run_vision_pipeline(
+                    file_path, file_hash, pages, options, reuse_cache, reused
+                )
+            else:
+                try:
+                    prepared = await OCRService.encode_for_vision([file_path], options.image_detail)
+                except Exception as e:
+                    return {
+                        "success": False,
+                        "error": f"Failed to convert image to base64: {str(e)}"
+                    }
+                images, details = prepared["images"], prepared["details"]
+                llm_result = await FileService._extract_images(images, details, options, reuse_cache, reused)
+        
+        else:
+            return {
+                "success": False,
+                "error": f"Unknown processing mode: {mode}"
+            }
+        
+        if not llm_result.get("success"):
+            return llm_result
+        
+        # Fresh model results teach the layout's template; cached ones were learned already
+        template_id = None
+        if layout is not None and not {"llm_text", "llm_vision"} & set(reused):
+            try:
+                template_id = await asyncio.to_thread(
+                    template_store.learn, scope, layout["fingerprint"], layout["text"], llm_result["json_result"]
+                )
+            except Exception as e:
+                logger.warning(f"Learning layout template failed: {str(e)}")
+        
+        return {
+            "success": True,
+            "file_id": file_id,
+            "file_name": file_name,
+            "extracted_text": llm_result.get("extracted_text", ""),
+            "json_result": llm_result["json_result"],
+            "processing_time": time.time() - start_time,
+            "reused_stages": reused,
+            "skipped_pages": skipped_pages,
+            "reused_pages": reused_pages,
+            "template_id": template_id
+        }
+    
+    @staticmethod
+    async def _extract_images(images: List[str],
+                              details: List[Optional[str]],
+                              options: ProcessingOptions,
+                              reuse_cache: bool,
+                              reused: List[str]) -> Dict[str, Any]:
+        """Vision model extraction of page images, cached by the images themselves"""
+        return await stage_cache.get_or_compute(
+            "llm_vision", (llm_service.vision_llm.model_name, *map(text_digest, images), details, options.llm_fingerprint()),
+            lambda: llm_service.process_images(images, options, details),
+            reuse=reuse_cache, should_cache=is_cacheable, reused=reused
+        )
+    
+    @staticmethod
+    async def _run_vision_pipeline(file_path: str,
+                                   file_hash: str,
+                                   pages: List[int],
+                                   options: ProcessingOptions,
+                                   reuse_cache: bool,
+                                   reused: List[str]) -> Tuple[Dict[str, Any], Dict[str, int], List[int]]:
+        """
+        Render, filter, encode and extract PDF pages as a pipeline.
+        
+        Pages go to the model in chunks of `pages_per_call`. While one chunk
+        is with the model, the next is rendered and encoded. Each chunk's
+        extraction is stored under the content hashes of its pages, so a
+        revised document only sends its changed pages. When duplicates are
+        collapsed, a chunk's extraction also depends on the pages kept
+        before it, so it is looked up after filtering, with each collapsed
+        page standing for the hash of the page it repeats. Chunk results
+        are merged in page order.
+        
+        Returns the merged result, the skipped page counts and the pages
+        whose stored extraction was reused.
+        """
+        size = options.pages_per_call or settings.VISION_PAGES_PER_CALL or len(pages)
+        chunks = [pages[start:start + size] for start in range(0, len(pages), size)]
+        # A single page is always sent, so there is nothing to filter
+        page_filter = PageFilter(options.skip_blank_pages and len(pages) > 1, options.collapse_duplicate_pages and len(pages) > 1)
+        chunk_reused: List[str] = []
+        
+        # Pages are identified by their content, not by the file they came from
+        try:
+            with metrics.stage("page_hash", pages=len(pages)):
+                hashes = await cpu_pool.run(cpu_tasks.page_hashes, file_path, pages)
+        except Exception as e:
+            logger.warning(f"Hashing PDF pages failed: {str(e)}")
+            hashes = {}
+        settings_key = (
+            llm_service.vision_llm.model_name, settings.RENDER_DPI, render_engine().name, settings.VISION_PREPROCESS,
+            options.image_detail or settings.VISION_DETAIL, settings.VISION_MIN_TEXT_PX, options.llm_fingerprint(),
+            settings.BLANK_PAGE_INK_RATIO if page_filter.skip_blank else None,
+            settings.DUPLICATE_PAGE_MAX_DISTANCE if page_filter.collapse_duplicates else None
+        )
+        
+        async def reuse(item: Dict[str, Any]) -> None:
+            if reuse_cache:
+                stored = await stage_cache.lookup("page_extraction", item["key"])
+                if stored is not MISSING:
+                    item.update(result=stored, reused=True)
+        
+        async def lookup(chunk: List[int]) -> Dict[str, Any]:
+            item: Dict[str, Any] = {"pages": chunk, "key": None}
+            if all(page in hashes for page in chunk) and not page_filter.collapse_duplicates:
+                item["key"] = (*settings_key, *(hashes[page] for page in chunk))
+                await reuse(item)
+            return item
+        
+        async def render(item: Dict[str, Any]) -> Any:
+            if "result" not in item:
+                item["paths"] = await page_cache.ensure_pages(file_path, file_hash, item["pages"])
+                if not item["paths"]:
+                    return SKIP
+            return item
+        
+        async def select(item: Dict[str, Any]) -> Any:
+            if "result" not in item:
+                ids = [hashes.get(page) for page in item["pages"]] if len(item["paths"]) == len(item["pages"]) else None
+                kept = await page_filter.keep(item["paths"], ids)
+                if page_filter.collapse_duplicates and ids is not None:
+                    # A collapsed page stands for the page it repeats, which an earlier chunk may have sent
+                    sources = {path: page_filter.duplicate_of[path] for path in item["paths"] if path in page_filter.duplicate_of}
+                    if None not in ids and None not in sources.values():
+                        item["key"] = (*settings_key, *(
+                            ("duplicate", sources[path]) if path in sources else page_hash
+                            for path, page_hash in zip(item["paths"], ids)
+                        ))
+                item["paths"] = [item["paths"][index] for index in kept]
+                if not item["paths"]:
+                    return SKIP
+                if item["key"] is not None and page_filter.collapse_duplicates:
+                    await reuse(item)
+            return item
+        
+        async def encode(item: Dict[str, Any]) -> Dict[str, Any]:
+            if "result" not in item:
+                item["prepared"] = await OCRService.encode_for_vision(item["paths"], options.image_detail)
+            return item
+        
+        async def infer(item: Dict[str, Any]) -> Dict[str, Any]:
+            if "result" not in item:
+                prepared = item["prepared"]
+                item["result"] = await FileService._extract_images(prepared["images"], prepared["details"], options, reuse_cache, chunk_reused)
+                if is_cacheable(item["result"]) and item["key"] is not None:
+                    await stage_cache.store("page_extraction", item["key"], item["result"])
+            return item
+        
+        items = await run_pipeline(chunks, [
+            Stage("lookup", lookup),
+            Stage("render", render),
+            Stage("filter", select),
+            Stage("encode", encode),
+            Stage("infer", infer, settings.PIPELINE_LLM_CONCURRENCY),
+        ])
+        
+        # Always send a page, so an all-blank document still gets an answer
+        if not items and page_filter.skipped["blank"]:
+            first_blank = page_filter.skipped["blank"].pop(0)
+            items = [await infer(await encode({"pages": [], "key": None, "paths": [first_blank]}))]
+        
+        reused_pages = [page for item in items if item.get("reused") for page in item["pages"]]
+        if not items:
+            return {"success": False, "error": "Failed to convert PDF to images"}, page_filter.counts(), reused_pages
+        failed = next((item["result"] for item in items if not item["result"].get("success")), None)
+        if failed is not None:
+            return failed, page_filter.counts(), reused_pages
+        
+        if len(chunk_reused) + sum(1 for item in items if item.get("reused")) == len(items):
+            reused.append("llm_vision")
+        return merge_results([item["result"] for item in items]), page_filter.counts(), reused_pages
+    
+    @staticmethod
+    async def _pdf_layout(file_path: str, pages: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+        """Text layer and layout fingerprint of a PDF, or None if it can't be read"""
+        try:
+            with metrics.stage("layout"):
+                return await cpu_pool.run(cpu_tasks.pdf_layout, file_path, pages)
+        except Exception as e:
+            logger.warning(f"Reading PDF layout failed: {str(e)}")
+            return None
+    
+    @staticmethod
+    async def _verify_template(file_id: str,
+                               file_name: str,
+                               options: ProcessingOptions,
+                               scope: str,
+                               layout: Dict[str, Any],
+                               local: Dict[str, Any]) -> None:
+        """Check a template extraction against the model, correcting the template on a mismatch"""
+        async with template_verify_slots:
+            with metrics.track_stages(), tracing.span("verify_template", template_id=local["template_id"]):
+                try:
+                    async with FileService.upload_path(file_id) as file_path:
+                        result = await FileService._run_stages(file_id, file_name, file_path, options, use_templates=False)
+                    if not result.get("success"):
+                        return
+                    
+                    matched = await asyncio.to_thread(
+                        template_store.verify, local["template_id"], scope, layout["fingerprint"], layout["text"],
+                        local["json_result"], result["json_result"]
+                    )
+                    tracing.add_attributes(matched=matched)
+                    if not matched:
+                        logger.warning(f"Template {local['template_id']} disagreed with the model on {file_id}")
+                except Exception as e:
+                    logger.exception(f"Verifying template extraction of {file_id} failed: {str(e)}")
+    
+    @staticmethod
+    async def get_page_image(file_id: str,
+                             page: int,
+                             dpi: int = settings.RENDER_DPI,
+                             image_format: str = "png",
+                             thumbnail_size: Optional[int] = None) -> Dict[str, Any]:
+        """Rendered page of a stored PDF, served from the page cache"""
+        try:
+            info = FileService.get_file_info(file_id)
+            if info is None:
+                return {
+                    "success": False,
+                    "error": f"File with ID {file_id} not found"
+                }
+            
+            if info["extension"] != ".pdf":
+                return {
+                    "success": False,
+                    "error": "Page images are only available for PDF files"
+                }
+            
+            file_hash = file_hash_cache.get(file_id)
+            path = page_cache.cached_path(file_hash, page, dpi, image_format, thumbnail_size) if file_hash else None
+            
+            # Open the upload only when the page still has to be rendered
+            if path is None:
+                async with FileService.upload_path(file_id) as file_path:
+                    if file_hash is None:
+                        file_hash = await asyncio.to_thread(file_digest, file_path)
+                        file_hash_cache.set(file_id, file_hash)
+                    paths = await page_cache.ensure_pages(file_path, file_hash, [page], dpi, image_format, thumbnail_size)
+                
+                if not paths:
+                    return {
+                        "success": False,
+                        "error": f"Page {page} not found"
+                    }
+                path = paths[0]
+            
+            return {
+                "success": True,
+                "path": path,
+                "media_type": f"image/{image_format}",
+                "etag": f'"{file_hash[:20]}-{page}-{dpi}-{thumbnail_size or 0}-{render_engine().name}.{image_format}"'
+            }
+            
+        except Exception as e:
+            logger.exception(f"Error rendering page {page} of {file_id}: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    @staticmethod
+    async def _archive_upload(file_id: str, file_path: str) -> None:
+        """Compress a processed upload in place, on a thread"""
+        if not settings.COMPRESS_UPLOADS:
+            return
+        
+        try:
+            with metrics.stage("archive"):
+                archive_path = await asyncio.to_thread(compress_file, file_path)
+            file_info_cache.invalidate(file_id)
+            logger.info(f"Archived upload: {archive_path}")
+        except Exception as e:
+            logger.exception(f"Error archiving upload {file_path}: {str(e)}")
+    
     @staticmethod
     def _is_valid_file(file: UploadFile) -> bool:
         """Check if file is valid"""
@@ -120,37 +549,38 @@ class FileService:
             logger.error(f"Invalid extension: {ext}. Allowed: {settings.ALLOWED_EXTENSIONS}")
         return is_valid
     
+    @staticmethod
+    def _describe(entry: os.DirEntry) -> Dict[str, Any]:
+        """Metadata for a file in the upload directory"""
+        # Archived uploads are reported under their original name
+        filename = strip_archive_suffix(entry.name)
+        
+        return {
+            # Extract file ID (if present)
+            "id": filename.split('_')[0] if '_' in filename else None,
+            "name": filename,
+            "size": entry.stat().st_size,
+            "extension": os.path.splitext(filename)[1].lower(),
+            "compressed": is_archive(entry.name)
+        }
+    
+    @staticmethod
+    def iter_files() -> Iterator[Dict[str, Any]]:
+        """Yield metadata for each file in the upload directory"""
+        # Ensure upload directory exists
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        
+        with os.scandir(settings.UPLOAD_DIR) as entries:
+            for entry in entries:
+                # Only include files, not directories or in-progress archives
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    yield FileService._describe(entry)
+    
     @staticmethod
     def get_file_list() -> List[Dict[str, Any]]:
         """Get list of files in upload directory"""
         try:
-            # Ensure upload directory exists
-            os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-            
-            # Get list of files
-            files = []
-            for filename in os.listdir(settings.UPLOAD_DIR):
-                file_path = os.path.join(settings.UPLOAD_DIR, filename)
-                
-                # Only include files, not directories
-                if os.path.isfile(file_path):
-                    # Extract file ID (if present)
-                    file_id = filename.split('_')[0] if '_' in filename else None
-                    
-                    # Get file size
-                    file_size = os.path.getsize(file_path)
-                    
-                    # Get file extension
-                    ext = os.path.splitext(filename)[1].lower()
-                    
-                    # Add file to list
-                    files.append({
-                        "id": file_id,
-                        "name": filename,
-                        "size": file_size,
-                        "extension": ext
-                    })
-            
+            files = list(FileService.iter_files())
             logger.info(f"Found {len(files)} files in uploads directory")
             return files
             
@@ -158,32 +588,72 @@ class FileService:
             logger.exception(f"Error listing files: {str(e)}")
             return []
     
+    @staticmethod
+    def _find_file(file_id: str) -> Optional[Dict[str, Any]]:
+        """Scan the upload directory for a file by ID"""
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        
+        with os.scandir(settings.UPLOAD_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.startswith(f"{file_id}_") and not entry.name.endswith(".tmp"):
+                    return dict(FileService._describe(entry), path=entry.path)
+        return None
+    
+    @staticmethod
+    def get_file_info(file_id: str) -> Optional[Dict[str, Any]]:
+        """Get file metadata by ID (cached)"""
+        info = file_info_cache.get_or_load(
+            file_id,
+            lambda: FileService._find_file(file_id),
+            should_cache=lambda info: info is not None
+        )
+        
+        # A stale entry (the file was archived by another worker, or removed) is looked up again
+        if info is not None and not os.path.exists(info["path"]):
+            file_info_cache.invalidate(file_id)
+            info = FileService._find_file(file_id)
+            if info is not None:
+                file_info_cache.set(file_id, info)
+        return info
+    
+    @staticmethod
+    @asynccontextmanager
+    async def upload_path(file_id: str) -> AsyncIterator[str]:
+        """Path to the uncompressed contents of an upload, for tools that need a real file; archives are decompressed on a thread"""
+        info = FileService.get_file_info(file_id)
+        if info is None:
+            raise FileNotFoundError(f"File with ID {file_id} not found")
+        
+        copy = local_copy(info["path"])
+        path = await asyncio.to_thread(copy.__enter__)
+        try:
+            yield path
+        finally:
+            copy.__exit__(None, None, None)
+    
     @staticmethod
     def delete_file(file_id: str) -> Dict[str, Any]:
         """Delete file by ID"""
         try:
-            # Ensure upload directory exists
-            os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+            info = FileService.get_file_info(file_id)
             
-            # Find file by ID
-            for filename in os.listdir(settings.UPLOAD_DIR):
-                if filename.startswith(f"{file_id}_"):
-                    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-                    
-                    # Delete file
-                    os.remove(file_path)
-                    logger.info(f"Deleted file: {file_path}")
-                    
-                    return {
-                        "success": True,
-                        "file_id": file_id
-                    }
+            if info is None:
+                # File not found
+                logger.error(f"File with ID {file_id} not found")
+                return {
+                    "success": False,
+                    "error": f"File with ID {file_id} not found"
+                }
+            
+            # Delete file
+            os.remove(info["path"])
+            file_info_cache.invalidate(file_id)
+            file_hash_cache.invalidate(file_id)
+            logger.info(f"Deleted file: {info['path']}")
             
-            # File not found
-            logger.error(f"File with ID {file_id} not found")
             return {
-                "success": False,
-                "error": f"File with ID {file_id} not found"
+                "success": True,
+                "file_id": file_id
             }
                 
         except Exception as e:
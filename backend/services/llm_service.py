@@ -1,7 +1,8 @@
 import os
+import copy
 import json
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
@@ -9,7 +10,9 @@ from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
-from backend.services.ocr_service import OCRService
+from backend.core import metrics, tracing
+from backend.core.http_client import get_http_client, get_async_http_client
+from backend.models.request import ProcessingOptions
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +23,66 @@ class DocumentStructure(BaseModel):
     content: Dict[str, Any] = Field(description="The structured content of the document")
 
 
+# Instructions for a full extraction: (before the document, after the document)
+FULL_EXTRACTION = (
+    "Analyze the following document text and extract its key information into a structured JSON format.\n"
+    "Look for patterns, sections, titles, and important data points.",
+    "Your task is to create a well-structured JSON representation of this document's content.\n"
+    "Identify and include all important entities, relationships, and hierarchies."
+)
+
+
+def extraction_instructions(options: Optional[ProcessingOptions]) -> Tuple[str, str]:
+    """Task instructions, narrowed to the requested fields or schema when given"""
+    if options is not None and options.json_schema:
+        return (
+            "Extract from the following document only the information described by this JSON schema, "
+            "using its property names and types:\n" + json.dumps(options.json_schema),
+            "Put the result under \"content\". Use null for anything the document does not contain "
+            "and do not add properties the schema does not define."
+        )
+    if options is not None and options.fields:
+        return (
+            "Extract from the following document only these fields: " + ", ".join(options.fields) + ".",
+            "Put them under \"content\" using exactly these keys. Use null for any field the document "
+            "does not contain and do not add other keys."
+        )
+    return FULL_EXTRACTION
+
+
+def merge_json(base: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a later page's JSON into an earlier one: lists are concatenated, the earlier non-empty value wins"""
+    for key, value in extra.items():
+        current = base.get(key)
+        if current is None or current == "" or current == [] or current == {}:
+            base[key] = value
+        elif isinstance(current, list) and isinstance(value, list):
+            base[key] = current + value
+        elif isinstance(current, dict) and isinstance(value, dict):
+            merge_json(current, value)
+    return base
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Whether an extraction is worth reusing: successful, and not just a JSON parse error"""
+    json_result = result.get("json_result")
+    return bool(result.get("success")) and not (isinstance(json_result, dict) and set(json_result) == {"error"})
+
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine successful extractions of consecutive page chunks into one result"""
+    if len(results) == 1:
+        return results[0]
+    json_result: Dict[str, Any] = {}
+    for result in results:
+        merge_json(json_result, copy.deepcopy(result["json_result"]))
+    return {
+        "success": True,
+        "extracted_text": "\n\n".join(result.get("extracted_text", "").strip() for result in results).strip(),
+        "json_result": json_result
+    }
+
+
 class LLMService:
     """Service for LLM processing"""
     
@@ -31,7 +94,9 @@ class LLMService:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
         )
         
         # Initialize Vision LLM
@@ -39,7 +104,9 @@ class LLMService:
             model="gpt-4o-mini",
             temperature=0,
             api_key=self.api_key,
-            max_tokens=4096
+            max_tokens=4096,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
         )
         
         # Set up output parser
@@ -47,41 +114,51 @@ class LLMService:
         
         # Initialize prompt template
         self.prompt_template = PromptTemplate(
-            input_variables=["text"],
+            input_variables=["text", "task", "closing"],
             partial_variables={"format_instructions": self.parser.get_format_instructions()},
             template="""
             You are a document structure extraction system designed to convert raw text from documents into structured JSON.
             
-            Analyze the following document text and extract its key information into a structured JSON format.
-            Look for patterns, sections, titles, and important data points.
+            {task}
             
             {format_instructions}
             
             TEXT:
             {text}
             
-            Your task is to create a well-structured JSON representation of this document's content.
-            Identify and include all important entities, relationships, and hierarchies.
+            {closing}
             """
         )
         
         # Create processing chain (modern approach)
         self.chain = self.prompt_template | self.llm
     
-    def process_text(self, text: str) -> Dict[str, Any]:
-        """Process text with LLM"""
+    @staticmethod
+    def _limit_output(llm: ChatOpenAI, options: Optional[ProcessingOptions]):
+        """The model, bound to the requested output token cap"""
+        if options is not None and options.max_output_tokens:
+            return llm.bind(max_tokens=options.max_output_tokens)
+        return llm
+    
+    async def process_text(self, text: str, options: Optional[ProcessingOptions] = None) -> Dict[str, Any]:
+        """Process text with LLM, extracting only the requested fields when options name them"""
         try:
             # Start timer
             start_time = time.time()
             
             # Run the chain
-            response = self.chain.invoke({"text": text})
+            task, closing = extraction_instructions(options)
+            chain = self.prompt_template | self._limit_output(self.llm, options)
+            with metrics.stage("llm", model=self.llm.model_name, input_chars=len(text)):
+                response = await chain.ainvoke({"text": text, "task": task, "closing": closing})
+                self._trace_usage(response)
             
             # Extract content from response
             content = response.content if hasattr(response, 'content') else str(response)
             
             # Extract and parse JSON
-            structured_data = self._parse_llm_response(content)
+            with metrics.stage("parse"):
+                structured_data = self._parse_llm_response(content)
             
             # Calculate processing time
             processing_time = time.time() - start_time
@@ -99,78 +176,19 @@ class LLMService:
                 "error": str(e)
             }
     
-    def process_document(self, file_id: str, file_name: str, extracted_text: str, is_image_based: bool = False, file_path: Optional[str] = None) -> Dict[str, Any]:
-        """Process a document with LLM"""
+    async def process_images(self,
+                             base64_images: List[str],
+                             options: Optional[ProcessingOptions] = None,
+                             details: Optional[List[Optional[str]]] = None) -> Dict[str, Any]:
+        """Process base64-encoded page images in one vision model call, optionally with a detail level per image"""
         try:
-            start_time = time.time()
-            
-            if is_image_based and file_path:
-                # Process document as an image
-                result = self._process_document_image(file_path, file_id)
+            # Ask for a transcription only in a full extraction; projections skip it to save output tokens
+            if options is not None and (options.fields or options.json_schema):
+                task, closing = extraction_instructions(options)
+                instructions = f"Analyze this document. {task} {closing} {self.parser.get_format_instructions()}"
             else:
-                # Process document as text
-                result = self.process_text(extracted_text)
+                instructions = f"Analyze this document. Extract all text content and provide it as 'extracted_text'. Then analyze the structure and content to create a well-organized JSON representation in 'json_result'. {self.parser.get_format_instructions()}"
             
-            if result["success"]:
-                # Calculate processing time
-                processing_time = time.time() - start_time
-                
-                return {
-                    "success": True,
-                    "file_id": file_id,
-                    "file_name": file_name,
-                    "extracted_text": result.get("extracted_text", extracted_text),
-                    "json_result": result["json_result"],
-                    "processing_time": processing_time
-                }
-            else:
-                return result
-                
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    def _process_document_image(self, file_path: str, file_id: str) -> Dict[str, Any]:
-        """Process a document as an image using vision capabilities"""
-        try:
-            # Determine file type
-            file_extension = os.path.splitext(file_path)[1].lower()
-            
-            if file_extension == '.pdf':
-                # Convert PDF to images
-                base64_images = OCRService.convert_pdf_to_images(file_path)
-                
-                if not base64_images:
-                    return {
-                        "success": False,
-                        "error": "Failed to convert PDF to images"
-                    }
-                
-                # Process the first page
-                return self._process_base64_image(base64_images[0])
-            else:
-                # Process image file
-                base64_image = OCRService.convert_image_to_base64(file_path)
-                
-                if not base64_image:
-                    return {
-                        "success": False,
-                        "error": "Failed to convert image to base64"
-                    }
-                
-                return self._process_base64_image(base64_image)
-                
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Error processing document image: {str(e)}"
-            }
-    
-    def _process_base64_image(self, base64_image: str) -> Dict[str, Any]:
-        """Process a base64-encoded image with vision model"""
-        try:
             # Construct messages for vision model
             messages = [
                 {
@@ -182,26 +200,34 @@ class LLMService:
                     "content": [
                         {
                             "type": "text",
-                            "text": f"Analyze this document. Extract all text content and provide it as 'extracted_text'. Then analyze the structure and content to create a well-organized JSON representation in 'json_result'. {self.parser.get_format_instructions()}"
+                            "text": instructions
                         },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
+                        *[
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/png;base64,{base64_image}",
+                                    **({"detail": detail} if detail else {})
+                                }
                             }
-                        }
+                            for base64_image, detail in zip(base64_images, details or [None] * len(base64_images))
+                        ]
                     ]
                 }
             ]
             
             # Call the vision model
-            response = self.vision_llm.invoke(messages)
+            with metrics.stage("llm", model=self.vision_llm.model_name, images=len(base64_images),
+                               image_bytes=sum(len(base64_image) for base64_image in base64_images)):
+                response = await self._limit_output(self.vision_llm, options).ainvoke(messages)
+                self._trace_usage(response)
             
             # Try to extract both the text and structured data from the response
             content = response.content
             
             # Extract JSON from the response
-            structured_data = self._parse_llm_response(content)
+            with metrics.stage("parse"):
+                structured_data = self._parse_llm_response(content)
             
             # Extract text content (might be in the response or in the structured data)
             extracted_text = ""
@@ -225,6 +251,16 @@ class LLMService:
                 "error": f"Error processing image with vision model: {str(e)}"
             }
     
+    @staticmethod
+    def _trace_usage(response: Any) -> None:
+        """Attach token usage of an LLM response to the current span"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        tracing.add_attributes(
+            input_tokens=usage.get("input_tokens"),
+            output_tokens=usage.get("output_tokens"),
+            total_tokens=usage.get("total_tokens"),
+        )
+    
     def _parse_llm_response(self, text: str) -> Dict[str, Any]:
         """Parse JSON from LLM response"""
         try:
@@ -1,18 +1,75 @@
 import os
-import base64
-from PIL import Image
-import PyPDF2
-from pdf2image import convert_from_path
-import io
+import math
+import asyncio
 from typing import Dict, Any, List, Optional
 
+from backend.core import metrics, tracing
+from backend.core.config import settings
+from backend.core.process_pool import cpu_pool
+from backend.services import cpu_tasks
+from backend.services.pdf_engines import text_engine
+
+
+class PageFilter:
+    """Drops blank pages and near-duplicates of pages kept earlier, one batch of pages at a time"""
+    
+    def __init__(self, skip_blank: bool = True, collapse_duplicates: bool = True):
+        self.skip_blank = skip_blank
+        self.collapse_duplicates = collapse_duplicates
+        self.kept_hashes: List[int] = []
+        self.kept_ids: List[Any] = []
+        self.skipped: Dict[str, List[str]] = {"blank": [], "duplicate": []}
+        self.duplicate_of: Dict[str, Any] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.skip_blank or self.collapse_duplicates
+    
+    def counts(self) -> Dict[str, int]:
+        """Pages skipped so far, by reason"""
+        return {reason: len(paths) for reason, paths in self.skipped.items()}
+    
+    async def keep(self, paths: List[str], ids: Optional[List[Any]] = None) -> List[int]:
+        """
+        Indexes of the page images of the next batch worth sending to a model.
+        
+        `ids` identify the pages; `duplicate_of` maps the path of each
+        collapsed page to the id of the kept page it repeats.
+        """
+        if not self.enabled:
+            return list(range(len(paths)))
+        
+        with metrics.stage("page_filter", pages=len(paths)):
+            signatures = await cpu_pool.run(cpu_tasks.page_signatures, paths)
+        
+        kept: List[int] = []
+        for index, signature in enumerate(signatures):
+            if self.skip_blank and signature["ink_ratio"] < settings.BLANK_PAGE_INK_RATIO:
+                self.skipped["blank"].append(paths[index])
+                continue
+            
+            source = next((
+                number for number, other in enumerate(self.kept_hashes)
+                if bin(signature["dhash"] ^ other).count("1") <= settings.DUPLICATE_PAGE_MAX_DISTANCE
+            ), None) if self.collapse_duplicates else None
+            if source is not None:
+                self.skipped["duplicate"].append(paths[index])
+                self.duplicate_of[paths[index]] = self.kept_ids[source]
+            else:
+                kept.append(index)
+                self.kept_hashes.append(signature["dhash"])
+                self.kept_ids.append(ids[index] if ids is not None else None)
+        
+        tracing.add_attributes(blank_pages=len(self.skipped["blank"]), duplicate_pages=len(self.skipped["duplicate"]))
+        return kept
+
 
 class OCRService:
     """Service for document image processing"""
     
     @staticmethod
-    def process_file(file_path: str) -> Dict[str, Any]:
-        """Process a file using OCR or text extraction"""
+    async def process_file(file_path: str, pages: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Process a file using OCR or text extraction, optionally limited to some 1-based pages"""
         try:
             # Get file extension
             file_extension = os.path.splitext(file_path)[1].lower()
@@ -20,7 +77,7 @@ class OCRService:
             # Process based on file type
             if file_extension == '.pdf':
                 # For PDFs, try to extract text directly
-                extracted_text = OCRService._extract_text_from_pdf(file_path)
+                extracted_text = await OCRService._extract_text_from_pdf(file_path, pages)
                 
                 if not extracted_text:
                     return {
@@ -52,59 +109,60 @@ class OCRService:
             }
     
     @staticmethod
-    def _extract_text_from_pdf(file_path: str) -> str:
-        """Try to extract text directly from a PDF without OCR"""
+    async def _extract_text_from_pdf(file_path: str, pages: Optional[List[int]] = None) -> str:
+        """
+        Try to extract text directly from a PDF without OCR.
+        
+        Long documents are split into runs of pages extracted in parallel
+        across the CPU pool, at most one run per worker.
+        """
         try:
-            extracted_text = ""
-            
-            # Try to extract text directly
-            with open(file_path, "rb") as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+            engine = text_engine().name
+            with metrics.stage("text_extraction", file_bytes=os.path.getsize(file_path), engine=engine):
+                if pages is None:
+                    page_count = await cpu_pool.run(cpu_tasks.pdf_page_count, file_path, engine)
+                    pages = list(range(1, page_count + 1))
                 
-                # Extract text from each page
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    
-                    if page_text and page_text.strip():
-                        extracted_text += page_text + "\n\n"
-            
-            return extracted_text.strip()
+                # Split into contiguous runs of pages, one task each
+                per_task = max(settings.PDF_TEXT_PAGES_PER_TASK, math.ceil(len(pages) / max(cpu_pool.max_workers, 1)), 1)
+                chunks = [pages[start:start + per_task] for start in range(0, len(pages), per_task)]
+                texts = await asyncio.gather(*(cpu_pool.run(cpu_tasks.extract_pdf_text, file_path, chunk, engine) for chunk in chunks))
+                
+                text = cpu_tasks.join_page_texts([page_text for chunk_texts in texts for page_text in chunk_texts])
+                tracing.add_attributes(text_chars=len(text), text_tasks=len(chunks))
+                return text
                 
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             return ""
     
     @staticmethod
-    def convert_pdf_to_images(file_path: str, max_pages: int = 3) -> List[str]:
-        """Convert PDF to a list of base64-encoded images"""
-        try:
-            # Convert PDF to images
-            images = convert_from_path(file_path, first_page=1, last_page=max_pages)
-            
-            # Convert images to base64
-            base64_images = []
-            for img in images:
-                buffered = io.BytesIO()
-                img.save(buffered, format="PNG")
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                base64_images.append(img_str)
-            
-            return base64_images
-        except Exception as e:
-            print(f"Error converting PDF to images: {e}")
-            return []
-    
-    @staticmethod
-    def convert_image_to_base64(file_path: str) -> str:
-        """Convert an image file to base64"""
-        try:
-            with open(file_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode()
-                return encoded_string
-        except Exception as e:
-            print(f"Error converting image to base64: {e}")
-            return ""
+    async def encode_for_vision(paths: List[str], detail: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Base64 images of page files ready for a vision call, with the detail level of each.
+        
+        With VISION_PREPROCESS on, pages are deskewed, cropped and sized for
+        the model, and a dense page may become several images. Work runs in
+        the process pool and images come back through shared memory.
+        """
+        if not settings.VISION_PREPROCESS:
+            with metrics.stage("encode", pages=len(paths)):
+                handle = await cpu_pool.run(cpu_tasks.encode_files_base64, paths)
+                images = cpu_tasks.read_shared_text(handle)
+                tracing.add_attributes(image_bytes=sum(len(image) for image in images))
+            return {"images": images, "details": [None] * len(images)}
+        
+        with metrics.stage("preprocess", pages=len(paths)):
+            handle = await cpu_pool.run(
+                cpu_tasks.prepare_vision_images, paths, detail or settings.VISION_DETAIL, settings.VISION_MIN_TEXT_PX
+            )
+            images = cpu_tasks.read_shared_text(handle)
+            tracing.add_attributes(
+                image_bytes=sum(len(image) for image in images),
+                image_tokens=sum(handle["tokens"]),
+                original_image_tokens=handle["original_tokens"],
+            )
+        return {"images": images, "details": handle["details"]}
 
 
 # Create OCR service instance
@@ -0,0 +1,160 @@
+"""
+Disk cache of rendered PDF pages and thumbnails.
+
+Images are stored under the file's content hash, page number, DPI, format,
+thumbnail size and render engine. The vision pipeline, reprocessing and UI previews all
+render a page once. Files are written atomically by the renderer, and a hit
+refreshes the file's mtime. Once the cache grows past `PAGE_CACHE_MAX_MB`,
+the least recently used images are deleted.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.process_pool import cpu_pool
+from backend.services import cpu_tasks
+from backend.services.pdf_engines import render_engine
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+
+
+class PageCache:
+    """Byte-capped LRU directory of page images"""
+
+    def __init__(self, directory: str = settings.PAGE_CACHE_DIR, max_bytes: int = settings.PAGE_CACHE_MAX_MB * 1024 * 1024):
+        """Use a cache directory; its size is measured on first write"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_written": 0}
+
+    def path(self,
+             file_hash: str,
+             page: int,
+             dpi: int,
+             image_format: str = "png",
+             thumbnail_size: Optional[int] = None,
+             engine: Optional[str] = None) -> str:
+        """Cache path of one rendered page; engines rasterize differently, so the configured one is part of the key"""
+        variant = f"-t{thumbnail_size}" if thumbnail_size else ""
+        engine = engine or render_engine().name
+        return os.path.join(self.directory, file_hash[:2], f"{file_hash}-p{page}-{dpi}dpi{variant}-{engine}.{image_format}")
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Whether a page is cached, marking it recently used"""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def cached_path(self, file_hash: str, page: int, dpi: int, image_format: str = "png", thumbnail_size: Optional[int] = None) -> Optional[str]:
+        """Path of a cached page, or None; misses are counted when the page is rendered"""
+        path = self.path(file_hash, page, dpi, image_format, thumbnail_size)
+        if not self._touch(path):
+            return None
+        self._count("hits")
+        return path
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def contains(self, file_hash: str, pages: List[int], dpi: int, image_format: str = "png") -> bool:
+        """Whether all the given pages are cached, without touching them"""
+        return all(os.path.exists(self.path(file_hash, page, dpi, image_format)) for page in pages)
+
+    async def ensure_pages(self,
+                           file_path: str,
+                           file_hash: str,
+                           pages: List[int],
+                           dpi: int = settings.RENDER_DPI,
+                           image_format: str = "png",
+                           thumbnail_size: Optional[int] = None) -> List[str]:
+        """Paths of the rendered pages, rendering missing ones in the CPU pool; pages past the end are left out"""
+        engine = render_engine().name
+        paths = [self.path(file_hash, page, dpi, image_format, thumbnail_size, engine) for page in pages]
+        missing = [(page, path) for page, path in zip(pages, paths) if not self._touch(path)]
+        self._count("hits", len(paths) - len(missing))
+        self._count("misses", len(missing))
+
+        if missing:
+            with metrics.stage("render", pages=len(missing), dpi=dpi, engine=engine):
+                written = await cpu_pool.run(cpu_tasks.render_pages_to_files, file_path, missing, dpi, image_format, thumbnail_size, engine)
+            await asyncio.to_thread(self._added, written)
+
+        return [path for path in paths if os.path.exists(path)]
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every cached image"""
+        files = []
+        if os.path.isdir(self.directory):
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _added(self, written: int) -> None:
+        """Account for new images and evict if over capacity"""
+        self._count("bytes_written", written)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += written
+            over = self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used images down to 90% of capacity"""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._size = total
+            self._stats["evictions"] += evicted
+        if evicted:
+            logger.info(f"Evicted {evicted} cached page images")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, bytes written and evictions"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size_bytes"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+# Create page cache instance
+page_cache = PageCache()
+metrics.register_runtime_stats("page_cache", "Page image cache", page_cache.stats, ["hit_rate", "hits", "misses", "evictions", "size_bytes"])
@@ -0,0 +1,200 @@
+"""
+Page image preprocessing for vision model calls.
+
+Vision models bill images by their size. At "high" detail, OpenAI first
+scales an image to fit 2048x2048, then scales its short side down to 768px.
+It charges 85 tokens plus 170 for every 512px tile. At "low" detail every
+image costs a flat 85 tokens at 512px.
+
+Rendered pages carry wide white margins, and scans are often a little
+rotated. Each page is therefore processed in four steps:
+
+1. Deskew it with a projection profile.
+2. Crop it to its content.
+3. Measure the height of its text lines.
+4. Scale it to the fewest tiles that keep that text legible.
+
+Pages whose text stays legible at 512px go at "low" detail. Pages whose
+text is too small even at the provider's full size are split into
+overlapping strips.
+
+Everything here is NumPy and Pillow and runs in the CPU pool.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+DETAIL_LEVELS = ("auto", "low", "high")
+TILE_SIZE = 512
+MAX_SIDE = 2048
+SHORT_SIDE = 768
+LOW_DETAIL_SIZE = 512
+INK_THRESHOLD = 160
+
+
+def ink_mask(image: Image.Image) -> np.ndarray:
+    """Boolean mask of the dark pixels of an image"""
+    return np.asarray(image.convert("L"), dtype=np.uint8) < INK_THRESHOLD
+
+
+def estimate_skew(mask: np.ndarray, max_angle: float = 5.0, step: float = 0.25, max_points: int = 20000) -> float:
+    """
+    Counter-clockwise rotation in degrees that levels the text lines.
+
+    Ink pixels are sheared by every candidate angle at once. The angle whose
+    row histogram is most concentrated is the one where text lines fall into
+    the fewest rows.
+    """
+    ys, xs = np.nonzero(mask)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > max_points:
+        chosen = np.random.default_rng(0).choice(len(ys), max_points, replace=False)
+        ys, xs = ys[chosen], xs[chosen]
+
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    slopes = np.tan(np.radians(angles))
+    rows = np.rint(ys[None, :] - xs[None, :] * slopes[:, None]).astype(np.int64)
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+
+    # One histogram per angle, computed in a single bincount
+    offsets = np.arange(len(angles))[:, None] * height
+    profiles = np.bincount((rows + offsets).ravel(), minlength=len(angles) * height).reshape(len(angles), height)
+    scores = (profiles.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def content_bbox(mask: np.ndarray, min_ink: int = 2) -> Optional[Tuple[int, int, int, int]]:
+    """(left, top, right, bottom) of the inked area, ignoring specks and solid scanner borders"""
+    height, width = mask.shape
+    row_ink = mask.sum(axis=1)
+    col_ink = mask.sum(axis=0)
+    rows = np.flatnonzero((row_ink >= min_ink) & (row_ink < 0.9 * width))
+    cols = np.flatnonzero((col_ink >= min_ink) & (col_ink < 0.9 * height))
+    if not rows.size or not cols.size:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def text_height(mask: np.ndarray) -> Optional[float]:
+    """
+    Median height in pixels of the inked row bands, roughly one text line.
+
+    Returns None when the bands are too tall to be text, as in photos and
+    diagrams.
+    """
+    row_ink = mask.sum(axis=1) > max(2, 0.005 * mask.shape[1])
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], row_ink.astype(np.int8), [0]))))
+    heights = edges[1::2] - edges[0::2]
+    if not heights.size:
+        return None
+    height = float(np.median(heights))
+    if height <= 0.1 * mask.shape[0] or (heights.size == 1 and height <= 200):
+        return height
+    return None
+
+
+def provider_size(width: int, height: int) -> Tuple[int, int]:
+    """Size the provider scales a high-detail image to"""
+    scale = min(1.0, MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, SHORT_SIDE / min(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def vision_tokens(width: int, height: int, detail: str = "high") -> int:
+    """Input tokens the provider charges for an image"""
+    if detail == "low":
+        return 85
+    width, height = provider_size(width, height)
+    return 85 + 170 * math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def legible_size(width: int, height: int, line_height: Optional[float], min_text_px: float) -> Optional[Tuple[Tuple[int, int], str]]:
+    """
+    Cheapest size and detail level that keep text lines `min_text_px` tall.
+
+    The image fills every tile it is billed for. Returns None when even the
+    provider's full high-detail size is too small.
+    """
+    max_width, _ = provider_size(width, height)
+    max_scale = max_width / width
+    # Without recognisable text lines, keep everything the provider keeps
+    needed = min_text_px / line_height if line_height else max_scale
+    if needed > max_scale + 1e-9:
+        return None
+
+    low_scale = min(1.0, LOW_DETAIL_SIZE / max(width, height))
+    if line_height and low_scale >= needed:
+        return (max(1, int(width * low_scale)), max(1, int(height * low_scale))), "low"
+
+    columns = math.ceil(width * needed / TILE_SIZE)
+    rows = math.ceil(height * needed / TILE_SIZE)
+    scale = min(columns * TILE_SIZE / width, rows * TILE_SIZE / height, max_scale)
+    return (max(1, int(width * scale)), max(1, int(height * scale))), "high"
+
+
+def preprocess_page(image: Image.Image,
+                    detail: str = "auto",
+                    min_text_px: float = 12.0,
+                    strips: int = 2,
+                    padding: int = 16) -> List[Tuple[Image.Image, str]]:
+    """Deskewed, cropped and sized images of one page, each with the detail level to request"""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    # The skew angle is measured on a reduced mask, since it does not depend on scale
+    mask = ink_mask(image)
+    step = max(1, mask.shape[1] // 800)
+    angle = estimate_skew(mask[::step, ::step])
+    image, mask = _crop_to_content(image, mask, padding)
+
+    # Rotating only the cropped content is several times cheaper than the whole render
+    if abs(angle) >= 0.5:
+        image = image.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor="white")
+        image, mask = _crop_to_content(image, ink_mask(image), padding)
+
+    if detail == "low":
+        scale = min(1.0, LOW_DETAIL_SIZE / max(image.size))
+        return [(_resized(image, max(1, int(image.width * scale)), max(1, int(image.height * scale))), "low")]
+    if detail == "high":
+        return [(_resized(image, *provider_size(*image.size)), "high")]
+
+    # Text too small for the provider's downscaling is split into overlapping strips,
+    # so lines cut at a boundary appear whole in one of them
+    line_height = text_height(mask)
+    parts = [image]
+    if strips > 1 and image.height > image.width and legible_size(image.width, image.height, line_height, min_text_px) is None:
+        overlap = image.height // 25
+        strip_height = math.ceil(image.height / strips)
+        parts = [
+            image.crop((0, max(index * strip_height - overlap, 0), image.width, min((index + 1) * strip_height + overlap, image.height)))
+            for index in range(strips)
+        ]
+
+    prepared = []
+    for part in parts:
+        size, level = legible_size(part.width, part.height, line_height, min_text_px) or (provider_size(*part.size), "high")
+        prepared.append((_resized(part, *size), level))
+    return prepared
+
+
+def _crop_to_content(image: Image.Image, mask: np.ndarray, padding: int) -> Tuple[Image.Image, np.ndarray]:
+    """Crop an image and its mask to the inked area plus some padding"""
+    bbox = content_bbox(mask)
+    if bbox is None:
+        return image, mask
+    left, top, right, bottom = bbox
+    left, top = max(left - padding, 0), max(top - padding, 0)
+    right, bottom = min(right + padding, image.width), min(bottom + padding, image.height)
+    return image.crop((left, top, right, bottom)), mask[top:bottom, left:right]
+
+
+def _resized(image: Image.Image, width: int, height: int) -> Image.Image:
+    if image.size == (width, height):
+        return image
+    return image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
@@ -0,0 +1,205 @@
+"""
+Pluggable PDF engines for text extraction and rasterization.
+
+Every engine reads the text layer of a PDF page by page and renders pages to
+PIL images. The default engine combines PyPDF2 with pdf2image, which starts
+a poppler subprocess for every page range and reads its output back through
+image files. pdfium (`pypdfium2`) and PyMuPDF (`pymupdf`) do both in
+process and are several times faster. They are optional dependencies.
+"auto" prefers pdfium when it is installed. PyMuPDF is AGPL-licensed, so it
+is never picked automatically; it is used only when named explicitly, after
+installing requirements-pymupdf.txt.
+
+`PDF_TEXT_ENGINE` and `PDF_RENDER_ENGINE` choose the engine for each
+operation separately. This lets a deployment render with pdfium while it
+keeps PyPDF2's text if downstream prompts were tuned on it.
+`benchmarks/pdf_engine_benchmark.py` compares the engines on a corpus.
+
+Engines are used inside CPU pool workers, so they are looked up by name.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import PyPDF2
+from PIL import Image
+from pdf2image import convert_from_path
+
+from backend.core.config import settings
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# Preferred engines for "auto", fastest first; PyMuPDF (AGPL) has to be chosen by name
+AUTO_ORDER = ("pdfium", "pypdf2")
+
+
+def page_ranges(pages: List[int]) -> List[Tuple[int, int]]:
+    """Group sorted page numbers into (first, last) runs"""
+    ranges: List[Tuple[int, int]] = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+def _valid_pages(pages: Optional[List[int]], page_count: int) -> List[int]:
+    """The given 1-based pages that exist, else every page"""
+    if pages is None:
+        return list(range(1, page_count + 1))
+    return [page for page in pages if 1 <= page <= page_count]
+
+
+class PDFEngine(ABC):
+    """Interface for text extraction and rendering of PDF pages"""
+
+    name = "base"
+    available = False
+
+    @abstractmethod
+    def page_count(self, file_path: str) -> int:
+        """Number of pages in a PDF"""
+
+    @abstractmethod
+    def extract_text(self, file_path: str, pages: Optional[List[int]] = None) -> List[str]:
+        """Text layer of the given 1-based pages (default all); pages past the end are left out"""
+
+    @abstractmethod
+    def render(self, file_path: str, pages: List[int], dpi: int) -> Iterator[Tuple[int, Image.Image]]:
+        """(page, image) for the given 1-based pages; pages past the end are left out"""
+
+
+class PyPDF2Engine(PDFEngine):
+    """PyPDF2 text and poppler rendering through pdf2image"""
+
+    name = "pypdf2"
+    available = True
+
+    def page_count(self, file_path: str) -> int:
+        with open(file_path, "rb") as file:
+            return len(PyPDF2.PdfReader(file).pages)
+
+    def extract_text(self, file_path: str, pages: Optional[List[int]] = None) -> List[str]:
+        with open(file_path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            return [reader.pages[page - 1].extract_text() or "" for page in _valid_pages(pages, len(reader.pages))]
+
+    def render(self, file_path: str, pages: List[int], dpi: int) -> Iterator[Tuple[int, Image.Image]]:
+        # One poppler call per run of consecutive pages
+        for first_page, last_page in page_ranges(pages):
+            images = convert_from_path(file_path, dpi=dpi, first_page=first_page, last_page=last_page)
+            yield from zip(range(first_page, last_page + 1), images)
+
+
+class PyMuPDFEngine(PDFEngine):
+    """In-process text and rendering with MuPDF"""
+
+    name = "pymupdf"
+    available = pymupdf is not None
+
+    def page_count(self, file_path: str) -> int:
+        with pymupdf.open(file_path) as document:
+            return document.page_count
+
+    def extract_text(self, file_path: str, pages: Optional[List[int]] = None) -> List[str]:
+        with pymupdf.open(file_path) as document:
+            return [document[page - 1].get_text() for page in _valid_pages(pages, document.page_count)]
+
+    def render(self, file_path: str, pages: List[int], dpi: int) -> Iterator[Tuple[int, Image.Image]]:
+        with pymupdf.open(file_path) as document:
+            for page in _valid_pages(pages, document.page_count):
+                pixmap = document[page - 1].get_pixmap(dpi=dpi, alpha=False)
+                yield page, Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+class PdfiumEngine(PDFEngine):
+    """In-process text and rendering with pdfium"""
+
+    name = "pdfium"
+    available = pypdfium2 is not None
+
+    # pdfium is not thread-safe; this matters when the CPU pool runs tasks on threads
+    _lock = threading.Lock()
+
+    def page_count(self, file_path: str) -> int:
+        with self._lock:
+            document = pypdfium2.PdfDocument(file_path)
+            try:
+                return len(document)
+            finally:
+                document.close()
+
+    def extract_text(self, file_path: str, pages: Optional[List[int]] = None) -> List[str]:
+        texts = []
+        with self._lock:
+            document = pypdfium2.PdfDocument(file_path)
+            try:
+                for page in _valid_pages(pages, len(document)):
+                    text_page = document[page - 1].get_textpage()
+                    # pdfium ends lines with CRLF; the other engines with LF
+                    texts.append(text_page.get_text_range().replace("\r\n", "\n"))
+                    text_page.close()
+            finally:
+                document.close()
+        return texts
+
+    def render(self, file_path: str, pages: List[int], dpi: int) -> Iterator[Tuple[int, Image.Image]]:
+        # The lock is taken per page, so it is not held while the caller saves an image
+        with self._lock:
+            document = pypdfium2.PdfDocument(file_path)
+            numbers = _valid_pages(pages, len(document))
+        try:
+            for page in numbers:
+                with self._lock:
+                    image = document[page - 1].render(scale=dpi / 72).to_pil()
+                yield page, image
+        finally:
+            with self._lock:
+                document.close()
+
+
+ENGINES: Dict[str, PDFEngine] = {engine.name: engine for engine in (PyPDF2Engine(), PyMuPDFEngine(), PdfiumEngine())}
+
+
+def available_engines() -> List[str]:
+    """Names of the engines whose libraries are installed"""
+    return [name for name, engine in ENGINES.items() if engine.available]
+
+
+def get_engine(name: Optional[str] = None) -> PDFEngine:
+    """
+    Engine by name, or "auto" for the fastest installed one.
+
+    An engine whose library is missing falls back to "auto", so a setting
+    copied to a host without it keeps working.
+    """
+    name = (name or "auto").lower()
+    engine = ENGINES.get(name)
+    if engine is not None and engine.available:
+        return engine
+    if name != "auto" and engine is None:
+        raise ValueError(f"Unknown PDF engine: {name}")
+    return next(ENGINES[candidate] for candidate in AUTO_ORDER if ENGINES[candidate].available)
+
+
+def text_engine(name: Optional[str] = None) -> PDFEngine:
+    """Engine for text extraction: the given one, else the configured one"""
+    return get_engine(name or settings.PDF_TEXT_ENGINE)
+
+
+def render_engine(name: Optional[str] = None) -> PDFEngine:
+    """Engine for rendering: the given one, else the configured one"""
+    return get_engine(name or settings.PDF_RENDER_ENGINE)
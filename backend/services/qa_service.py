@@ -0,0 +1,190 @@
+"""
+Question answering over processed documents.
+
+Documents are split into chunks (extracted text plus flattened JSON result
+fields), embedded once when they are stored and kept in the local vector
+index. Questions retrieve the closest chunks and the answer is streamed from
+the LLM with the chunks as context.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_openai import ChatOpenAI
+
+from backend.core.config import settings
+from backend.core.http_client import get_http_client, get_async_http_client
+from backend.db import events
+from backend.db.store import results_store
+from backend.services.embedding_service import embedding_service
+from backend.services.vector_index import create_vector_index
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """You answer questions about the user's documents.
+Use only the numbered document excerpts below. Cite the excerpts you used as [1], [2], ...
+If the excerpts do not contain the answer, say so."""
+
+
+def _split_text(text: str, size: int, overlap: int) -> List[str]:
+    """Split text into overlapping chunks, breaking at whitespace where possible"""
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start + size // 2, end)
+            if space != -1:
+                end = space
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+def _flatten_json(value: Any, path: str = "") -> List[str]:
+    """Flatten a JSON result into `path: value` lines"""
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            lines.extend(_flatten_json(item, f"{path}.{key}" if path else str(key)))
+        return lines
+    if isinstance(value, list):
+        lines = []
+        for index, item in enumerate(value):
+            lines.extend(_flatten_json(item, f"{path}[{index}]"))
+        return lines
+    if value is None or value == "":
+        return []
+    return [f"{path}: {value}"]
+
+
+class QAService:
+    """Service for retrieval-backed document Q&A"""
+
+    def __init__(self):
+        """Initialize the vector index and the answering LLM"""
+        self.index = create_vector_index()
+        self.llm = ChatOpenAI(
+            model=settings.QA_MODEL,
+            temperature=0,
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        )
+
+    def chunk_document(self, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Split a stored document into indexable chunks"""
+        base = {"doc_id": str(document["id"]), "file_name": document.get("file_name", "")}
+        chunks = []
+
+        for text in _split_text(document.get("extracted_text") or "", settings.QA_CHUNK_SIZE, settings.QA_CHUNK_OVERLAP):
+            chunks.append(dict(base, source="text", text=text))
+
+        json_result = document.get("json_result") or {}
+        if isinstance(json_result, str):
+            json_result = json.loads(json_result)
+
+        # Keep whole field lines together so a value is never split from its path
+        current: List[str] = []
+        length = 0
+        for line in _flatten_json(json_result):
+            if current and length + len(line) > settings.QA_CHUNK_SIZE:
+                chunks.append(dict(base, source="json", text="\n".join(current)))
+                current, length = [], 0
+            current.append(line)
+            length += len(line) + 1
+        if current:
+            chunks.append(dict(base, source="json", text="\n".join(current)))
+
+        return chunks
+
+    def index_documents(self, documents: List[Dict[str, Any]]) -> int:
+        """Embed and index documents that are not indexed yet; returns the number of chunks added"""
+        chunks = []
+        for document in documents:
+            if not self.index.has_document(str(document["id"])):
+                chunks.extend(self.chunk_document(document))
+
+        if not chunks:
+            return 0
+
+        vectors = embedding_service.embed_texts([chunk["text"] for chunk in chunks])
+        self.index.add(vectors, chunks)
+        return len(chunks)
+
+    def remove_document(self, doc_id: str) -> int:
+        """Remove a document from the index"""
+        return self.index.remove_document(doc_id)
+
+    def reindex(self, page_size: int = 100) -> Dict[str, Any]:
+        """Index stored documents that are missing from the index (e.g. stored before Q&A existed)"""
+        cursor = None
+        documents = 0
+        chunks = 0
+
+        while True:
+            page = results_store.list_document_results(
+                fields=["file_name", "extracted_text", "json_result"],
+                limit=page_size,
+                cursor=cursor
+            )
+            if "error" in page:
+                return {"success": False, "error": page["error"]}
+
+            chunks += self.index_documents(page["results"])
+            documents += len(page["results"])
+
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+
+        return {"success": True, "documents_scanned": documents, "chunks_added": chunks}
+
+    def search(self, question: str, k: int = settings.QA_TOP_K, doc_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Chunks most similar to a question"""
+        return self.index.search(embedding_service.embed_query(question), k=k, doc_ids=doc_ids)
+
+    async def answer_stream(self,
+                            question: str,
+                            k: int = settings.QA_TOP_K,
+                            doc_ids: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Stream an answer to a question, followed by its sources"""
+        chunks = await asyncio.to_thread(self.search, question, k, doc_ids)
+
+        if not chunks:
+            yield "I couldn't find anything about that in your processed documents."
+            return
+
+        context = "\n\n".join(
+            f"[{number}] ({chunk['file_name']}, {chunk['source']})\n{chunk['text']}"
+            for number, chunk in enumerate(chunks, start=1)
+        )
+        messages = [
+            SystemMessage(content=f"{SYSTEM_PROMPT}\n\n{context}"),
+            HumanMessage(content=question)
+        ]
+
+        async for token in self.llm.astream(messages):
+            if token.content:
+                yield token.content
+
+        sources = list(dict.fromkeys(f"{chunk['file_name']} ({chunk['doc_id']})" for chunk in chunks))
+        yield "\n\nSources:\n" + "\n".join(f"- {source}" for source in sources)
+
+    def stats(self) -> Dict[str, Any]:
+        """Index and embedding cache statistics"""
+        return {"index": self.index.stats(), "embeddings": dict(embedding_service.stats)}
+
+
+# Create Q&A service instance
+qa_service = QAService()
+
+# Index documents as they are stored and drop them when deleted
+events.on_stored(qa_service.index_documents)
+events.on_deleted(qa_service.remove_document)
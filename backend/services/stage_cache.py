@@ -0,0 +1,184 @@
+"""
+Cache of document stage outputs keyed by their inputs.
+
+Extracted text, rendered pages and LLM results are stored under a hash of
+everything that determines them: the file's content hash, the stage's
+options and, for LLM stages, the model and the exact input. Reprocessing a
+stored upload with new options therefore only reruns the stages whose key
+changed. The cache is an SQLite file shared by all workers and trimmed to
+`STAGE_CACHE_MAX_MB`, least recently used first. Each worker checks the size
+only after writing a sixteenth of the limit, so a full cache can overshoot
+by that much per worker.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.shared_state import MISSING
+from backend.core.sqlite_connections import ThreadConnections
+
+# Fraction of max_bytes a worker writes between size checks
+TRIM_CHECK_FRACTION = 16
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_digest(text: str) -> str:
+    """SHA-256 of a string"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """SQLite-backed store of stage outputs with LRU trimming"""
+
+    def __init__(self, cache_path: str = settings.STAGE_CACHE_PATH, max_bytes: int = settings.STAGE_CACHE_MAX_MB * 1024 * 1024):
+        """Open the cache database"""
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self._connections = ThreadConnections(cache_path)
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_outputs (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stage_outputs_used_at ON stage_outputs (used_at)")
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._unchecked_bytes = 0
+        self._trim_every = max(1, self.max_bytes // TRIM_CHECK_FRACTION)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's cache connection"""
+        return self._connections.get()
+
+    @staticmethod
+    def key(stage: str, *parts: Any) -> str:
+        """Cache key for a stage and everything its output depends on"""
+        return hashlib.sha256("\0".join([stage, *map(str, parts)]).encode("utf-8")).hexdigest()
+
+    def _count(self, stage: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(stage, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, key: str) -> Any:
+        """Cached output, or MISSING"""
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM stage_outputs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISSING
+
+        with conn:
+            conn.execute("UPDATE stage_outputs SET used_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key: str, stage: str, value: Any) -> None:
+        """Store an output, trimming the cache once enough has been written since the last check"""
+        data = json.dumps(value).encode("utf-8")
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_outputs (key, stage, value, size, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, stage, data, len(data), time.time())
+            )
+
+        with self._lock:
+            self._unchecked_bytes += len(data)
+            due = self._unchecked_bytes >= self._trim_every
+            if due:
+                self._unchecked_bytes = 0
+        if due:
+            with conn:
+                self._trim(conn)
+
+    def _trim(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used outputs until the cache fits in max_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM stage_outputs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        for key, size in conn.execute("SELECT key, size FROM stage_outputs ORDER BY used_at").fetchall():
+            if excess <= 0:
+                break
+            conn.execute("DELETE FROM stage_outputs WHERE key = ?", (key,))
+            excess -= size
+
+    async def get_or_compute(self,
+                             stage: str,
+                             parts: Tuple[Any, ...],
+                             compute: Callable[[], Awaitable[Any]],
+                             reuse: bool = True,
+                             should_cache: Callable[[Any], bool] = bool,
+                             reused: Optional[List[str]] = None) -> Any:
+        """
+        Return the cached output of a stage, or compute and cache it.
+
+        Stages served from the cache are appended to `reused`.
+        """
+        if reuse:
+            value = await self.lookup(stage, parts)
+            if value is not MISSING:
+                if reused is not None:
+                    reused.append(stage)
+                return value
+        else:
+            self._count(stage, "misses")
+
+        value = await compute()
+        if should_cache(value):
+            await self.store(stage, parts, value)
+        return value
+
+    async def lookup(self, stage: str, parts: Tuple[Any, ...]) -> Any:
+        """Cached output of a stage for these inputs, or MISSING; counted as a hit or miss"""
+        value = await asyncio.to_thread(self.get, self.key(stage, *parts))
+        self._count(stage, "misses" if value is MISSING else "hits")
+        return value
+
+    async def store(self, stage: str, parts: Tuple[Any, ...], value: Any) -> None:
+        """Cache the output of a stage for these inputs"""
+        await asyncio.to_thread(self.set, self.key(stage, *parts), stage, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits and misses per stage, entry count and size on disk"""
+        conn = self._connection()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM stage_outputs").fetchone()
+        with self._lock:
+            stages = {stage: dict(counts) for stage, counts in self._stats.items()}
+        hits = sum(counts["hits"] for counts in stages.values())
+        lookups = hits + sum(counts["misses"] for counts in stages.values())
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "stages": stages,
+        }
+
+
+# Create stage cache instance
+stage_cache = StageCache()
+metrics.register_runtime_stats("stage_cache", "Stage cache", stage_cache.stats, ["entries", "size_bytes", "hit_rate"])
@@ -0,0 +1,365 @@
+"""
+Extraction templates learned from earlier results, per document layout.
+
+Documents from the same vendor share a layout. `cpu_tasks.pdf_layout`
+fingerprints a PDF's layout by where text sits on its first pages. Each
+LLM extraction then teaches the template of that layout how to find every
+field of its `json_result` in the text layer:
+
+- the label just before the value on the same line, or
+- the line above a value that has a line of its own, or
+- a constant, for values that are not in the text.
+
+Templates are kept per extraction request (the same fields, schema and
+token cap). A rule is trusted once it has come out the same on
+`TEMPLATE_MIN_SAMPLES` documents in a row.
+
+A document within `TEMPLATE_MAX_DISTANCE` fingerprint bits of a template
+whose rules are all trusted and all find a value is extracted locally,
+without a model call. Templates of results with lists (line items and the
+like) are only learned, never applied: their rules cover just the items the
+earlier documents had, and a new document may have more. A `TEMPLATE_VERIFY_RATE` share of local extractions
+is checked against the model afterwards. Rules that disagree with the
+model lose their trust and are relearned.
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.sqlite_connections import ThreadConnections
+
+NUMBER_PATTERN = re.compile(r"[-+]?\d[\d,]*(?:\.\d+)?")
+MAX_ANCHOR_CHARS = 40
+
+Path = Tuple[Any, ...]
+
+
+def flatten(value: Any, path: Path = ()) -> Dict[Path, Any]:
+    """Leaf values of a JSON document by their key/index path"""
+    if isinstance(value, dict):
+        leaves: Dict[Path, Any] = {}
+        for key, item in value.items():
+            leaves.update(flatten(item, path + (key,)))
+        return leaves
+    if isinstance(value, list):
+        leaves = {}
+        for index, item in enumerate(value):
+            leaves.update(flatten(item, path + (index,)))
+        return leaves
+    return {path: value}
+
+
+def unflatten(leaves: Dict[Path, Any]) -> Dict[str, Any]:
+    """Rebuild a JSON document from its leaf paths"""
+    root: Dict[str, Any] = {}
+    for path, value in leaves.items():
+        node: Any = root
+        for key, next_key in zip(path, path[1:]):
+            if isinstance(node, list):
+                while len(node) <= key:
+                    node.append(None)
+                if node[key] is None:
+                    node[key] = [] if isinstance(next_key, int) else {}
+                node = node[key]
+            else:
+                node = node.setdefault(key, [] if isinstance(next_key, int) else {})
+        if isinstance(node, list):
+            while len(node) <= path[-1]:
+                node.append(None)
+        node[path[-1]] = value
+    return root
+
+
+def _lines(text: str) -> List[str]:
+    return [" ".join(line.split()) for line in text.splitlines()]
+
+
+def _number(token: str) -> Optional[float]:
+    try:
+        return float(token.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _stop(rest: str) -> str:
+    """The label that follows a value on its line, if any"""
+    match = re.match(r"\s*([^\d]*)", rest)
+    return match.group(1).strip()[:MAX_ANCHOR_CHARS] if match else ""
+
+
+def learn_rule(lines: List[str], value: Any) -> Dict[str, Any]:
+    """Where a value appears in the text lines, as a rule that finds it in similar documents"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        kind = "int" if isinstance(value, int) else "float"
+        for index, line in enumerate(lines):
+            for match in NUMBER_PATTERN.finditer(line):
+                number = _number(match.group())
+                if number is not None and abs(number - value) < 0.005:
+                    rule = _label_rule(lines, index, line[:match.start()], kind)
+                    if rule is not None:
+                        return rule
+    elif isinstance(value, str) and value.strip():
+        needle = " ".join(value.split())
+        for index, line in enumerate(lines):
+            position = line.find(needle)
+            if position >= 0:
+                rule = _label_rule(lines, index, line[:position], "str")
+                if rule is not None:
+                    rule["stop"] = _stop(line[position + len(needle):])
+                    return rule
+                break
+    return {"kind": "const", "value": value}
+
+
+def _label_rule(lines: List[str], index: int, prefix: str, kind: str) -> Optional[Dict[str, Any]]:
+    anchor = prefix.strip()[-MAX_ANCHOR_CHARS:]
+    if anchor:
+        return {"kind": kind, "anchor": anchor, "below": False}
+    # A value on its own line is found under the line above it
+    for previous in range(index - 1, -1, -1):
+        if lines[previous]:
+            return {"kind": kind, "anchor": lines[previous][-MAX_ANCHOR_CHARS:], "below": True}
+    return None
+
+
+def apply_rule(lines: List[str], rule: Dict[str, Any]) -> Tuple[bool, Any]:
+    """(found, value) of a rule in a document's text lines"""
+    if rule["kind"] == "const":
+        return True, rule["value"]
+
+    for index, line in enumerate(lines):
+        if rule["below"]:
+            if not line.endswith(rule["anchor"]):
+                continue
+            rest = next((following for following in lines[index + 1:] if following), "")
+        else:
+            position = line.find(rule["anchor"])
+            if position < 0:
+                continue
+            rest = line[position + len(rule["anchor"]):]
+
+        if rule["kind"] == "str":
+            if rule.get("stop") and rule["stop"] in rest:
+                rest = rest[:rest.index(rule["stop"])]
+            value = rest.strip(" :\t")
+            if value:
+                return True, value
+        else:
+            match = NUMBER_PATTERN.search(rest)
+            number = _number(match.group()) if match else None
+            if number is not None:
+                if rule["kind"] == "int":
+                    if number != int(number):
+                        continue
+                    return True, int(number)
+                return True, number
+    return False, None
+
+
+def _same_rule(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    return {key: value for key, value in first.items() if key != "seen"} == {key: value for key, value in second.items() if key != "seen"}
+
+
+def _same_value(first: Any, second: Any) -> bool:
+    if isinstance(first, (int, float)) and isinstance(second, (int, float)) and not isinstance(first, bool) and not isinstance(second, bool):
+        return abs(first - second) < 0.01
+    if isinstance(first, str) and isinstance(second, str):
+        return " ".join(first.split()).casefold() == " ".join(second.split()).casefold()
+    return first == second
+
+
+def _distance(first: str, second: str) -> int:
+    return bin(int(first, 16) ^ int(second, 16)).count("1")
+
+
+class TemplateStore:
+    """SQLite store of layout templates shared by all workers"""
+
+    def __init__(self,
+                 db_path: str = settings.TEMPLATE_STORE_PATH,
+                 max_distance: int = settings.TEMPLATE_MAX_DISTANCE,
+                 min_samples: int = settings.TEMPLATE_MIN_SAMPLES):
+        """Open the template database"""
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.min_samples = min_samples
+        self._connections = ThreadConnections(db_path)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS layout_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    rules TEXT NOT NULL,
+                    documents INTEGER NOT NULL DEFAULT 0,
+                    local_hits INTEGER NOT NULL DEFAULT 0,
+                    verified INTEGER NOT NULL DEFAULT 0,
+                    mismatches INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_layout_templates_scope ON layout_templates (scope)")
+
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "local_extractions": 0, "learned": 0, "verified": 0, "mismatches": 0}
+
+    def _connection(self):
+        """Get this thread's template connection"""
+        return self._connections.get()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _nearest(self, conn, scope: str, fingerprint: str) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        """(id, rules) of the closest template within max_distance"""
+        best = None
+        for template_id, candidate, rules in conn.execute(
+            "SELECT id, fingerprint, rules FROM layout_templates WHERE scope = ?", (scope,)
+        ):
+            distance = _distance(fingerprint, candidate)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, template_id, rules)
+        return (best[1], json.loads(best[2])) if best else None
+
+    def extract(self, scope: str, fingerprint: str, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract a document locally with its layout's template.
+
+        Returns {"template_id", "json_result"}, or None unless every rule of
+        the template is trusted and finds a value. Templates with list items
+        are never applied, since they would drop any further items.
+        """
+        self._count("lookups")
+        conn = self._connection()
+        match = self._nearest(conn, scope, fingerprint)
+        if match is None:
+            return None
+
+        template_id, rules = match
+        if not rules or any(rule["seen"] < self.min_samples for rule in rules):
+            return None
+        if all(rule["kind"] == "const" for rule in rules):
+            return None
+        if any(isinstance(key, int) for rule in rules for key in rule["path"]):
+            return None
+
+        lines = _lines(text)
+        leaves = {}
+        for rule in rules:
+            found, value = apply_rule(lines, rule)
+            if not found:
+                return None
+            leaves[tuple(rule["path"])] = value
+
+        with conn:
+            conn.execute("UPDATE layout_templates SET local_hits = local_hits + 1 WHERE id = ?", (template_id,))
+        self._count("local_extractions")
+        return {"template_id": template_id, "json_result": unflatten(leaves)}
+
+    def learn(self, scope: str, fingerprint: str, text: str, json_result: Dict[str, Any],
+              distrust: Optional[List[Path]] = None) -> Optional[int]:
+        """Teach a layout's template (or a new one) where the fields of a model result are; returns its ID"""
+        leaves = flatten(json_result)
+        if not leaves or not isinstance(json_result, dict):
+            return None
+
+        lines = _lines(text)
+        learned = []
+        for path, value in leaves.items():
+            rule = learn_rule(lines, value)
+            rule["path"] = list(path)
+            learned.append(rule)
+
+        conn = self._connection()
+        # Serialise the read-modify-write across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            match = self._nearest(conn, scope, fingerprint)
+            previous = {tuple(rule["path"]): rule for rule in match[1]} if match else {}
+            distrusted = set(distrust or [])
+            for rule in learned:
+                path = tuple(rule["path"])
+                old = previous.get(path)
+                rule["seen"] = old["seen"] + 1 if old is not None and path not in distrusted and _same_rule(old, rule) else 1
+
+            if match is None:
+                template_id = conn.execute(
+                    "INSERT INTO layout_templates (scope, fingerprint, rules, documents, updated_at) VALUES (?, ?, ?, 1, ?)",
+                    (scope, fingerprint, json.dumps(learned), time.time())
+                ).lastrowid
+            else:
+                template_id = match[0]
+                conn.execute(
+                    "UPDATE layout_templates SET rules = ?, documents = documents + 1, updated_at = ? WHERE id = ?",
+                    (json.dumps(learned), time.time(), template_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._count("learned")
+        return template_id
+
+    def verify(self, template_id: int, scope: str, fingerprint: str, text: str,
+               local_result: Dict[str, Any], model_result: Dict[str, Any]) -> bool:
+        """Compare a local extraction with the model's; on a mismatch, relearn the template from the model"""
+        local, model = flatten(local_result), flatten(model_result)
+        mismatched = [path for path in set(local) | set(model) if not _same_value(local.get(path), model.get(path))]
+
+        conn = self._connection()
+        with conn:
+            column = "mismatches" if mismatched else "verified"
+            conn.execute(f"UPDATE layout_templates SET {column} = {column} + 1 WHERE id = ?", (template_id,))
+        if mismatched:
+            self._count("mismatches")
+            self.learn(scope, fingerprint, text, model_result, distrust=mismatched)
+            return False
+
+        self._count("verified")
+        return True
+
+    def templates(self) -> List[Dict[str, Any]]:
+        """Every template with its usage counts and trusted fields"""
+        rows = self._connection().execute(
+            "SELECT id, scope, fingerprint, rules, documents, local_hits, verified, mismatches, updated_at FROM layout_templates ORDER BY id"
+        ).fetchall()
+        templates = []
+        for template_id, scope, fingerprint, rules, documents, local_hits, verified, mismatches, updated_at in rows:
+            rules = json.loads(rules)
+            templates.append({
+                "id": template_id,
+                "scope": scope,
+                "fingerprint": fingerprint,
+                "fields": len(rules),
+                "trusted_fields": sum(rule["seen"] >= self.min_samples for rule in rules),
+                "documents": documents,
+                "local_hits": local_hits,
+                "verified": verified,
+                "mismatches": mismatches,
+                "updated_at": updated_at,
+            })
+        return templates
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookups, local extractions and verification outcomes for this worker"""
+        templates = self._connection().execute("SELECT COUNT(*) FROM layout_templates").fetchone()[0]
+        with self._lock:
+            stats = dict(self._stats)
+        stats["templates"] = templates
+        stats["local_rate"] = stats["local_extractions"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+
+# Create template store instance
+template_store = TemplateStore()
+metrics.register_runtime_stats(
+    "templates", "Layout templates", template_store.stats,
+    ["templates", "lookups", "local_extractions", "local_rate", "mismatches"]
+)
@@ -0,0 +1,279 @@
+"""
+Local vector index for document chunks.
+
+`NumpyVectorIndex` does exact cosine search with one matrix-vector product,
+which is fast enough for a few hundred thousand chunks. Other index types
+(e.g. an approximate-nearest-neighbour library) plug in by implementing
+`VectorIndex` and being registered in `create_vector_index`.
+
+Each server worker keeps its own copy of the index in memory. On disk the
+index is a list of segments named in `manifest.json`: an add writes only its
+own segment, and segments are merged once there are `MAX_SEGMENTS` of them.
+Writers take an exclusive file lock and merge with the latest manifest;
+readers load the segments they have not seen when the manifest changes, so
+workers never overwrite each other's additions.
+"""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Any, List, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import numpy as np
+
+from backend.core.config import settings
+
+# Segments on disk before an add merges them into one
+MAX_SEGMENTS = 64
+
+
+class VectorIndex(ABC):
+    """Interface for chunk vector indexes"""
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray, chunks: List[Dict[str, Any]]) -> None:
+        """Add vectors with chunk metadata (each chunk has a `doc_id`)"""
+
+    @abstractmethod
+    def remove_document(self, doc_id: str) -> int:
+        """Remove all chunks of a document; returns the number removed"""
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int = 5, doc_ids: List[str] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks by cosine similarity, optionally limited to some documents"""
+
+    @abstractmethod
+    def has_document(self, doc_id: str) -> bool:
+        """Whether any chunk of the document is indexed"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Index size statistics"""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class NumpyVectorIndex(VectorIndex):
+    """Brute-force cosine index persisted as segments of .npy vectors plus JSON metadata"""
+
+    def __init__(self, index_dir: str = settings.VECTOR_INDEX_DIR):
+        """Load the index from disk if it exists"""
+        self.index_dir = index_dir
+        self.manifest_path = os.path.join(index_dir, "manifest.json")
+        self.lock_path = os.path.join(index_dir, ".lock")
+        self._lock = threading.RLock()
+        self._segments: List[str] = []
+        self._next_segment = 0
+        self._parts: List[np.ndarray] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._chunks: List[Dict[str, Any]] = []
+        self._loaded_mtime = 0
+        os.makedirs(index_dir, exist_ok=True)
+        self._migrate_single_file()
+        self._refresh()
+
+    def _migrate_single_file(self) -> None:
+        """Turn an index saved as one vectors.npy/chunks.json pair into the first segment"""
+        vectors_path = os.path.join(self.index_dir, "vectors.npy")
+        chunks_path = os.path.join(self.index_dir, "chunks.json")
+        with self._file_lock(exclusive=True):
+            if os.path.exists(self.manifest_path) or not os.path.exists(chunks_path):
+                return
+            os.replace(vectors_path, self._segment_path("0", ".npy"))
+            os.replace(chunks_path, self._segment_path("0", ".json"))
+            self._write_manifest(["0"], 1)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Lock the index files against other worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _segment_path(self, name: str, suffix: str) -> str:
+        """Path of one file of a segment"""
+        return os.path.join(self.index_dir, f"segment-{name}{suffix}")
+
+    def _disk_mtime(self) -> int:
+        """Modification time of the manifest, 0 if there is none"""
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _load_if_changed(self) -> None:
+        """Read segments other processes added since the last load (caller holds the locks)"""
+        mtime = self._disk_mtime()
+        if mtime == self._loaded_mtime:
+            return
+
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        segments = manifest["segments"]
+        if segments[:len(self._segments)] != self._segments:
+            # Merged or compacted by another worker: start over
+            self._segments, self._parts, self._chunks = [], [], []
+
+        chunks = list(self._chunks)
+        for name in segments[len(self._segments):]:
+            with open(self._segment_path(name, ".json")) as f:
+                chunks.extend(json.load(f))
+            self._parts.append(np.load(self._segment_path(name, ".npy")))
+        self._chunks = chunks
+        self._segments = list(segments)
+        self._next_segment = manifest["next"]
+        self._vectors = None
+        self._loaded_mtime = mtime
+
+    def _refresh(self) -> None:
+        """Pick up changes written by other workers"""
+        if self._disk_mtime() == self._loaded_mtime:
+            return
+        with self._lock, self._file_lock(exclusive=False):
+            self._load_if_changed()
+
+    def _matrix(self) -> np.ndarray:
+        """All vectors as one matrix, concatenated on first use after a change (caller holds the lock)"""
+        if self._vectors is None:
+            self._vectors = np.vstack(self._parts) if self._parts else np.zeros((0, 0), dtype=np.float32)
+            self._parts = [self._vectors] if self._parts else []
+        return self._vectors
+
+    def _write_segment(self, vectors: np.ndarray, chunks: List[Dict[str, Any]]) -> str:
+        """Write one segment and return its name (caller holds the locks)"""
+        name = str(self._next_segment)
+        self._next_segment += 1
+        vectors_tmp = self._segment_path(name, ".tmp.npy")
+        chunks_tmp = self._segment_path(name, ".json.tmp")
+
+        np.save(vectors_tmp, vectors)
+        with open(chunks_tmp, "w") as f:
+            json.dump(chunks, f)
+
+        os.replace(vectors_tmp, self._segment_path(name, ".npy"))
+        os.replace(chunks_tmp, self._segment_path(name, ".json"))
+        return name
+
+    def _write_manifest(self, segments: List[str], next_segment: int) -> None:
+        """Atomically point the index at a new list of segments"""
+        manifest_tmp = self.manifest_path + ".tmp"
+        with open(manifest_tmp, "w") as f:
+            json.dump({"segments": segments, "next": next_segment}, f)
+        os.replace(manifest_tmp, self.manifest_path)
+
+    def _commit(self, segments: List[str]) -> None:
+        """Publish the segment list and delete segments it no longer names (caller holds the locks)"""
+        dropped = set(self._segments) - set(segments)
+        self._write_manifest(segments, self._next_segment)
+        self._segments = segments
+        self._loaded_mtime = self._disk_mtime()
+        for name in dropped:
+            for suffix in (".npy", ".json"):
+                try:
+                    os.remove(self._segment_path(name, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _compact(self) -> None:
+        """Replace all segments with one holding the whole index (caller holds the locks)"""
+        if not self._chunks:
+            self._commit([])
+            return
+        self._commit([self._write_segment(self._matrix(), self._chunks)])
+
+    def add(self, vectors: np.ndarray, chunks: List[Dict[str, Any]]) -> None:
+        if len(chunks) == 0:
+            return
+
+        vectors = _normalize(vectors)
+        with self._lock, self._file_lock(exclusive=True):
+            self._load_if_changed()
+            name = self._write_segment(vectors, chunks)
+            self._parts.append(vectors)
+            self._vectors = None
+            self._chunks = self._chunks + chunks
+            if len(self._segments) + 1 > MAX_SEGMENTS:
+                self._segments.append(name)
+                self._compact()
+            else:
+                self._commit(self._segments + [name])
+
+    def remove_document(self, doc_id: str) -> int:
+        with self._lock, self._file_lock(exclusive=True):
+            self._load_if_changed()
+            keep = [i for i, chunk in enumerate(self._chunks) if chunk["doc_id"] != doc_id]
+            removed = len(self._chunks) - len(keep)
+            if removed:
+                vectors = self._matrix()[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+                self._parts = [vectors] if keep else []
+                self._vectors = vectors
+                self._chunks = [self._chunks[i] for i in keep]
+                self._compact()
+            return removed
+
+    def has_document(self, doc_id: str) -> bool:
+        self._refresh()
+        with self._lock:
+            return any(chunk["doc_id"] == doc_id for chunk in self._chunks)
+
+    def search(self, query: np.ndarray, k: int = 5, doc_ids: List[str] = None) -> List[Dict[str, Any]]:
+        self._refresh()
+        with self._lock:
+            vectors, chunks = self._matrix(), self._chunks
+
+        if len(chunks) == 0:
+            return []
+
+        scores = vectors @ _normalize(query).reshape(-1)
+
+        if doc_ids:
+            allowed = set(doc_ids)
+            mask = np.fromiter((chunk["doc_id"] in allowed for chunk in chunks), dtype=bool, count=len(chunks))
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, len(chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            dict(chunks[i], score=float(scores[i]))
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        with self._lock:
+            return {
+                "type": "numpy",
+                "chunks": len(self._chunks),
+                "documents": len({chunk["doc_id"] for chunk in self._chunks}),
+                "dimensions": int(self._parts[0].shape[1]) if self._parts else 0,
+                "bytes": sum(int(part.nbytes) for part in self._parts),
+                "segments": len(self._segments),
+            }
+
+
+def create_vector_index() -> VectorIndex:
+    """Create the configured vector index"""
+    if settings.VECTOR_INDEX_BACKEND == "numpy":
+        return NumpyVectorIndex()
+    raise ValueError(f"Unknown VECTOR_INDEX_BACKEND: {settings.VECTOR_INDEX_BACKEND}")
@@ -0,0 +1,189 @@
+"""
+Compare the PDF engines on a corpus of sample documents.
+
+For every installed engine it measures text extraction and rendering
+throughput in pages per second and the peak resident memory of each run,
+including any poppler subprocesses. It also scores text fidelity as the
+similarity of the extracted words to a reference. The reference is a
+`<name>.txt` file next to the PDF if there is one, else the text of the
+--reference engine. Every run happens in a fresh process, so the memory
+peaks do not mix.
+
+Without --corpus, a synthetic corpus is generated: text PDFs of 1, 10 and
+50 letter pages with known text, which serves as the reference.
+
+Usage: python -m benchmarks.pdf_engine_benchmark [--corpus DIR] [--engines pypdf2,pdfium] [--repeat 3]
+"""
+
+import argparse
+import difflib
+import multiprocessing
+import queue
+import re
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.core.config import settings
+from backend.services.pdf_engines import ENGINES, available_engines, get_engine
+
+SAMPLE_WORDS = ("invoice", "total", "widget", "assembly", "quantity", "12", "48.50", "582.00", "EUR",
+                "net", "30", "days", "delivery", "2024-01-17", "customer", "reference", "tax", "19%")
+
+
+def synthetic_text(page: int, lines: int = 45) -> str:
+    """Known text of one synthetic page"""
+    words = [SAMPLE_WORDS[(page * 7 + index) % len(SAMPLE_WORDS)] for index in range(lines * 9)]
+    return "\n".join(" ".join(words[line * 9:(line + 1) * 9]) for line in range(lines))
+
+
+def write_text_pdf(path: Path, page_texts: list) -> None:
+    """A minimal PDF with one Helvetica text page per entry"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.split("\n")]
+        stream = "BT /F1 10 Tf 14 TL 72 740 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode("latin-1")))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(output))
+
+
+def synthetic_corpus(directory: Path):
+    """(path, reference page texts) of generated text PDFs"""
+    for page_count in (1, 10, 50):
+        texts = [synthetic_text(page) for page in range(1, page_count + 1)]
+        path = directory / f"synthetic-{page_count}p.pdf"
+        write_text_pdf(path, texts)
+        yield path, texts
+
+
+def load_corpus(directory: Path):
+    """(path, reference page texts or None) of the PDFs in a directory; a .txt sidecar is split on form feeds"""
+    for path in sorted(directory.glob("*.pdf")):
+        sidecar = path.with_suffix(".txt")
+        yield path, sidecar.read_text().split("\f") if sidecar.exists() else None
+
+
+def _measure(engine_name: str, operation: str, path: str, dpi: int, repeat: int, results) -> None:
+    """Runs in a fresh process: median seconds, pages, peak RSS and (for text) the page texts"""
+    engine = get_engine(engine_name)
+    timings = []
+    texts = None
+    try:
+        pages = list(range(1, engine.page_count(path) + 1))
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            if operation == "text":
+                texts = engine.extract_text(path, pages)
+            else:
+                for _, image in engine.render(path, pages, dpi):
+                    image.load()
+            timings.append(time.perf_counter() - start)
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+        return
+
+    # ru_maxrss is in KiB on Linux; poppler runs in child processes
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    results.put({"seconds": sorted(timings)[len(timings) // 2], "pages": len(pages), "peak_mb": peak / 1024, "texts": texts})
+
+
+def measure(engine_name: str, operation: str, path: Path, dpi: int, repeat: int) -> dict:
+    """Run one measurement in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(engine_name, operation, str(path), dpi, repeat, results))
+    process.start()
+    result = None
+    # Poll, so a worker that crashes without a result is noticed
+    while result is None:
+        try:
+            result = results.get(timeout=0.5)
+        except queue.Empty:
+            if not process.is_alive():
+                result = {"error": f"exit code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def fidelity(texts: list, reference: list) -> float:
+    """Similarity of the words of two documents, 0 to 1"""
+    words = re.findall(r"\S+", "\n".join(texts or []))
+    reference_words = re.findall(r"\S+", "\n".join(reference or []))
+    if not words and not reference_words:
+        return 1.0
+    return difflib.SequenceMatcher(None, words, reference_words, autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF engines")
+    parser.add_argument("--corpus", type=Path, help="Directory of PDFs, with optional .txt reference texts (default: synthetic PDFs)")
+    parser.add_argument("--engines", help=f"Comma-separated engines (default: installed ones of {', '.join(ENGINES)})")
+    parser.add_argument("--reference", default="pypdf2", help="Engine whose text is the reference when a PDF has no .txt file")
+    parser.add_argument("--dpi", type=int, default=settings.RENDER_DPI, help="Render DPI")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per document")
+    parser.add_argument("--skip-render", action="store_true", help="Only benchmark text extraction")
+    args = parser.parse_args()
+
+    engines = args.engines.split(",") if args.engines else available_engines()
+    missing = [name for name in engines if name not in available_engines()]
+    if missing:
+        parser.error(f"Not installed: {', '.join(missing)} (installed: {', '.join(available_engines())})")
+    operations = ("text",) if args.skip_render else ("text", "render")
+
+    with tempfile.TemporaryDirectory() as directory:
+        documents = list(load_corpus(args.corpus) if args.corpus else synthetic_corpus(Path(directory)))
+        if not documents:
+            print("No PDFs found")
+            return
+
+        print(f"{'document':<28} {'engine':<8} {'operation':<9} {'pages/s':>9} {'peak MB':>8} {'fidelity':>9}")
+        totals = {}
+        for path, reference in documents:
+            if reference is None and args.reference in available_engines():
+                reference = measure(args.reference, "text", path, args.dpi, 1).get("texts")
+            for engine_name in engines:
+                for operation in operations:
+                    result = measure(engine_name, operation, path, args.dpi, args.repeat)
+                    if "error" in result:
+                        print(f"{path.name[:28]:<28} {engine_name:<8} {operation:<9} failed: {result['error']}")
+                        continue
+
+                    rate = result["pages"] / result["seconds"] if result["seconds"] else float("inf")
+                    score = fidelity(result["texts"], reference) if operation == "text" and reference is not None else None
+                    shown = f"{score:9.3f}" if score is not None else f"{'-':>9}"
+                    print(f"{path.name[:28]:<28} {engine_name:<8} {operation:<9} {rate:9.1f} {result['peak_mb']:8.1f} {shown}")
+
+                    total = totals.setdefault((engine_name, operation), {"pages": 0, "seconds": 0.0, "peak_mb": 0.0, "scores": []})
+                    total["pages"] += result["pages"]
+                    total["seconds"] += result["seconds"]
+                    total["peak_mb"] = max(total["peak_mb"], result["peak_mb"])
+                    if score is not None:
+                        total["scores"].append(score)
+
+    print("\nTotals")
+    for (engine_name, operation), total in sorted(totals.items()):
+        rate = total["pages"] / total["seconds"] if total["seconds"] else float("inf")
+        score = f"{sum(total['scores']) / len(total['scores']):9.3f}" if total["scores"] else f"{'-':>9}"
+        print(f"{'':<28} {engine_name:<8} {operation:<9} {rate:9.1f} {total['peak_mb']:8.1f} {score}")
+
+
+if __name__ == "__main__":
+    main()
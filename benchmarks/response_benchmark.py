@@ -0,0 +1,95 @@
+"""
+Benchmark response serialization and compression for extraction results.
+
+Compares the standard library JSON encoder with FastJSONResponse's serializer
+and reports bytes on the wire for identity, gzip and (if installed) brotli,
+with and without the extracted text. It also checks that a result with an
+integer beyond 64 bits (models return long account numbers as numbers)
+still serializes, through the standard library fallback.
+
+Usage: python -m benchmarks.response_benchmark [--pages 20] [--repeat 50]
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.api.responses import dumps, orjson, brotli
+from backend.core.config import settings
+
+
+def make_result(pages: int) -> dict:
+    """A synthetic upload response shaped like a multi-page invoice extraction"""
+    random.seed(0)
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 10))) for _ in range(2000)]
+    page_text = lambda: " ".join(random.choices(words, k=450))
+    return {
+        "success": True,
+        "file_id": "3f1c2d9e-6a7b-4c8d-9e0f-1a2b3c4d5e6f",
+        "file_name": "invoice.pdf",
+        "extracted_text": "\n\n".join(f"--- Page {page + 1} ---\n{page_text()}" for page in range(pages)),
+        "json_result": {
+            "document_type": "invoice",
+            "vendor": {"name": "Acme Corp", "address": "1 Main St, Springfield"},
+            "line_items": [
+                {"description": " ".join(random.choices(words, k=6)), "quantity": random.randint(1, 20),
+                 "unit_price": round(random.uniform(1, 500), 2)}
+                for _ in range(pages * 25)
+            ],
+            "total": 12345.67,
+        },
+    }
+
+
+def time_call(function, repeat: int) -> float:
+    """Median wall time of a call in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization and compression")
+    parser.add_argument("--pages", type=int, default=20, help="Pages of extracted text in the synthetic result")
+    parser.add_argument("--repeat", type=int, default=50, help="Timing repetitions")
+    args = parser.parse_args()
+
+    result = make_result(args.pages)
+    without_text = {key: value for key, value in result.items() if key != "extracted_text"}
+
+    # Serialization: what FastAPI's default JSONResponse does vs FastJSONResponse
+    stdlib = lambda: json.dumps(result, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    print(f"Serializer: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"  json.dumps      {time_call(stdlib, args.repeat):8.2f} ms")
+    print(f"  fast dumps      {time_call(lambda: dumps(result), args.repeat):8.2f} ms")
+    big_int = dict(result, json_result=dict(result["json_result"], account_number=12345678901234567890123))
+    assert json.loads(dumps(big_int)) == big_int, "fast dumps changed a result with a big integer"
+    print(f"  big int result  {time_call(lambda: dumps(big_int), args.repeat):8.2f} ms (falls back to json)")
+
+    # Bytes on the wire
+    print("\nBytes on the wire:")
+    for label, payload in (("with text", result), ("include_text=false", without_text)):
+        body = dumps(payload)
+        sizes = {"identity": len(body)}
+        gzip_ms = time_call(lambda: zlib.compress(body, settings.RESPONSE_GZIP_LEVEL), max(args.repeat // 5, 1))
+        sizes["gzip"] = len(zlib.compress(body, settings.RESPONSE_GZIP_LEVEL)) + 18
+        line = f"  {label:<20} identity {sizes['identity']:>9,}  gzip {sizes['gzip']:>9,} ({gzip_ms:.2f} ms)"
+        if brotli is not None:
+            br_ms = time_call(lambda: brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY), max(args.repeat // 5, 1))
+            sizes["br"] = len(brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY))
+            line += f"  br {sizes['br']:>9,} ({br_ms:.2f} ms)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
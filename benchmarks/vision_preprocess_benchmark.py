@@ -0,0 +1,120 @@
+"""
+Benchmark the vision preprocessing stage on a corpus of sample pages.
+
+For every page it reports the preprocessing time and the estimated image
+tokens before and after deskewing, cropping and detail selection. Without
+--corpus, a synthetic corpus is generated: letter pages at the render DPI
+with dense, small, large and sparse text, a half-page receipt, and skewed
+variants.
+
+Usage: python -m benchmarks.vision_preprocess_benchmark [--corpus DIR] [--repeat 3]
+"""
+
+import argparse
+import base64
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from backend.core.config import settings
+from backend.services.page_preprocessing import preprocess_page, vision_tokens
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff")
+SAMPLE_LINE = "Invoice 2024-0117  Widget assembly, qty 12 @ 48.50  Total 582.00 EUR"
+
+
+def text_page(font_pt: float, lines: int, dpi: int, width_in: float = 8.5, height_in: float = 11.0, skew: float = 0.0) -> Image.Image:
+    """A white page with `lines` lines of text at the given point size"""
+    page = Image.new("RGB", (int(width_in * dpi), int(height_in * dpi)), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=max(int(font_pt * dpi / 72), 8))
+    pitch = font_pt * 1.4 * dpi / 72
+    for line in range(lines):
+        draw.text((dpi, dpi + line * pitch), SAMPLE_LINE, fill="black", font=font)
+    return page.rotate(skew, expand=True, fillcolor="white") if skew else page
+
+
+def synthetic_corpus(dpi: int):
+    """(name, image) pairs covering common page layouts"""
+    yield "dense 10pt", text_page(10, 50, dpi)
+    yield "dense 10pt, 1.5deg skew", text_page(10, 50, dpi, skew=1.5)
+    yield "small 7pt", text_page(7, 75, dpi)
+    yield "large 16pt slide", text_page(16, 12, dpi, width_in=11, height_in=8.5)
+    yield "sparse cover letter", text_page(11, 6, dpi)
+    yield "half-page receipt", text_page(9, 20, dpi, width_in=4, height_in=6)
+    yield "receipt, -3deg skew", text_page(9, 20, dpi, width_in=4, height_in=6, skew=-3)
+
+
+def load_corpus(directory: Path, dpi: int):
+    """(name, image) pairs from image files and, where poppler is installed, PDF pages"""
+    for path in sorted(directory.iterdir()):
+        suffix = path.suffix.lower()
+        if suffix in IMAGE_SUFFIXES:
+            with Image.open(path) as image:
+                image.load()
+            yield path.name, image
+        elif suffix == ".pdf":
+            from pdf2image import convert_from_path
+            for number, image in enumerate(convert_from_path(str(path), dpi=dpi), start=1):
+                yield f"{path.name} p{number}", image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vision preprocessing")
+    parser.add_argument("--corpus", type=Path, help="Directory of page images and PDFs (default: synthetic pages)")
+    parser.add_argument("--dpi", type=int, default=settings.RENDER_DPI, help="Render DPI for PDFs and synthetic pages")
+    parser.add_argument("--detail", choices=("auto", "low", "high"), default=settings.VISION_DETAIL, help="Detail level")
+    parser.add_argument("--min-text-px", type=float, default=settings.VISION_MIN_TEXT_PX, help="Smallest text line height to keep")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per page")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.dpi) if args.corpus else synthetic_corpus(args.dpi)
+    print(f"{'page':<28} {'size':>11} {'ms':>7} {'images':>7} {'detail':>7} {'tokens':>13} {'PNG bytes':>21}")
+
+    totals = {"pages": 0, "ms": 0.0, "before": 0, "after": 0, "bytes_before": 0, "bytes_after": 0}
+    for name, image in pages:
+        timings = []
+        for _ in range(max(args.repeat, 1)):
+            start = time.perf_counter()
+            prepared = preprocess_page(image, args.detail, args.min_text_px)
+            timings.append((time.perf_counter() - start) * 1000)
+        elapsed = sorted(timings)[len(timings) // 2]
+
+        before = vision_tokens(*image.size)
+        after = sum(vision_tokens(*part.size, level) for part, level in prepared)
+        bytes_before = len(base64.b64encode(png_bytes(image)))
+        bytes_after = sum(len(base64.b64encode(png_bytes(part))) for part, _ in prepared)
+        details = "/".join(sorted({level for _, level in prepared}))
+        size = f"{image.width}x{image.height}"
+        print(f"{name[:28]:<28} {size:>11} {elapsed:7.1f} {len(prepared):>7} {details:>7} "
+              f"{before:>5} -> {after:>4} {bytes_before:>9,} -> {bytes_after:>8,}")
+
+        totals["pages"] += 1
+        totals["ms"] += elapsed
+        totals["before"] += before
+        totals["after"] += after
+        totals["bytes_before"] += bytes_before
+        totals["bytes_after"] += bytes_after
+
+    if not totals["pages"]:
+        print("No pages found")
+        return
+    print(f"\n{totals['pages']} pages, {totals['ms'] / totals['pages']:.1f} ms per page")
+    print(f"Image tokens: {totals['before']:,} -> {totals['after']:,} ({1 - totals['after'] / totals['before']:.0%} fewer)")
+    print(f"Base64 bytes: {totals['bytes_before']:,} -> {totals['bytes_after']:,}")
+
+
+def png_bytes(image: Image.Image) -> bytes:
+    """PNG encoding of an image, as sent to the model"""
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import streamlit as st
 import os
-import time
 from dotenv import load_dotenv
 
 from frontend.utils.api_client import api_client
@@ -87,23 +86,19 @@ def handle_chat_input(user_input, uploaded_file=None):
     
     # Add user message to chat
     st.session_state.messages.append({"role": "user", "content": user_input})
+    with st.chat_message("user"):
+        st.markdown(user_input)
     
-    # Simple response for now - this would be connected to an LLM in a full implementation
-    responses = [
-        "I'm analyzing your question...",
-        "That's an interesting point about the document.",
-        "Let me check the extracted data to answer that.",
-        "Would you like to upload another document to compare?",
-        "Is there anything specific you'd like me to explain about the document structure?"
-    ]
+    # Stream the answer from the document Q&A endpoint
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        answer = ""
+        for text in api_client.ask_stream(user_input):
+            answer += text
+            placeholder.markdown(answer + "▌")
+        placeholder.markdown(answer)
     
-    # Simulate thinking
-    with st.spinner("Thinking..."):
-        time.sleep(1)
-        
-    # Add AI response
-    import random
-    st.session_state.messages.append({"role": "assistant", "content": random.choice(responses)})
+    st.session_state.messages.append({"role": "assistant", "content": answer})
 
 
 def main():
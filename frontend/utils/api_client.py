@@ -1,7 +1,7 @@
 import os
 import requests
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,6 +15,7 @@ class APIClient:
         self.base_url = os.getenv("BACKEND_URL", "http://localhost:8000")
         self.api_url = f"{self.base_url}/api/v1"
         self.documents_url = f"{self.api_url}/documents"
+        self.qa_url = f"{self.api_url}/qa"
     
     def upload_file(self, file) -> Dict[str, Any]:
         """Upload a file to the backend"""
@@ -134,6 +135,26 @@ class APIClient:
                 "error": str(e)
             }
 
+    
+    def ask_stream(self, question: str) -> Iterator[str]:
+        """Ask a question about processed documents, yielding the answer as it streams"""
+        try:
+            with requests.post(
+                f"{self.qa_url}/ask",
+                json={"question": question},
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    yield f"Sorry, I couldn't answer that: {response.text}"
+                    return
+                
+                for text in response.iter_content(chunk_size=None, decode_unicode=True):
+                    if text:
+                        yield text
+                        
+        except Exception as e:
+            yield f"Sorry, I couldn't answer that: {str(e)}"
+
 
 # Create API client instance
 api_client = APIClient() 
\ No newline at end of file
@@ -6,6 +6,7 @@ from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from backend.core.http_client import get_http_client, get_async_http_client
 from llm.prompts.templates import DOCUMENT_PROCESSING_PROMPT
 
 # Load environment variables
@@ -27,7 +28,9 @@ class DocumentProcessor:
         self.llm = ChatOpenAI(
             model=model_name,
             temperature=temperature,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
         )
         
         # Set up output parser
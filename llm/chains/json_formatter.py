@@ -5,6 +5,7 @@ from langchain.chains import LLMChain
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 
+from backend.core.http_client import get_http_client, get_async_http_client
 from llm.prompts.templates import JSON_FORMATTING_PROMPT
 
 # Load environment variables
@@ -22,7 +23,9 @@ class JSONFormatter:
         self.llm = ChatOpenAI(
             model=model_name,
             temperature=temperature,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
         )
         
         # Create LLM chain
@@ -10,6 +10,9 @@ from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 
+from backend.core import tracing
+from backend.core.http_client import get_http_client, get_async_http_client
+
 # Load environment variables
 load_dotenv()
 
@@ -41,7 +44,9 @@ class SimpleDocumentGraph:
         self.llm = ChatOpenAI(
             model=model_name,
             temperature=0,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
         )
         
         # Set up output parser
@@ -172,9 +177,9 @@ class SimpleDocumentGraph:
         graph = StateGraph(DocumentState)
         
         # Add nodes
-        graph.add_node("detect_document_type", self._detect_document_type)
-        graph.add_node("extract_json", self._extract_json)
-        graph.add_node("handle_error", self._handle_error)
+        graph.add_node("detect_document_type", tracing.traced("langgraph.detect_document_type")(self._detect_document_type))
+        graph.add_node("extract_json", tracing.traced("langgraph.extract_json")(self._extract_json))
+        graph.add_node("handle_error", tracing.traced("langgraph.handle_error")(self._handle_error))
         
         # Add edges
         graph.add_edge("detect_document_type", self._should_extract_json)
@@ -210,7 +215,9 @@ class SimpleDocumentGraph:
             }
             
             # Run the graph
-            result = self.graph.invoke(state)
+            with tracing.span("langgraph.process", input_chars=len(text)):
+                result = self.graph.invoke(state)
+                tracing.add_attributes(document_type=result["document_type"], status=result["status"])
             
             # Calculate processing time
             processing_time = time.time() - start_time
@@ -1,3 +1,5 @@
+import argparse
+import shutil
 import sys
 import os
 from pathlib import Path
@@ -6,14 +8,104 @@ from pathlib import Path
 root_dir = Path(__file__).parent
 sys.path.insert(0, str(root_dir))
 
+
+def run_development(host: str, port: int):
+    """Single process with auto-reload"""
+    import uvicorn
+
+    uvicorn.run("backend.main:app", host=host, port=port, reload=True)
+
+
+def run_production(host: str, port: int, workers: int, timeout: int, max_requests: int):
+    """
+    Several worker processes.
+
+    Uses gunicorn with uvicorn workers when gunicorn is installed: the app is
+    preloaded once in the master and forked, workers are recycled after
+    `max_requests` requests, and `kill -HUP <master pid>` restarts workers
+    gracefully. Otherwise falls back to uvicorn's own process manager.
+    """
+    # Workers read this to decide whether state must be shared between processes
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    # Aggregate Prometheus metrics across workers; stale files from a previous run are cleared
+    metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(os.getenv("DATA_DIR", str(root_dir / "data")), "prometheus"))
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is None:
+        import uvicorn
+
+        print("gunicorn is not installed; using uvicorn workers (no preload or graceful reload)")
+        uvicorn.run(
+            "backend.main:app",
+            host=host,
+            port=port,
+            workers=workers,
+            timeout_graceful_shutdown=timeout,
+            limit_max_requests=max_requests or None,
+        )
+        return
+
+    class Application(BaseApplication):
+        """Gunicorn application serving backend.main:app"""
+
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "preload_app": True,
+                "graceful_timeout": timeout,
+                "timeout": max(timeout, 120),
+                "max_requests": max_requests,
+                "max_requests_jitter": max_requests // 10,
+                "child_exit": child_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from backend.main import app
+            return app
+
+    def child_exit(server, worker):
+        """Drop the live gauges of a worker that exited"""
+        try:
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(worker.pid)
+        except ImportError:
+            pass
+
+    Application().run()
+
+
 # Run the backend
 if __name__ == "__main__":
-    # Import here after path is set up
-    import uvicorn
-    
+    parser = argparse.ArgumentParser(description="Run the Boga DocAI backend")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--prod", action="store_true", help="Production mode: several workers, no auto-reload")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="Worker processes in production mode (default: CPU count)")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds workers get to finish requests and flush results on restart")
+    parser.add_argument("--max-requests", type=int, default=1000,
+                        help="Recycle each worker after this many requests (0 disables)")
+    args = parser.parse_args()
+
     print(f"Starting backend server...")
     print(f"Python path includes: {root_dir}")
     print(f"Make sure you have installed all requirements using: pip install -r requirements.txt")
-    
+
     # Run the server
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    if args.prod:
+        print(f"Production mode with {args.workers} workers")
+        run_production(args.host, args.port, args.workers, args.graceful_timeout, args.max_requests)
+    else:
+        run_development(args.host, args.port)